@@ -0,0 +1,167 @@
+# agendador.py
+# Execução periódica de tarefas em segundo plano (jobs) dentro da API.
+#
+# Cada job roda numa thread própria, a cada 'intervalo' segundos, com a sua
+# própria sessão do banco. O agendador é iniciado e parado pelo lifespan do
+# FastAPI (veja main.py) e pode ser desligado com AGENDADOR_ATIVO=false
+# (ex.: para rodar os jobs num processo separado ou via cron).
+#
+# Com vários workers do uvicorn, todos iniciam o agendador; no MySQL cada
+# execução pega um lock nomeado (GET_LOCK) e, se outro worker já estiver
+# rodando o mesmo job, simplesmente pula a vez.
+#
+# Os jobs guardam em job_marca a sua "marca d'água" (até onde já
+# processaram), para continuar de onde pararam na execução seguinte.
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal, engine
+
+ATIVO = os.getenv("AGENDADOR_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+
+logger = logging.getLogger("biblioteca.agendador")
+
+
+# --- Marca d'água dos jobs ---
+
+def ler_marca(db: Session, nome: str) -> Optional[str]:
+    return db.execute(select(models.JobMarca.valor).where(models.JobMarca.nome == nome)).scalar()
+
+def gravar_marca(db: Session, nome: str, valor: str) -> None:
+    """Grava a marca (sem commit: vai junto com o trabalho do job)."""
+    marca = db.get(models.JobMarca, nome)
+    if marca is None:
+        db.add(models.JobMarca(nome=nome, valor=valor, atualizado_em=datetime.now()))
+    else:
+        marca.valor = valor
+        marca.atualizado_em = datetime.now()
+
+
+# --- Agendador ---
+
+class Job:
+    def __init__(self, nome: str, funcao: Callable[[Session], dict], intervalo: float):
+        self.nome = nome
+        self.funcao = funcao
+        self.intervalo = intervalo
+        self.execucoes = 0
+        self.falhas = 0
+        self.puladas = 0
+        self.ultima_execucao: Optional[datetime] = None
+        self.ultima_duracao_ms: Optional[float] = None
+        self.ultimo_resultado: Optional[dict] = None
+        self.ultimo_erro: Optional[str] = None
+        self.em_execucao = threading.Lock()
+
+    def metricas(self) -> dict:
+        return {
+            "intervalo_segundos": self.intervalo,
+            "execucoes": self.execucoes,
+            "falhas": self.falhas,
+            "puladas_lock_ocupado": self.puladas,
+            "ultima_execucao": self.ultima_execucao,
+            "ultima_duracao_ms": self.ultima_duracao_ms,
+            "ultimo_resultado": self.ultimo_resultado,
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+class Agendador:
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._parar = threading.Event()
+        self._threads = []
+
+    def registrar(self, nome: str, funcao: Callable[[Session], dict], intervalo: float) -> None:
+        """'funcao' recebe uma sessão, faz o commit do próprio trabalho e devolve um resumo."""
+        self.jobs[nome] = Job(nome, funcao, intervalo)
+
+    def iniciar(self) -> None:
+        if not ATIVO or self._threads:
+            return
+        self._parar.clear()
+        for job in self.jobs.values():
+            thread = threading.Thread(target=self._laco, args=(job,), name=f"job-{job.nome}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def parar(self, espera: float = 10.0) -> None:
+        self._parar.set()
+        for thread in self._threads:
+            thread.join(timeout=espera)
+        self._threads = []
+
+    def _laco(self, job: Job) -> None:
+        # Primeira execução logo na subida; depois a cada 'intervalo'
+        while not self._parar.is_set():
+            self.executar(job.nome)
+            self._parar.wait(job.intervalo)
+
+    def executar(self, nome: str) -> Optional[dict]:
+        """
+        Roda o job agora (também usado pela rota de administração).
+        Retorna None se ele já estiver rodando (neste ou em outro processo) ou se falhar.
+        """
+        job = self.jobs[nome]
+        with _lock_job(job) as conseguiu:
+            if not conseguiu:
+                job.puladas += 1
+                return None
+            inicio = time.perf_counter()
+            db = SessionLocal()
+            try:
+                resultado = job.funcao(db)
+                job.execucoes += 1
+                job.ultimo_resultado = resultado
+                job.ultimo_erro = None
+                return resultado
+            except Exception as e:
+                db.rollback()
+                job.falhas += 1
+                job.ultimo_erro = str(e)
+                logger.exception("Falha no job %s", nome)
+                return None
+            finally:
+                db.close()
+                job.ultima_execucao = datetime.now()
+                job.ultima_duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    def metricas(self) -> dict:
+        return {"ativo": ATIVO, "jobs": {nome: job.metricas() for nome, job in self.jobs.items()}}
+
+
+@contextmanager
+def _lock_job(job: Job):
+    """Impede duas execuções simultâneas do mesmo job (threads e, no MySQL, processos)."""
+    if not job.em_execucao.acquire(blocking=False):
+        yield False
+        return
+    try:
+        if engine.dialect.name != "mysql":
+            yield True
+            return
+        # Conexão dedicada: o lock do MySQL pertence à conexão, e a sessão do
+        # job devolve a dela ao pool a cada commit
+        with engine.connect() as conexao:
+            nome_lock = f"job_{job.nome}"
+            if conexao.execute(text("SELECT GET_LOCK(:nome, 0)"), {"nome": nome_lock}).scalar() != 1:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                conexao.execute(text("SELECT RELEASE_LOCK(:nome)"), {"nome": nome_lock})
+    finally:
+        job.em_execucao.release()
+
+
+agendador = Agendador()
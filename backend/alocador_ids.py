@@ -0,0 +1,134 @@
+# alocador_ids.py
+# Alocação de IDs de livro (LIV-AAAA-NNNN) em blocos.
+#
+# Antes, cada create_livro fazia select + insert/commit + update/commit +
+# select na linha ('livro', ano) de seq_counters. Todos os cadastros
+# concorrentes disputavam essa mesma linha e uma falha entre os commits
+# queimava IDs.
+#
+# Agora cada processo reserva um BLOCO de valores com uma única instrução
+# atômica no banco e entrega os IDs do bloco a partir da memória:
+#   - MySQL: INSERT ... ON DUPLICATE KEY UPDATE seq_value = LAST_INSERT_ID(seq_value + n)
+#     cria o contador do ano se preciso, soma o bloco e devolve o novo
+#     valor em uma ida ao banco.
+#   - Outros bancos (ex.: SQLite nos benchmarks): UPDATE + SELECT na mesma transação.
+# Como o banco garante que dois blocos nunca se sobrepõem, vários workers
+# (processos) podem alocar ao mesmo tempo sem colisão. Na virada do ano o
+# resto do bloco antigo é descartado e um bloco do novo ano é reservado.
+#
+# Observação: os IDs continuam únicos e crescentes por processo, mas não
+# mais contíguos entre processos; o que sobrar do bloco quando o processo
+# termina não é reaproveitado (a mesma "lacuna" que um rollback já causava).
+import datetime
+import os
+import threading
+from typing import List
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+import models
+from database import engine
+
+TAMANHO_BLOCO = int(os.getenv("LIVRO_ID_BLOCO", "20"))
+
+
+class AlocadorIds:
+    def __init__(self, seq_name: str, prefixo: str, tamanho_bloco: int = TAMANHO_BLOCO):
+        self.seq_name = seq_name
+        self.prefixo = prefixo
+        self.tamanho_bloco = tamanho_bloco
+        self._lock = threading.Lock()
+        self._ano = None
+        self._proximo = 0   # Próximo valor a entregar
+        self._limite = 0    # Último valor do bloco atual (inclusive)
+        self.blocos_reservados = 0
+
+    # --- API pública ---
+
+    def proximo_id(self) -> str:
+        """Entrega um novo ID formatado (ex.: LIV-2025-0042)."""
+        return self.proximos_ids(1)[0]
+
+    def proximos_ids(self, quantidade: int) -> List[str]:
+        """
+        Entrega 'quantidade' IDs de uma vez (usado na importação em lote).
+        Se o bloco atual não bastar, reserva de uma só vez o que falta.
+        """
+        with self._lock:
+            ano = datetime.datetime.now().year
+            if ano != self._ano:
+                # Virada de ano: o que sobrou do bloco anterior não serve mais
+                self._ano = ano
+                self._proximo, self._limite = 0, -1
+
+            valores = []
+            while len(valores) < quantidade:
+                if self._proximo > self._limite:
+                    faltam = quantidade - len(valores)
+                    self._reservar_bloco(ano, max(self.tamanho_bloco, faltam))
+                fim = min(self._limite, self._proximo + quantidade - len(valores) - 1)
+                valores.extend(range(self._proximo, fim + 1))
+                self._proximo = fim + 1
+
+        return [self._formatar(ano, v) for v in valores]
+
+    # --- Internos ---
+
+    def _formatar(self, ano: int, valor: int) -> str:
+        return f"{self.prefixo}-{ano:04d}-{valor:04d}"
+
+    def _reservar_bloco(self, ano: int, tamanho: int) -> None:
+        """Reserva [ultimo - tamanho + 1, ultimo] no banco (chamado com o lock)."""
+        with engine.begin() as conn:
+            if conn.dialect.name == "mysql":
+                ultimo = self._reservar_mysql(conn, ano, tamanho)
+            else:
+                ultimo = self._reservar_generico(conn, ano, tamanho)
+        self._proximo = ultimo - tamanho + 1
+        self._limite = ultimo
+        self.blocos_reservados += 1
+
+    def _reservar_mysql(self, conn, ano: int, tamanho: int) -> int:
+        resultado = conn.execute(
+            text(
+                "INSERT INTO seq_counters (seq_name, seq_year, seq_value) "
+                "VALUES (:nome, :ano, LAST_INSERT_ID(:n)) "
+                "ON DUPLICATE KEY UPDATE seq_value = LAST_INSERT_ID(seq_value + :n)"
+            ),
+            {"nome": self.seq_name, "ano": ano, "n": tamanho},
+        )
+        ultimo = resultado.lastrowid
+        if not ultimo:
+            # Drivers que não repassam o LAST_INSERT_ID(expr) no lastrowid
+            ultimo = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar_one()
+        return int(ultimo)
+
+    def _reservar_generico(self, conn, ano: int, tamanho: int) -> int:
+        tabela = models.SeqCounters
+        filtro = (tabela.seq_name == self.seq_name, tabela.seq_year == ano)
+        atualizado = conn.execute(
+            update(tabela).where(*filtro).values(seq_value=tabela.seq_value + tamanho)
+        )
+        if atualizado.rowcount == 0:
+            # Primeiro bloco do ano: cria o contador já com o bloco reservado
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(tabela).values(seq_name=self.seq_name, seq_year=ano, seq_value=tamanho))
+                return tamanho
+            except IntegrityError:
+                # Outro processo criou o contador no meio do caminho
+                conn.execute(update(tabela).where(*filtro).values(seq_value=tabela.seq_value + tamanho))
+        return conn.execute(select(tabela.seq_value).where(*filtro)).scalar_one()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "ano": self._ano,
+                "tamanho_bloco": self.tamanho_bloco,
+                "restantes_no_bloco": max(0, self._limite - self._proximo + 1),
+                "blocos_reservados": self.blocos_reservados,
+            }
+
+
+alocador_livro = AlocadorIds(seq_name="livro", prefixo="LIV")
@@ -0,0 +1,78 @@
+# arquivamento.py
+# Move os empréstimos encerrados antigos de 'emprestimo' para
+# 'emprestimo_historico'.
+#
+# Empréstimos finalizados ficam em 'emprestimo' para sempre (ativo = FALSE).
+# Com o tempo, tudo o que lê a tabela quente fica mais lento: a contagem da
+# trigger trg_emprestimo_before_insert_limit, a listagem com ativo=true, a
+# view Emprestimos_Atrasados e o job de atrasos. Um job periódico
+# (agendador.py) move, em lotes com um commit cada, os empréstimos devolvidos
+# há mais de ARQUIVO_IDADE_DIAS:
+#   1. escolhe um lote pelo índice idx_emprestimo_devolucao
+#   2. copia as linhas para emprestimo_historico (INSERT ... SELECT)
+#   3. apaga as linhas de emprestimo_atrasado (FK) e de emprestimo
+# Cada rodada move no máximo ARQUIVO_LOTES_POR_RODADA lotes; o restante fica
+# para a rodada seguinte. Assim nenhuma transação segura a tabela por muito
+# tempo.
+#
+# O histórico de um cliente (projecoes.emprestimos_do_cliente) e a busca por
+# ID continuam vendo os empréstimos arquivados.
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+NOME_JOB = "arquivamento"
+INTERVALO_SEGUNDOS = float(os.getenv("ARQUIVO_INTERVALO_SEGUNDOS", "3600"))
+IDADE_DIAS = int(os.getenv("ARQUIVO_IDADE_DIAS", "365"))
+TAMANHO_LOTE = int(os.getenv("ARQUIVO_TAMANHO_LOTE", "1000"))
+LOTES_POR_RODADA = int(os.getenv("ARQUIVO_LOTES_POR_RODADA", "50"))
+
+# Colunas copiadas (arquivado_em fica com o padrão do banco)
+COLUNAS = [
+    "id_emprestimo", "id_exemplar", "id_cliente", "data_emprestimo", "data_prevista_devolucao",
+    "data_devolucao", "multa", "ativo", "criado_em",
+]
+
+
+def arquivar(db: Session) -> dict:
+    """Job: move os empréstimos devolvidos antes do corte para o histórico, em lotes."""
+    Emprestimo = models.Emprestimo
+    corte = datetime.now() - timedelta(days=IDADE_DIAS)
+    total = 0
+    lotes = 0
+    while lotes < LOTES_POR_RODADA:
+        ids = db.execute(
+            select(Emprestimo.id_emprestimo)
+            .where(Emprestimo.data_devolucao < corte, Emprestimo.ativo == False)
+            .limit(TAMANHO_LOTE)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(
+            insert(models.EmprestimoHistorico).from_select(
+                COLUNAS,
+                select(*[getattr(Emprestimo, coluna) for coluna in COLUNAS]).where(Emprestimo.id_emprestimo.in_(ids)),
+            )
+        )
+        db.execute(delete(models.EmprestimoAtrasado).where(models.EmprestimoAtrasado.id_emprestimo.in_(ids)))
+        db.execute(delete(Emprestimo).where(Emprestimo.id_emprestimo.in_(ids)))
+        db.commit()
+        total += len(ids)
+        lotes += 1
+        if len(ids) < TAMANHO_LOTE:
+            break
+    return {"arquivados": total, "lotes": lotes, "corte": corte.isoformat(timespec="seconds")}
+
+
+def resumo(db: Session) -> dict:
+    """Tamanho da tabela quente e do histórico (para acompanhar o arquivamento)."""
+    return {
+        "idade_dias": IDADE_DIAS,
+        "emprestimos": db.execute(select(func.count()).select_from(models.Emprestimo)).scalar_one(),
+        "historico": db.execute(select(func.count()).select_from(models.EmprestimoHistorico)).scalar_one(),
+        "historico_mais_recente": db.execute(select(func.max(models.EmprestimoHistorico.arquivado_em))).scalar(),
+    }
@@ -0,0 +1,152 @@
+# atrasos.py
+# Empréstimos atrasados e multas acumuladas até hoje, sem varrer 'emprestimo'.
+#
+# A view Emprestimos_Atrasados recalcula "data_prevista_devolucao < hoje"
+# sobre a tabela inteira a cada leitura. Aqui um job periódico (agendador.py)
+# mantém a tabela emprestimo_atrasado de forma incremental:
+#   1. inclui os empréstimos que venceram desde a última execução: faixa
+#      [data da marca, hoje) de data_prevista_devolucao, lida pelo índice
+#      idx_emprestimo_prevdev
+#   2. inclui os empréstimos criados desde a última execução que já nasceram
+#      vencidos (a API aceita qualquer data_prevista_devolucao): faixa de
+#      data_emprestimo a partir da marca, menos ATRASOS_MARGEM_SEGUNDOS
+#      (transações que gravaram antes da marca e confirmaram depois), lida
+#      pelo índice idx_emprestimo_data
+#   3. retira os que já foram devolvidos (só percorre a tabela materializada)
+#   4. avança a marca d'água para o início desta execução (relógio do banco)
+# Dias de atraso e multa dependem só da data prevista e de hoje, então são
+# calculados na leitura: nada precisa ser regravado a cada dia, e ordenar por
+# dias de atraso é ordenar pela data prevista (índice idx_atrasado_prevista).
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, func, insert, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+import agendador
+import models
+import paginacao
+
+NOME_JOB = "atrasos"
+INTERVALO_SEGUNDOS = float(os.getenv("ATRASOS_INTERVALO_SEGUNDOS", "300"))
+MARGEM_SEGUNDOS = float(os.getenv("ATRASOS_MARGEM_SEGUNDOS", "300"))
+# Mesma regra da trigger trg_emprestimo_before_update: R$ 1,00 por dia de atraso
+MULTA_POR_DIA = Decimal("1.00")
+
+
+def atualizar(db: Session, completo: bool = False) -> dict:
+    """
+    Executa uma rodada do job. Com 'completo=True' (ou na primeira execução)
+    ignora a marca d'água e confere todos os empréstimos vencidos.
+    """
+    Emprestimo, Atrasado = models.Emprestimo, models.EmprestimoAtrasado
+    hoje = date.today()
+    marca = None if completo else _ler_marca(db)
+    # Mesmo relógio que preenche data_emprestimo (DEFAULT CURRENT_TIMESTAMP)
+    inicio = db.execute(select(func.now())).scalar()
+
+    def incluir(*faixa) -> int:
+        return db.execute(
+            insert(Atrasado).from_select(
+                ["id_emprestimo", "id_exemplar", "id_cliente", "data_prevista_devolucao"],
+                select(
+                    Emprestimo.id_emprestimo,
+                    Emprestimo.id_exemplar,
+                    Emprestimo.id_cliente,
+                    Emprestimo.data_prevista_devolucao,
+                ).where(
+                    *faixa,
+                    Emprestimo.data_prevista_devolucao < hoje,
+                    Emprestimo.data_devolucao.is_(None),
+                    Emprestimo.ativo == True,
+                    ~exists().where(Atrasado.id_emprestimo == Emprestimo.id_emprestimo),
+                ),
+            )
+        ).rowcount
+
+    if marca is None:
+        incluidos = incluir()
+    else:
+        # 1. Vencidos desde a última execução
+        incluidos = incluir(Emprestimo.data_prevista_devolucao >= marca.date())
+        # 2. Criados desde a última execução já com a data prevista no passado
+        incluidos += incluir(Emprestimo.data_emprestimo >= marca - timedelta(seconds=MARGEM_SEGUNDOS))
+
+    # 3. Devolvidos saem da lista
+    removidos = db.execute(
+        delete(Atrasado).where(
+            exists().where(
+                Emprestimo.id_emprestimo == Atrasado.id_emprestimo,
+                or_(Emprestimo.ativo == False, Emprestimo.data_devolucao.is_not(None)),
+            )
+        )
+    ).rowcount
+
+    # 4. Marca d'água no mesmo commit
+    nova_marca = inicio.isoformat(timespec="seconds")
+    agendador.gravar_marca(db, NOME_JOB, nova_marca)
+    db.commit()
+    return {"incluidos": incluidos, "removidos": removidos, "marca": nova_marca, "completo": marca is None}
+
+
+def _ler_marca(db: Session) -> Optional[datetime]:
+    """Início da última execução (marcas antigas, só com a data, valem como meia-noite)."""
+    valor = agendador.ler_marca(db, NOME_JOB)
+    try:
+        return datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def listar(db: Session, ordem: str, cursor: Optional[str], limite: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    Página de atrasados ordenada por dias de atraso ('dias_desc' = mais
+    atrasados primeiro). Paginação por chave em (data_prevista, id_emprestimo).
+    """
+    Atrasado = models.EmprestimoAtrasado
+    chave = tuple_(Atrasado.data_prevista_devolucao, Atrasado.id_emprestimo)
+    stmt = (
+        select(
+            Atrasado.id_emprestimo,
+            Atrasado.id_exemplar,
+            Atrasado.id_cliente,
+            models.UsuarioCliente.nome.label("nome_cliente"),
+            Atrasado.data_prevista_devolucao,
+        )
+        .join(models.UsuarioCliente, models.UsuarioCliente.id_cliente == Atrasado.id_cliente)
+        # Devolvidos depois da última rodada do job não aparecem (junção pela PK)
+        .join(models.Emprestimo, models.Emprestimo.id_emprestimo == Atrasado.id_emprestimo)
+        .where(models.Emprestimo.ativo == True)
+    )
+
+    apos = paginacao.decodificar_cursor(cursor)
+    if apos is not None:
+        try:
+            valor = (date.fromisoformat(apos[0]), int(apos[1]))
+        except (TypeError, ValueError, IndexError):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+        stmt = stmt.where(chave > valor if ordem == "dias_desc" else chave < valor)
+
+    if ordem == "dias_desc":
+        stmt = stmt.order_by(Atrasado.data_prevista_devolucao, Atrasado.id_emprestimo)
+    else:
+        stmt = stmt.order_by(Atrasado.data_prevista_devolucao.desc(), Atrasado.id_emprestimo.desc())
+    linhas = db.execute(stmt.limit(limite + 1)).all()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo_cursor = paginacao.codificar_cursor(
+            [ultima.data_prevista_devolucao.isoformat(), ultima.id_emprestimo]
+        )
+
+    hoje = date.today()
+    itens = []
+    for linha in linhas:
+        dias = (hoje - linha.data_prevista_devolucao).days
+        itens.append({**linha._asdict(), "dias_atraso": dias, "multa_acumulada": dias * MULTA_POR_DIA})
+    return itens, proximo_cursor
@@ -0,0 +1,207 @@
+# auditoria.py
+# Trilha de auditoria gravada fora do caminho das requisições.
+#
+# Antes, só a trigger trg_emprestimo_after_insert escrevia em audit_log, e
+# dentro da transação de cada empréstimo; as ações da API (usuários, livros,
+# devoluções...) não ficavam registradas. Agora as rotas chamam
+# fila.registrar(...) depois do commit: o evento entra numa fila em memória
+# e a requisição segue. Uma thread gravadora junta os eventos e os grava em
+# audit_log com INSERTs de várias linhas:
+#   - a cada AUDITORIA_INTERVALO_SEGUNDOS, ou antes se juntar
+#     AUDITORIA_TAMANHO_LOTE eventos
+#   - a fila tem no máximo AUDITORIA_CAPACIDADE eventos; cheia (banco fora
+#     do ar, pico), a rota espera até AUDITORIA_ESPERA_MAXIMA_MS por espaço e,
+#     sem espaço, o evento é descartado e contado: a auditoria nunca trava
+#     um empréstimo
+#   - se a gravação falhar, o lote volta para o início da fila e é tentado
+#     de novo na rodada seguinte
+# A gravadora sobe e desce com a API (lifespan em main.py) e, ao parar,
+# grava o que ainda estiver na fila. Um evento aparece na consulta depois
+# da gravação do seu lote (em geral, em até um intervalo).
+import logging
+import os
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import models
+import paginacao
+from database import engine
+
+TAMANHO_LOTE = int(os.getenv("AUDITORIA_TAMANHO_LOTE", "500"))
+INTERVALO_SEGUNDOS = float(os.getenv("AUDITORIA_INTERVALO_SEGUNDOS", "1"))
+CAPACIDADE = int(os.getenv("AUDITORIA_CAPACIDADE", "10000"))
+ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("AUDITORIA_ESPERA_MAXIMA_MS", "50")) / 1000
+
+logger = logging.getLogger("biblioteca.auditoria")
+
+
+class FilaAuditoria:
+    def __init__(self):
+        self._eventos = deque()
+        self._condicao = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._parar = False
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.lotes = 0
+        self.falhas = 0
+        self.maior_fila = 0
+        self.ultimo_erro: Optional[str] = None
+
+    # --- Lado das rotas ---
+
+    def registrar(self, entidade: str, entidade_id, acao: str, descricao: Optional[str] = None,
+                  usuario: Optional[str] = None) -> None:
+        """Enfileira um evento (chame depois do commit da ação). Não acessa o banco."""
+        evento = {
+            "entidade": entidade,
+            "entidade_id": None if entidade_id is None else str(entidade_id),
+            "acao": acao,
+            "descricao": descricao,
+            "usuario": usuario,
+            "criado_em": datetime.now(),  # Hora da ação, não da gravação
+        }
+        if self._thread is None:
+            self.iniciar()
+        with self._condicao:
+            if len(self._eventos) >= CAPACIDADE:
+                self._condicao.notify_all()
+                self._condicao.wait_for(lambda: len(self._eventos) < CAPACIDADE, ESPERA_MAXIMA_SEGUNDOS)
+                if len(self._eventos) >= CAPACIDADE:
+                    self.descartados += 1
+                    if self.descartados % 1000 == 1:
+                        logger.warning("Fila de auditoria cheia: %d eventos descartados até agora", self.descartados)
+                    return
+            self._eventos.append(evento)
+            self.enfileirados += 1
+            self.maior_fila = max(self.maior_fila, len(self._eventos))
+            if len(self._eventos) >= TAMANHO_LOTE:
+                self._condicao.notify_all()
+
+    # --- Gravadora ---
+
+    def iniciar(self) -> None:
+        with self._condicao:
+            if self._thread is not None:
+                return
+            self._parar = False
+            self._thread = threading.Thread(target=self._laco, name="auditoria", daemon=True)
+            self._thread.start()
+
+    def parar(self, espera: float = 10.0) -> None:
+        """Grava o que restou na fila e encerra a gravadora."""
+        with self._condicao:
+            thread = self._thread
+            self._parar = True
+            self._condicao.notify_all()
+        if thread is not None:
+            thread.join(timeout=espera)
+        self._thread = None
+
+    def _laco(self) -> None:
+        while True:
+            with self._condicao:
+                if not self._parar and len(self._eventos) < TAMANHO_LOTE:
+                    self._condicao.wait(INTERVALO_SEGUNDOS)
+                parando = self._parar
+                lote = [self._eventos.popleft() for _ in range(min(TAMANHO_LOTE, len(self._eventos)))]
+                self._condicao.notify_all()  # Libera rotas esperando espaço
+            if lote and not self._gravar(lote) and parando:
+                logger.error("Auditoria encerrada com %d eventos não gravados", len(self._eventos) + len(lote))
+                return
+            if parando and not lote:
+                return
+
+    def _gravar(self, lote: List[dict]) -> bool:
+        try:
+            # Lista de dicts: o SQLAlchemy envia INSERTs de várias linhas
+            with engine.begin() as conexao:
+                conexao.execute(insert(models.AuditLog), lote)
+        except Exception as e:
+            self.falhas += 1
+            self.ultimo_erro = str(e)
+            logger.exception("Falha ao gravar %d eventos de auditoria", len(lote))
+            with self._condicao:
+                # Volta para o início da fila (os mais antigos primeiro), sem passar da capacidade
+                espaco = max(0, CAPACIDADE - len(self._eventos))
+                self._eventos.extendleft(reversed(lote[:espaco]))
+                self.descartados += len(lote) - min(espaco, len(lote))
+                # Espera um intervalo antes de tentar de novo
+                if not self._parar:
+                    self._condicao.wait(INTERVALO_SEGUNDOS)
+            return False
+        with self._condicao:
+            self.gravados += len(lote)
+            self.lotes += 1
+        return True
+
+    def metricas(self) -> dict:
+        with self._condicao:
+            return {
+                "na_fila": len(self._eventos),
+                "capacidade": CAPACIDADE,
+                "maior_fila": self.maior_fila,
+                "enfileirados": self.enfileirados,
+                "gravados": self.gravados,
+                "descartados": self.descartados,
+                "lotes": self.lotes,
+                "media_por_lote": round(self.gravados / self.lotes, 1) if self.lotes else 0,
+                "falhas": self.falhas,
+                "ultimo_erro": self.ultimo_erro,
+                "gravadora_ativa": self._thread is not None and self._thread.is_alive(),
+            }
+
+
+fila = FilaAuditoria()
+
+
+def registrar_circulacao(resultado, acao: str, usuario: Optional[str]) -> None:
+    """Um evento por empréstimo criado/finalizado com sucesso num lote (schemas.ResultadoCirculacao)."""
+    for item in resultado.itens:
+        if item.sucesso:
+            fila.registrar("Emprestimo", item.id_emprestimo, acao, f"Exemplar {item.codigo_barras}", usuario)
+
+
+# --- Consulta ---
+
+def listar(db: Session, cursor: Optional[str], limite: int, entidade: Optional[str] = None,
+           entidade_id: Optional[str] = None, acao: Optional[str] = None, usuario: Optional[str] = None,
+           de: Optional[date] = None, ate: Optional[date] = None) -> Tuple[List[models.AuditLog], Optional[str]]:
+    """
+    Eventos do mais recente para o mais antigo, paginados por id_log.
+    Filtros por entidade (+ id), ação e usuário usam os índices idx_audit_*.
+    """
+    Log = models.AuditLog
+    stmt = select(Log)
+    if entidade is not None:
+        stmt = stmt.where(Log.entidade == entidade)
+    if entidade_id is not None:
+        stmt = stmt.where(Log.entidade_id == entidade_id)
+    if acao is not None:
+        stmt = stmt.where(Log.acao == acao)
+    if usuario is not None:
+        stmt = stmt.where(Log.usuario == usuario)
+    if de is not None:
+        stmt = stmt.where(Log.criado_em >= de)
+    if ate is not None:
+        stmt = stmt.where(Log.criado_em < ate + timedelta(days=1))
+
+    apos = paginacao.decodificar_cursor(cursor)
+    if apos is not None:
+        if not isinstance(apos, int):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+        stmt = stmt.where(Log.id_log < apos)
+    eventos = db.execute(stmt.order_by(Log.id_log.desc()).limit(limite + 1)).scalars().all()
+
+    proximo_cursor = None
+    if len(eventos) > limite:
+        eventos = eventos[:limite]
+        proximo_cursor = paginacao.codificar_cursor(eventos[-1].id_log)
+    return eventos, proximo_cursor
@@ -0,0 +1,5 @@
+# benchmarks/
+# Scripts de medição de desempenho da API. Rode a partir da pasta 'backend':
+#   python -m benchmarks.<nome_do_script> --help
+#
+# Acervo sintético: benchmarks.dataset | Cargas por rota (p50/p95/p99): benchmarks.carga
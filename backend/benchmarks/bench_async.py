@@ -0,0 +1,138 @@
+# benchmarks/bench_async.py
+# Compara requisições/s e latência (p50/p99) das rotas síncronas
+# (/api/...) com as assíncronas (/api/async/...) sob concorrência.
+#
+# Por padrão roda a API em processo (httpx + ASGITransport) sobre SQLite
+# (síncrono) e aiosqlite (assíncrono), com um atraso artificial em cada
+# consulta (--atraso-ms) para simular consultas lentas: é nesse cenário que
+# o threadpool do modo síncrono vira o teto de concorrência.
+#
+# Para medir um servidor real (ex.: uvicorn + MySQL), suba a API com
+# DATABASE_URL e ASYNC_DATABASE_URL definidas e use --base-url.
+#
+# Requer: pip install httpx aiosqlite
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_async --concorrencia 200 --requisicoes 2000 --atraso-ms 20
+#   python -m benchmarks.bench_async --base-url http://localhost:8000
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_ARQUIVO_TEMP = os.path.join(tempfile.gettempdir(), "bench_async.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_ARQUIVO_TEMP}")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{_ARQUIVO_TEMP}")
+
+import httpx
+
+from benchmarks.medicao import percentil
+
+ROTAS = {
+    "sincrono": "/api/autores/?limit=50",
+    "assincrono": "/api/async/autores/?limit=50",
+}
+
+
+def preparar_em_processo(atraso_ms: float, concorrencia: int):
+    """Cria o banco SQLite, popula autores e injeta o atraso nas consultas."""
+    from sqlalchemy import create_engine, event, insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    import database
+    import models
+
+    # Pools de conexões do tamanho da concorrência nos dois modos, para que a
+    # comparação meça só threadpool x event loop (e não a espera por conexão)
+    database.engine = create_engine(database.DATABASE_URL, pool_size=concorrencia, max_overflow=0)
+    database.SessionLocal.configure(bind=database.engine)
+    database.async_engine = create_async_engine(database.ASYNC_DATABASE_URL, pool_size=concorrencia, max_overflow=0)
+    database.AsyncSessionLocal.configure(bind=database.async_engine)
+
+    models.Base.metadata.drop_all(database.engine)
+    models.Base.metadata.create_all(database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.Autor), [{"nome": f"Autor {i}"} for i in range(500)])
+
+    if atraso_ms:
+        def atrasar(_instrucao):
+            time.sleep(atraso_ms / 1000)
+
+        # O callback de trace do sqlite3 roda na thread que executa a consulta:
+        # no modo síncrono, a thread do threadpool; no assíncrono, a thread do
+        # aiosqlite. Assim o atraso se comporta como uma consulta lenta real,
+        # sem travar o event loop.
+        def instalar_atraso(conexao_dbapi, _registro):
+            bruta = getattr(getattr(conexao_dbapi, "_connection", None), "_conn", conexao_dbapi)
+            bruta.set_trace_callback(atrasar)
+
+        event.listen(database.engine, "connect", instalar_atraso)
+        event.listen(database.async_engine.sync_engine, "connect", instalar_atraso)
+
+    os.environ.setdefault("LIMITE_TAXA_ATIVO", "false")  # Mede a API, não o limite de requisições
+    import main
+    return httpx.ASGITransport(app=main.app)
+
+
+async def medir(cliente: httpx.AsyncClient, rota: str, requisicoes: int, concorrencia: int) -> dict:
+    latencias = []
+    erros = 0
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def uma():
+        nonlocal erros
+        async with semaforo:
+            inicio = time.perf_counter()
+            resposta = await cliente.get(rota)
+            if resposta.status_code != 200:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uma() for _ in range(requisicoes)))
+    decorrido = time.perf_counter() - inicio
+    return {
+        "req_s": requisicoes / decorrido,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "erros": erros,
+    }
+
+
+async def executar(args):
+    if args.base_url:
+        cliente = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        cliente = httpx.AsyncClient(transport=preparar_em_processo(args.atraso_ms, args.concorrencia),
+                                    base_url="http://bench", timeout=60)
+
+    async with cliente:
+        # Aquecimento (conexões do pool, caches)
+        for rota in ROTAS.values():
+            await cliente.get(rota)
+
+        print(f"requisições: {args.requisicoes} | concorrência: {args.concorrencia} | atraso por consulta: {args.atraso_ms} ms")
+        print(f"{'modo':>11} {'req/s':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'erros':>6}")
+        for modo, rota in ROTAS.items():
+            r = await medir(cliente, rota, args.requisicoes, args.concorrencia)
+            print(f"{modo:>11} {r['req_s']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['erros']:>6}")
+
+    if not args.base_url:
+        # Fecha as conexões do aiosqlite (as threads delas impedem o processo de terminar)
+        import database
+        await database.async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotas síncronas x assíncronas: req/s e p99.")
+    parser.add_argument("--requisicoes", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=100)
+    parser.add_argument("--atraso-ms", type=float, default=20.0,
+                        help="Atraso artificial por consulta (só no modo em processo)")
+    parser.add_argument("--base-url", default=None, help="Mede um servidor já em execução")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
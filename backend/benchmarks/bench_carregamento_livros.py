@@ -0,0 +1,137 @@
+# benchmarks/bench_carregamento_livros.py
+# Compara as estratégias de carregamento das relações de Livro:
+#   - joinedload em tudo (estratégia antiga de read_all_livros)
+#   - selectinload para autores/categorias + joinedload para editora (atual)
+#
+# Para cada tamanho de catálogo, percorre o catálogo inteiro em páginas
+# (como o frontend faria com o cursor) e mede:
+#   - linhas devolvidas pelo banco (somando todas as consultas emitidas)
+#   - tempo total e tempo médio por página
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_carregamento_livros --tamanhos 10000 100000 1000000
+#
+# Sem DATABASE_URL definida, usa um arquivo SQLite temporário.
+import argparse
+import os
+import tempfile
+import time
+
+# O banco precisa estar definido ANTES de importar database/models
+_ARQUIVO_TEMP = os.path.join(tempfile.gettempdir(), "bench_carregamento_livros.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_ARQUIVO_TEMP}")
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+from database import Base, SessionLocal, engine
+
+AUTORES_POR_LIVRO = 4
+CATEGORIAS_POR_LIVRO = 5
+TAMANHO_PAGINA = 1000
+LOTE_INSERCAO = 10000
+
+ESTRATEGIAS = {
+    "joinedload": lambda: (
+        joinedload(models.Livro.autores),
+        joinedload(models.Livro.categorias),
+        joinedload(models.Livro.editora),
+    ),
+    "selectinload": lambda: (
+        selectinload(models.Livro.autores),
+        selectinload(models.Livro.categorias),
+        joinedload(models.Livro.editora),
+    ),
+}
+
+
+def gerar_catalogo(n_livros: int) -> None:
+    """Recria as tabelas e popula um catálogo sintético com n_livros."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    n_autores = max(100, n_livros // 10)
+    n_categorias = 50
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Editora), [{"nome": f"Editora {i}"} for i in range(1, 101)])
+        conn.execute(insert(models.Autor), [{"nome": f"Autor {i}", "sobrenome": "Silva"} for i in range(1, n_autores + 1)])
+        conn.execute(insert(models.Categoria), [{"nome": f"Categoria {i}"} for i in range(1, n_categorias + 1)])
+
+        for inicio in range(0, n_livros, LOTE_INSERCAO):
+            fim = min(inicio + LOTE_INSERCAO, n_livros)
+            livros, autores, categorias = [], [], []
+            for i in range(inicio, fim):
+                id_livro = f"LIV-2025-{i:07d}"
+                livros.append({"id_livro": id_livro, "titulo": f"Livro {i}", "isbn": f"978-{i:010d}",
+                               "ano_publicacao": 1950 + i % 75, "id_editora": i % 100 + 1})
+                autores += [{"id_livro": id_livro, "id_autor": (i + k) % n_autores + 1}
+                            for k in range(AUTORES_POR_LIVRO)]
+                categorias += [{"id_livro": id_livro, "id_categoria": (i + k) % n_categorias + 1}
+                               for k in range(CATEGORIAS_POR_LIVRO)]
+            conn.execute(insert(models.Livro), livros)
+            conn.execute(insert(models.livro_autor_table), autores)
+            conn.execute(insert(models.livro_categoria_table), categorias)
+
+
+def medir(estrategia: str) -> dict:
+    """Percorre o catálogo em páginas e devolve linhas lidas e tempos."""
+    instrucoes = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        instrucoes.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capturar)
+    db = SessionLocal()
+    paginas = 0
+    livros = 0
+    try:
+        inicio = time.perf_counter()
+        apos = None
+        while True:
+            query = db.query(models.Livro).options(*ESTRATEGIAS[estrategia]())
+            if apos is not None:
+                query = query.filter(models.Livro.id_livro > apos)
+            pagina = query.order_by(models.Livro.id_livro).limit(TAMANHO_PAGINA).all()
+            if not pagina:
+                break
+            paginas += 1
+            livros += len(pagina)
+            apos = pagina[-1].id_livro
+            db.expunge_all()
+        decorrido = time.perf_counter() - inicio
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", capturar)
+
+    # Reexecuta as consultas capturadas (fora da medição) só para contar as linhas
+    linhas = 0
+    with engine.connect() as conn:
+        for statement, parameters in instrucoes:
+            linhas += len(conn.exec_driver_sql(statement, parameters).fetchall())
+
+    return {
+        "livros": livros,
+        "consultas": len(instrucoes),
+        "linhas": linhas,
+        "segundos": decorrido,
+        "ms_por_pagina": decorrido / max(paginas, 1) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara joinedload x selectinload na listagem de livros.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'livros':>9} {'estrategia':>13} {'consultas':>9} {'linhas':>10} {'linhas/livro':>12} {'total(s)':>9} {'ms/pag':>8}")
+    for tamanho in args.tamanhos:
+        gerar_catalogo(tamanho)
+        for estrategia in ESTRATEGIAS:
+            r = medir(estrategia)
+            print(f"{tamanho:>9} {estrategia:>13} {r['consultas']:>9} {r['linhas']:>10} "
+                  f"{r['linhas'] / max(r['livros'], 1):>12.1f} {r['segundos']:>9.2f} {r['ms_por_pagina']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
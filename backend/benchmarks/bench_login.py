@@ -0,0 +1,84 @@
+# benchmarks/bench_login.py
+# Mede a vazão de verificações de senha (o custo dominante do /token)
+# conforme o número de workers do pool_hash cresce até o número de núcleos.
+#
+# Para cada quantidade de workers, dispara N verificações concorrentes
+# (simulando uma rajada de logins na abertura da biblioteca) e reporta
+# logins/s, latência p50/p99 de cada verificação e pedidos recusados
+# pela fila limitada.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_login --logins 200 --rounds 12
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from passlib.context import CryptContext
+
+from benchmarks.medicao import percentil
+from pool_hash import PoolHash, PoolSaturadaError
+
+
+def medir(workers: int, logins: int, contexto: CryptContext, hash_salvo: str, fila_max: int) -> dict:
+    pool = PoolHash(max_workers=workers, fila_max=fila_max)
+    latencias = []
+    recusados = 0
+    lock = threading.Lock()
+
+    def login():
+        nonlocal recusados
+        inicio = time.perf_counter()
+        try:
+            pool.executar(contexto.verify, "senha-do-usuario", hash_salvo)
+        except PoolSaturadaError:
+            with lock:
+                recusados += 1
+            return
+        with lock:
+            latencias.append(time.perf_counter() - inicio)
+
+    # Uma thread por login simula os clientes chegando ao mesmo tempo
+    clientes = [threading.Thread(target=login) for _ in range(logins)]
+    inicio = time.perf_counter()
+    for cliente in clientes:
+        cliente.start()
+    for cliente in clientes:
+        cliente.join()
+    decorrido = time.perf_counter() - inicio
+    pool.encerrar()
+
+    return {
+        "atendidos": len(latencias),
+        "recusados": recusados,
+        "logins_s": len(latencias) / decorrido,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "media_ms": statistics.mean(latencias) * 1000 if latencias else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de login (bcrypt) por número de workers do pool_hash.")
+    parser.add_argument("--logins", type=int, default=64, help="Logins simultâneos por rodada")
+    parser.add_argument("--rounds", type=int, default=12, help="Custo do bcrypt (o padrão do passlib é 12)")
+    parser.add_argument("--fila-max", type=int, default=None,
+                        help="Fila do pool (padrão: cabe a rajada inteira, sem recusas)")
+    args = parser.parse_args()
+
+    contexto = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hash_salvo = contexto.hash("senha-do-usuario")
+
+    nucleos = os.cpu_count() or 1
+    opcoes = sorted({1, 2, 4, 8, 16, nucleos} & set(range(1, nucleos + 1)))
+    print(f"núcleos: {nucleos} | logins por rodada: {args.logins} | bcrypt rounds: {args.rounds}")
+    print(f"{'workers':>7} {'logins/s':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'recusados':>9}")
+    for workers in opcoes:
+        fila_max = args.fila_max if args.fila_max is not None else args.logins
+        r = medir(workers, args.logins, contexto, hash_salvo, fila_max)
+        print(f"{workers:>7} {r['logins_s']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['recusados']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_serializacao.py
+# Compara, por listagem, o caminho antigo e o caminho rápido de resposta:
+#   - antigo: query do ORM com as opções de carregamento da rota, validação
+#     pelo response_model (from_attributes) e json da biblioteca padrão,
+#     como o FastAPI faz
+#   - rápido: projeção em dicionários (projecoes.py) e serializacao.dumps
+#     (orjson, se instalado), sem revalidação; a linha 'fields=...' usa a
+#     seleção esparsa da tela de empréstimos
+#
+# Mede o tempo de uma página (consulta + serialização), as consultas SQL
+# emitidas e o tamanho do JSON, sobre o banco gerado por dataset.py.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.dataset --escala medio
+#   python -m benchmarks.bench_serializacao --linhas 1000 --repeticoes 5
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from benchmarks import medicao
+
+medicao.usar_banco_padrao()
+
+from pydantic import TypeAdapter
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import joinedload
+
+import consultas
+import models
+import paginacao
+import projecoes
+import schemas
+import serializacao
+from database import SessionLocal, engine
+
+CAMPOS_TELA_EMPRESTIMOS = "data_emprestimo,data_prevista_devolucao,ativo,cliente.nome,exemplar.livro.titulo"
+
+
+def _resposta_antiga(tipo, objetos) -> bytes:
+    adaptador = TypeAdapter(tipo)
+    conteudo = adaptador.dump_python(adaptador.validate_python(objetos, from_attributes=True), mode="json")
+    return json.dumps(conteudo, ensure_ascii=False).encode("utf-8")
+
+
+def listagens(db, linhas: int):
+    """(nome, caminho antigo, caminho rápido); cada caminho recebe a sessão e devolve os bytes."""
+    id_cliente = db.execute(
+        select(models.Emprestimo.id_cliente).group_by(models.Emprestimo.id_cliente)
+        .order_by(func.count().desc()).limit(1)
+    ).scalar()
+    id_livro = db.execute(select(models.Exemplar.id_livro).limit(1)).scalar()
+    Livros, Emprestimos = List[schemas.Livro], List[schemas.Emprestimo]
+
+    return [
+        ("GET /api/livros/",
+         lambda s: _resposta_antiga(Livros, paginacao.paginar(
+             s.query(models.Livro).options(*consultas.opcoes_livro()), models.Livro.id_livro, None, linhas)[0]),
+         lambda s: serializacao.dumps(projecoes.pagina_livros(s, None, linhas)[0])),
+        ("GET /api/emprestimos/",
+         lambda s: _resposta_antiga(Emprestimos, paginacao.paginar(
+             s.query(models.Emprestimo).options(joinedload(models.Emprestimo.cliente),
+                                               joinedload(models.Emprestimo.exemplar)),
+             models.Emprestimo.id_emprestimo, None, linhas)[0]),
+         lambda s: serializacao.dumps(projecoes.pagina_emprestimos(s, None, None, linhas)[0])),
+        # A tabela da tela de empréstimos: só as colunas que ela mostra
+        ("GET /api/emprestimos/?fields=...",
+         lambda s: _resposta_antiga(Emprestimos, paginacao.paginar(
+             s.query(models.Emprestimo).options(joinedload(models.Emprestimo.cliente),
+                                               joinedload(models.Emprestimo.exemplar)),
+             models.Emprestimo.id_emprestimo, None, linhas)[0]),
+         lambda s: serializacao.dumps(projecoes.pagina_emprestimos(s, None, None, linhas, projecoes.selecao(
+             projecoes.EMPRESTIMO, CAMPOS_TELA_EMPRESTIMOS))[0])),
+        (f"GET /api/emprestimos/por-cliente/{id_cliente}",
+         lambda s: _resposta_antiga(Emprestimos, s.query(models.Emprestimo).options(
+             joinedload(models.Emprestimo.exemplar)).filter(models.Emprestimo.id_cliente == id_cliente).all()),
+         lambda s: serializacao.dumps(projecoes.emprestimos_do_cliente(s, id_cliente))),
+        ("GET /api/clientes/",
+         lambda s: _resposta_antiga(List[schemas.UsuarioCliente], paginacao.paginar(
+             s.query(models.UsuarioCliente), models.UsuarioCliente.id_cliente, None, linhas)[0]),
+         lambda s: serializacao.dumps(projecoes.pagina_clientes(s, None, linhas)[0])),
+        (f"GET /api/exemplares/por-livro/{id_livro}",
+         lambda s: _resposta_antiga(List[schemas.Exemplar], s.query(models.Exemplar).options(
+             joinedload(models.Exemplar.livro).options(*consultas.opcoes_livro()))
+             .filter(models.Exemplar.id_livro == id_livro).all()),
+         lambda s: serializacao.dumps(projecoes.exemplares_do_livro(s, id_livro))),
+    ]
+
+
+def medir(caminho, repeticoes: int) -> dict:
+    consultas_emitidas = 0
+
+    def contar(*_):
+        nonlocal consultas_emitidas
+        consultas_emitidas += 1
+
+    tempos = []
+    tamanho = 0
+    for _ in range(repeticoes):
+        db = SessionLocal()  # Sessão nova: sem objetos reaproveitados do identity map
+        consultas_emitidas = 0
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            inicio = time.perf_counter()
+            tamanho = len(caminho(db))
+            tempos.append(time.perf_counter() - inicio)
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+            db.close()
+    return {"ms": statistics.median(tempos) * 1000, "consultas": consultas_emitidas, "bytes": tamanho}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caminho antigo (ORM + response_model) x projeção + orjson.")
+    parser.add_argument("--linhas", type=int, default=1000, help="Tamanho da página das listagens")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Execuções por caminho (vale a mediana)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        casos = listagens(db, args.linhas)
+    finally:
+        db.close()
+
+    print(f"página: {args.linhas} linhas | codificador: {'orjson' if serializacao.orjson else 'json'}")
+    print(f"{'listagem':<46} {'antigo(ms)':>10} {'rápido(ms)':>10} {'ganho':>6} {'consultas':>11} {'KB':>7}")
+    for nome, antigo, rapido in casos:
+        a, r = medir(antigo, args.repeticoes), medir(rapido, args.repeticoes)
+        print(f"{nome:<46} {a['ms']:>10.1f} {r['ms']:>10.1f} {a['ms'] / max(r['ms'], 1e-6):>5.1f}x "
+              f"{a['consultas']:>5} -> {r['consultas']:<3} {r['bytes'] / 1024:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
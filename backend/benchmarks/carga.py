@@ -0,0 +1,402 @@
+# benchmarks/carga.py
+# Cargas de trabalho roteirizadas contra a API, com vazão e latência
+# p50/p95/p99 por rota.
+#
+# Cenários:
+#   catalogo    navegação no acervo: listagem paginada, busca, disponibilidade,
+#               exemplares por livro, autores, categorias e painel
+#   login       rajada de logins (/token) com os usuários bench_*
+#   circulacao  empréstimo + devolução no balcão e em lote, atrasados e
+#               histórico por cliente
+#   gestao      reservas (criar, posição, fila, cancelar), importação de um
+#               CSV pequeno, exportação, auditoria, rotas /api/async e
+#               painéis /api/admin
+#   misto       catálogo, circulação e login (70% / 25% / 5%)
+#   completo    o misto com 10% de gestão: passa por todas as rotas acima
+#
+# Ficam de fora os cadastros simples (POST de clientes, autores, editoras,
+# categorias, usuários e livros avulsos), DELETE /api/admin/perfil e
+# POST /api/admin/agendador/{job}/executar: não são caminhos quentes e
+# alterariam o banco ou os números medidos a cada rodada.
+#
+# Cada "usuário virtual" (--concorrencia) repete operações sorteadas pelo
+# peso do cenário até acabar o tempo (--duracao). Antes da medição, cada
+# operação roda uma vez para aquecer caches, índices e o pool de conexões.
+#
+# Por padrão a API roda em processo (httpx + ASGITransport) sobre o banco
+# gerado por dataset.py (SQLite em medicao.ARQUIVO_PADRAO ou DATABASE_URL).
+# Para medir um servidor real (ex.: uvicorn + MySQL), use --base-url; a
+# amostra de livros, clientes e exemplares continua sendo lida de
+# DATABASE_URL, que deve apontar para o mesmo banco. Suba esse servidor
+# com LIMITE_TAXA_ATIVO=false, senão a carga esbarra no limite de requisições.
+#
+# Acompanhamento de regressões: --saida grava o resultado em JSON e
+# --comparar confronta o p95 de cada rota com um resultado anterior
+# (código de saída 1 se alguma rota piorar mais que --tolerancia).
+#
+# Observação: no SQLite não há triggers nem procedures, então a circulação
+# não exercita as regras do banco (limite de empréstimos, status do
+# exemplar) nem a devolução (CALL finalizar_emprestimo falha e conta como erro).
+# As rotas /api/async rodam em processo com aiosqlite; contra um servidor
+# real, ele precisa ter ASYNC_DATABASE_URL definida.
+#
+# Requer: pip install httpx
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.dataset --escala medio
+#   python -m benchmarks.carga --cenario misto --duracao 30 --concorrencia 50 --saida base.json
+#   python -m benchmarks.carga --cenario misto --comparar base.json
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta
+
+from benchmarks import medicao
+
+medicao.usar_banco_padrao()
+# Rotas /api/async sobre o mesmo arquivo SQLite, se o aiosqlite estiver instalado
+if os.environ["DATABASE_URL"].startswith("sqlite:///") and importlib.util.find_spec("aiosqlite"):
+    os.environ.setdefault("ASYNC_DATABASE_URL",
+                          os.environ["DATABASE_URL"].replace("sqlite:///", "sqlite+aiosqlite:///", 1))
+
+import httpx
+from sqlalchemy import func, select
+
+import models
+from benchmarks.dataset import N_USUARIOS, PALAVRAS, SENHA
+from database import SessionLocal, engine
+
+TAMANHO_AMOSTRA = 2000
+TAMANHO_PAGINA = 50
+LIVROS_POR_IMPORTACAO = 5
+PAINEIS_ADMIN = ["pool", "perfil", "limite-taxa", "estado-compartilhado", "cache-referencia", "agendador"]
+
+
+class Estado:
+    """Amostra do banco e medições da rodada (compartilhado entre os usuários virtuais)."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.token = None
+        self.medindo = False
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.importacoes = 0
+
+        db = SessionLocal()
+        try:
+            self.livros = db.execute(
+                select(models.Livro.id_livro).order_by(func.random()).limit(TAMANHO_AMOSTRA)
+            ).scalars().all()
+            self.clientes = db.execute(
+                select(models.UsuarioCliente.id_cliente).order_by(func.random()).limit(TAMANHO_AMOSTRA)
+            ).scalars().all()
+            # Circulação: exemplares disponíveis e clientes sem empréstimo ativo, retirados
+            # de filas e devolvidos a elas ao fim de cada operação (sem disputa entre usuários)
+            self.codigos_livres = deque(db.execute(
+                select(models.Exemplar.codigo_barras)
+                .where(models.Exemplar.status == models.StatusExemplarEnum.Disponível)
+                .order_by(func.random()).limit(TAMANHO_AMOSTRA)
+            ).scalars().all())
+            com_ativo = select(models.Emprestimo.id_cliente).where(models.Emprestimo.ativo == True)
+            self.clientes_livres = deque(db.execute(
+                select(models.UsuarioCliente.id_cliente, models.UsuarioCliente.cpf)
+                .where(models.UsuarioCliente.id_cliente.not_in(com_ativo))
+                .order_by(func.random()).limit(TAMANHO_AMOSTRA)
+            ).all())
+            # Reservas só valem para exemplares fora da estante
+            self.exemplares_reservaveis = db.execute(
+                select(models.Exemplar.id_exemplar)
+                .where(models.Exemplar.status.in_([models.StatusExemplarEnum.Emprestado,
+                                                   models.StatusExemplarEnum.Reservado]))
+                .order_by(func.random()).limit(TAMANHO_AMOSTRA)
+            ).scalars().all()
+        finally:
+            db.close()
+        if not self.livros:
+            sys.exit("Banco vazio: gere os dados antes com 'python -m benchmarks.dataset'.")
+
+    @property
+    def cabecalhos(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def chamar(self, cliente: httpx.AsyncClient, rota: str, metodo: str, url: str, **kwargs) -> httpx.Response:
+        """Executa a requisição e registra a latência sob o nome da rota (ex.: 'GET /api/livros/')."""
+        kwargs.setdefault("headers", self.cabecalhos)
+        inicio = time.perf_counter()
+        resposta = await cliente.request(metodo, url, **kwargs)
+        if self.medindo:
+            self.latencias[rota].append(time.perf_counter() - inicio)
+            if resposta.status_code >= 400:
+                self.erros[rota] += 1
+        return resposta
+
+
+# --- Operações ---
+
+async def navegar_catalogo(cliente, estado):
+    # Primeira página e a seguinte pelo cursor, como o frontend faz
+    resposta = await estado.chamar(cliente, "GET /api/livros/", "GET", f"/api/livros/?limit={TAMANHO_PAGINA}")
+    cursor = resposta.headers.get("X-Next-Cursor")
+    if cursor:
+        await estado.chamar(cliente, "GET /api/livros/", "GET", "/api/livros/",
+                            params={"limit": TAMANHO_PAGINA, "cursor": cursor})
+
+async def buscar(cliente, estado):
+    palavra = estado.rng.choice(PALAVRAS)
+    if estado.rng.random() < 0.3:
+        palavra = palavra[:3]  # Digitação incompleta: casa por prefixo
+    await estado.chamar(cliente, "GET /api/livros/search", "GET", "/api/livros/search",
+                        params={"q": palavra, "limit": TAMANHO_PAGINA})
+
+async def disponibilidade(cliente, estado):
+    await estado.chamar(cliente, "GET /api/disponibilidade/{livro_id}", "GET",
+                        f"/api/disponibilidade/{estado.rng.choice(estado.livros)}")
+
+async def disponibilidade_lote(cliente, estado):
+    ids = estado.rng.sample(estado.livros, min(50, len(estado.livros)))
+    await estado.chamar(cliente, "POST /api/disponibilidade/lote", "POST", "/api/disponibilidade/lote",
+                        json={"ids_livros": ids})
+
+async def exemplares_do_livro(cliente, estado):
+    await estado.chamar(cliente, "GET /api/exemplares/por-livro/{livro_id}", "GET",
+                        f"/api/exemplares/por-livro/{estado.rng.choice(estado.livros)}")
+
+async def autores(cliente, estado):
+    await estado.chamar(cliente, "GET /api/autores/", "GET", f"/api/autores/?limit={TAMANHO_PAGINA}")
+
+async def categorias(cliente, estado):
+    await estado.chamar(cliente, "GET /api/categorias/", "GET", "/api/categorias/")
+
+async def painel(cliente, estado):
+    await estado.chamar(cliente, "GET /api/stats", "GET", "/api/stats")
+
+async def login(cliente, estado):
+    usuario = f"bench_{estado.rng.randrange(N_USUARIOS)}"
+    await estado.chamar(cliente, "POST /token", "POST", "/token", headers={},
+                        data={"username": usuario, "password": SENHA})
+
+async def ciclo_balcao(cliente, estado):
+    if not estado.codigos_livres or not estado.clientes_livres:
+        return
+    codigo = estado.codigos_livres.popleft()
+    id_cliente, cpf = estado.clientes_livres.popleft()
+    try:
+        prevista = (date.today() + timedelta(days=14)).isoformat()
+        resposta = await estado.chamar(cliente, "POST /api/balcao/emprestimos", "POST", "/api/balcao/emprestimos",
+                                       json={"codigo_barras": codigo, "cpf": cpf, "data_prevista_devolucao": prevista})
+        if resposta.status_code < 400:
+            await estado.chamar(cliente, "POST /api/balcao/devolucoes", "POST", "/api/balcao/devolucoes",
+                                json={"codigo_barras": codigo})
+    finally:
+        estado.codigos_livres.append(codigo)
+        estado.clientes_livres.append((id_cliente, cpf))
+
+async def ciclo_lote(cliente, estado):
+    if len(estado.codigos_livres) < 3 or not estado.clientes_livres:
+        return
+    codigos = [estado.codigos_livres.popleft() for _ in range(3)]
+    id_cliente, cpf = estado.clientes_livres.popleft()
+    try:
+        prevista = (date.today() + timedelta(days=14)).isoformat()
+        await estado.chamar(cliente, "POST /api/emprestimos/lote", "POST", "/api/emprestimos/lote",
+                            json={"id_cliente": id_cliente, "codigos_barras": codigos,
+                                  "data_prevista_devolucao": prevista})
+        await estado.chamar(cliente, "POST /api/emprestimos/devolucoes/lote", "POST",
+                            "/api/emprestimos/devolucoes/lote", json={"codigos_barras": codigos})
+    finally:
+        estado.codigos_livres.extend(codigos)
+        estado.clientes_livres.append((id_cliente, cpf))
+
+async def atrasados(cliente, estado):
+    await estado.chamar(cliente, "GET /api/emprestimos/atrasados", "GET",
+                        f"/api/emprestimos/atrasados?limit={TAMANHO_PAGINA}")
+
+async def historico_cliente(cliente, estado):
+    await estado.chamar(cliente, "GET /api/emprestimos/por-cliente/{cliente_id}", "GET",
+                        f"/api/emprestimos/por-cliente/{estado.rng.choice(estado.clientes)}")
+
+async def ciclo_reserva(cliente, estado):
+    if not estado.exemplares_reservaveis:
+        return
+    id_exemplar = estado.rng.choice(estado.exemplares_reservaveis)
+    resposta = await estado.chamar(cliente, "POST /api/reservas/", "POST", "/api/reservas/",
+                                   json={"id_exemplar": id_exemplar, "id_cliente": estado.rng.choice(estado.clientes)})
+    if resposta.status_code >= 400:
+        return
+    id_reserva = resposta.json()["id_reserva"]
+    await estado.chamar(cliente, "GET /api/reservas/{reserva_id}/posicao", "GET",
+                        f"/api/reservas/{id_reserva}/posicao")
+    await estado.chamar(cliente, "GET /api/reservas/fila/{exemplar_id}", "GET",
+                        f"/api/reservas/fila/{id_exemplar}")
+    # Cancelada no fim, para a fila não crescer a cada rodada
+    await estado.chamar(cliente, "POST /api/reservas/{reserva_id}/cancelar", "POST",
+                        f"/api/reservas/{id_reserva}/cancelar")
+
+async def importar(cliente, estado):
+    # Livros sem exemplares: não mexem na amostra de códigos da circulação
+    estado.importacoes += 1
+    prefixo = f"bench-{os.getpid()}-{time.time_ns()}-{estado.importacoes}"
+    linhas = ["titulo,isbn"] + [f"{estado.rng.choice(PALAVRAS)} {prefixo} {i},{prefixo}-{i}"
+                                for i in range(LIVROS_POR_IMPORTACAO)]
+    await estado.chamar(cliente, "POST /api/livros/importar", "POST", "/api/livros/importar",
+                        files={"arquivo": ("carga.csv", "\n".join(linhas).encode(), "text/csv")})
+
+async def exportar(cliente, estado):
+    # Última semana de empréstimos: percorre o índice por data, não a tabela inteira
+    de = (date.today() - timedelta(days=7)).isoformat()
+    await estado.chamar(cliente, "GET /api/admin/exportacao/{tabela}", "GET",
+                        "/api/admin/exportacao/emprestimos", params={"de": de})
+
+async def auditoria(cliente, estado):
+    await estado.chamar(cliente, "GET /api/admin/auditoria", "GET", f"/api/admin/auditoria?limit={TAMANHO_PAGINA}")
+
+async def rotas_async(cliente, estado):
+    sorteio = estado.rng.random()
+    if sorteio < 0.5:
+        await estado.chamar(cliente, "GET /api/async/livros/", "GET", f"/api/async/livros/?limit={TAMANHO_PAGINA}")
+    elif sorteio < 0.75:
+        await estado.chamar(cliente, "GET /api/async/clientes/{cliente_id}", "GET",
+                            f"/api/async/clientes/{estado.rng.choice(estado.clientes)}")
+    else:
+        await estado.chamar(cliente, "GET /api/async/emprestimos/por-cliente/{cliente_id}", "GET",
+                            f"/api/async/emprestimos/por-cliente/{estado.rng.choice(estado.clientes)}")
+
+async def paineis_admin(cliente, estado):
+    painel = estado.rng.choice(PAINEIS_ADMIN)
+    await estado.chamar(cliente, f"GET /api/admin/{painel}", "GET", f"/api/admin/{painel}")
+
+
+# Cenários: (peso, operação)
+CATALOGO = [(30, navegar_catalogo), (25, buscar), (15, disponibilidade), (10, disponibilidade_lote),
+            (10, exemplares_do_livro), (5, autores), (3, categorias), (2, painel)]
+CIRCULACAO = [(60, ciclo_balcao), (10, ciclo_lote), (15, atrasados), (15, historico_cliente)]
+GESTAO = [(30, ciclo_reserva), (5, importar), (5, exportar), (15, auditoria), (30, rotas_async), (15, paineis_admin)]
+# Mesmos pesos de antes no misto, para os resultados já guardados continuarem comparáveis
+MISTO = ([(p * 70 / 100, op) for p, op in CATALOGO]
+         + [(p * 25 / 100, op) for p, op in CIRCULACAO]
+         + [(5, login)])
+CENARIOS = {
+    "catalogo": CATALOGO,
+    "login": [(1, login)],
+    "circulacao": CIRCULACAO,
+    "gestao": GESTAO,
+    "misto": MISTO,
+    "completo": [(p * 90 / 100, op) for p, op in MISTO] + [(p * 10 / 100, op) for p, op in GESTAO],
+}
+
+
+# --- Execução ---
+
+def _cliente_http(base_url):
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=60)
+    # A carga vem toda do mesmo IP e de poucos usuários: o limite de requisições mediria só os 429
+    os.environ.setdefault("LIMITE_TAXA_ATIVO", "false")
+    import main  # Só agora: o banco já está definido
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60)
+
+
+async def executar(args) -> dict:
+    estado = Estado(random.Random(args.semente))
+    pesos, operacoes = zip(*CENARIOS[args.cenario])
+
+    async with _cliente_http(args.base_url) as cliente:
+        resposta = await cliente.post("/token", data={"username": "bench_admin", "password": SENHA})
+        if resposta.status_code != 200:
+            sys.exit("Falha no login de bench_admin: gere os dados com 'python -m benchmarks.dataset'.")
+        estado.token = resposta.json()["access_token"]
+
+        for operacao in operacoes:  # Aquecimento
+            await operacao(cliente, estado)
+
+        async def usuario_virtual(fim):
+            while time.perf_counter() < fim:
+                operacao = estado.rng.choices(operacoes, weights=pesos)[0]
+                await operacao(cliente, estado)
+
+        estado.medindo = True
+        inicio = time.perf_counter()
+        fim = inicio + args.duracao
+        await asyncio.gather(*(usuario_virtual(fim) for _ in range(args.concorrencia)))
+        decorrido = time.perf_counter() - inicio
+
+    if not args.base_url:
+        import database
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+
+    rotas = {rota: medicao.resumir(latencias, decorrido, estado.erros[rota])
+             for rota, latencias in sorted(estado.latencias.items())}
+    todas = [valor for latencias in estado.latencias.values() for valor in latencias]
+    return {
+        "meta": {
+            "cenario": args.cenario,
+            "concorrencia": args.concorrencia,
+            "duracao_s": round(decorrido, 2),
+            "banco": engine.dialect.name,
+            "alvo": args.base_url or "em processo",
+            "livros": len(estado.livros),
+            "executado_em": datetime.now().isoformat(timespec="seconds"),
+        },
+        "rotas": rotas,
+        "total": medicao.resumir(todas, decorrido, sum(estado.erros.values())),
+    }
+
+
+def imprimir(resultado: dict) -> None:
+    meta = resultado["meta"]
+    print(f"cenário: {meta['cenario']} | concorrência: {meta['concorrencia']} | "
+          f"duração: {meta['duracao_s']}s | banco: {meta['banco']} | alvo: {meta['alvo']}")
+    print(f"{'rota':<52} {'req':>7} {'req/s':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'p99(ms)':>8} {'erros':>6}")
+    for rota, r in list(resultado["rotas"].items()) + [("TOTAL", resultado["total"])]:
+        print(f"{rota:<52} {r['requisicoes']:>7} {r['req_s']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['erros']:>6}")
+
+
+def comparar(resultado: dict, arquivo: str, tolerancia: float) -> bool:
+    """Compara o p95 de cada rota com um resultado salvo. Devolve True se houve regressão."""
+    with open(arquivo, encoding="utf-8") as f:
+        base = json.load(f)["rotas"]
+    regressao = False
+    print(f"\n{'rota':<52} {'p95 base':>9} {'p95 agora':>9} {'variação':>9}")
+    for rota, r in resultado["rotas"].items():
+        if rota not in base or not base[rota]["p95_ms"]:
+            continue
+        variacao = (r["p95_ms"] / base[rota]["p95_ms"] - 1) * 100
+        piorou = variacao > tolerancia
+        regressao |= piorou
+        print(f"{rota:<52} {base[rota]['p95_ms']:>9.1f} {r['p95_ms']:>9.1f} {variacao:>+8.1f}%"
+              + ("  <- REGRESSÃO" if piorou else ""))
+    return regressao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cargas roteirizadas contra a API: req/s e p50/p95/p99 por rota.")
+    parser.add_argument("--cenario", choices=CENARIOS, default="misto")
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos de medição")
+    parser.add_argument("--concorrencia", type=int, default=20, help="Usuários virtuais simultâneos")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--base-url", default=None, help="Mede um servidor já em execução")
+    parser.add_argument("--saida", default=None, help="Grava o resultado em JSON")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="Piora aceitável do p95, em %%")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    imprimir(resultado)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if args.comparar and comparar(resultado, args.comparar, args.tolerancia):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# benchmarks/dataset.py
+# Gerador de acervos sintéticos para os benchmarks, em escalas fixas:
+#
+#   escala    livros     exemplares*  clientes  empréstimos (histórico)
+#   pequeno   1.000      ~2.000       500       10.000
+#   medio     10.000     ~20.000      5.000     100.000
+#   grande    100.000    ~200.000     50.000    1.000.000
+#   enorme    1.000.000  ~2.000.000   200.000   10.000.000
+#   (* de 1 a 3 exemplares por livro)
+#
+# Além do catálogo (editoras, autores, categorias, livros e exemplares), gera
+# ANOS anos de histórico de empréstimos já devolvidos, os empréstimos ativos
+# (parte deles atrasada), reservas na fila, exemplares perdidos e os usuários
+# do sistema para o teste de login (bench_admin e bench_0..N, senha "bench").
+# Tudo sai de um gerador com semente fixa: a mesma escala e a mesma semente
+# produzem sempre o mesmo banco, para comparar medições entre versões.
+#
+# Bancos:
+#   - Sem DATABASE_URL, usa um arquivo SQLite (medicao.ARQUIVO_PADRAO), que o
+#     carga.py usa por padrão. As tabelas são recriadas a cada geração.
+#   - Com DATABASE_URL apontando para um MySQL criado pelo biblioteca_db.sql,
+#     as tabelas são esvaziadas (não recriadas, para manter triggers e
+#     procedures). O histórico é inserido em lotes sem exemplar repetido, já
+#     que a trigger de empréstimo exige o exemplar 'Disponível'.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.dataset --escala medio
+#   DATABASE_URL=mysql://... python -m benchmarks.dataset --escala grande --anos 5
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import medicao
+
+medicao.usar_banco_padrao()
+
+from sqlalchemy import delete, insert, update
+
+import atrasos
+import models
+import reservas
+import security
+from database import Base, SessionLocal, engine
+
+ESCALAS = {
+    "pequeno": {"livros": 1_000, "clientes": 500, "emprestimos": 10_000},
+    "medio": {"livros": 10_000, "clientes": 5_000, "emprestimos": 100_000},
+    "grande": {"livros": 100_000, "clientes": 50_000, "emprestimos": 1_000_000},
+    "enorme": {"livros": 1_000_000, "clientes": 200_000, "emprestimos": 10_000_000},
+}
+LOTE_INSERCAO = 10_000
+N_CATEGORIAS = 50
+N_USUARIOS = 100
+SENHA = "bench"
+PRAZO_DIAS = 14
+FRACAO_ATIVOS = 0.08      # Exemplares emprestados agora
+FRACAO_RESERVADOS = 0.2   # Empréstimos ativos com alguém na fila
+FRACAO_PERDIDOS = 0.01
+
+# Vocabulário dos títulos: palavras repetidas entre livros, como num acervo
+# real, para que a busca por palavra (e por prefixo) tenha o que casar
+PALAVRAS = (
+    "amor guerra mar sombra casa tempo noite cidade memória viagem jardim rio "
+    "segredo história vida morte sol lua caminho sertão ilha fogo vento pedra "
+    "coração janela estrela silêncio verão inverno ação canção ouro sonho "
+    "livro carta menino menina rei rainha campo porto montanha deserto"
+).split()
+NOMES = "Ana Bruno Carla Diego Elisa Fábio Gabriela Heitor Irene João Lúcia Marcos Nina Otávio Paula Rafael".split()
+SOBRENOMES = "Silva Souza Oliveira Santos Lima Pereira Costa Almeida Ribeiro Gomes Martins Araújo Barbosa Rocha".split()
+
+
+def _em_lotes(conn, tabela, linhas):
+    for inicio in range(0, len(linhas), LOTE_INSERCAO):
+        conn.execute(insert(tabela), linhas[inicio:inicio + LOTE_INSERCAO])
+
+
+def limpar() -> None:
+    """SQLite: recria as tabelas. Outros bancos: apaga as linhas (mantém triggers e procedures)."""
+    if engine.dialect.name == "sqlite":
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        return
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for tabela in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(tabela))
+
+
+def gerar_catalogo(rng: random.Random, n_livros: int) -> dict:
+    """Editoras, autores, categorias, livros (com autores/categorias) e exemplares."""
+    n_autores = max(100, n_livros // 10)
+    n_editoras = max(20, n_livros // 500)
+    ano_ids = date.today().year - 1  # Fora do ano corrente: não colide com o alocador_ids
+
+    with engine.begin() as conn:
+        _em_lotes(conn, models.Editora, [{"nome": f"Editora {i}"} for i in range(1, n_editoras + 1)])
+        _em_lotes(conn, models.Autor, [
+            {"nome": f"{rng.choice(NOMES)} {i}", "sobrenome": rng.choice(SOBRENOMES)}
+            for i in range(1, n_autores + 1)
+        ])
+        _em_lotes(conn, models.Categoria, [{"nome": f"Categoria {i}"} for i in range(1, N_CATEGORIAS + 1)])
+
+        n_exemplares = 0
+        for inicio in range(0, n_livros, LOTE_INSERCAO):
+            livros, autores, categorias, exemplares = [], [], [], []
+            for i in range(inicio, min(inicio + LOTE_INSERCAO, n_livros)):
+                id_livro = f"LIV-{ano_ids}-{i:07d}"
+                titulo = " ".join(rng.sample(PALAVRAS, rng.randint(2, 4))).capitalize()
+                livros.append({
+                    "id_livro": id_livro,
+                    "titulo": f"{titulo} {i}",
+                    "isbn": f"978{i:010d}",
+                    "ano_publicacao": rng.randint(1900, ano_ids),
+                    "id_editora": rng.randint(1, n_editoras),
+                })
+                autores += [{"id_livro": id_livro, "id_autor": a}
+                            for a in rng.sample(range(1, n_autores + 1), rng.randint(1, 3))]
+                categorias += [{"id_livro": id_livro, "id_categoria": c}
+                               for c in rng.sample(range(1, N_CATEGORIAS + 1), rng.randint(1, 3))]
+                for _ in range(rng.randint(1, 3)):
+                    n_exemplares += 1
+                    exemplares.append({
+                        "id_livro": id_livro,
+                        "codigo_barras": f"BENCH{n_exemplares:09d}",
+                        "status": models.StatusExemplarEnum.Disponível,
+                        "localizacao": f"Estante {rng.randint(1, 200)}",
+                    })
+            conn.execute(insert(models.Livro), livros)
+            conn.execute(insert(models.livro_autor_table), autores)
+            conn.execute(insert(models.livro_categoria_table), categorias)
+            conn.execute(insert(models.Exemplar), exemplares)
+
+    return {"livros": n_livros, "autores": n_autores, "editoras": n_editoras, "exemplares": n_exemplares}
+
+
+def gerar_pessoas(n_clientes: int) -> dict:
+    """Clientes (CPF sintético de 11 dígitos) e usuários do sistema para o teste de login."""
+    senha_hash = security.get_password_hash(SENHA)  # bcrypt uma vez só: todos com a mesma senha
+    with engine.begin() as conn:
+        _em_lotes(conn, models.UsuarioCliente, [
+            {"nome": f"Cliente {i}", "cpf": f"{i:011d}", "email": f"cliente{i}@biblioteca.com.br"}
+            for i in range(1, n_clientes + 1)
+        ])
+        grupos = {}
+        for nome in ("Administrador", "Bibliotecario"):
+            grupos[nome] = conn.execute(insert(models.GruposUsuarios).values(nome_grupo=nome)).inserted_primary_key[0]
+        usuarios = [{"username": "bench_admin", "senha_hash": senha_hash, "id_grupo": grupos["Administrador"]}]
+        usuarios += [{"username": f"bench_{i}", "senha_hash": senha_hash, "id_grupo": grupos["Bibliotecario"]}
+                     for i in range(N_USUARIOS)]
+        conn.execute(insert(models.Usuarios), usuarios)
+    return {"clientes": n_clientes, "usuarios": N_USUARIOS + 1}
+
+
+def gerar_historico(rng: random.Random, n_emprestimos: int, n_exemplares: int, n_clientes: int, anos: int) -> dict:
+    """Empréstimos devolvidos espalhados pelos últimos 'anos' anos (até um mês atrás)."""
+    mysql = engine.dialect.name == "mysql"
+    agora = datetime.now()
+    janela = int(timedelta(days=365 * anos - 30).total_seconds())
+    inicio_janela = agora - timedelta(days=365 * anos)
+    # Lotes sem exemplar repetido (por causa das triggers do MySQL)
+    lote = min(LOTE_INSERCAO, n_exemplares)
+
+    gerados = 0
+    while gerados < n_emprestimos:
+        quantidade = min(lote, n_emprestimos - gerados)
+        linhas = []
+        for id_exemplar in rng.sample(range(1, n_exemplares + 1), quantidade):
+            emprestado = inicio_janela + timedelta(seconds=rng.randrange(janela))
+            prevista = emprestado.date() + timedelta(days=PRAZO_DIAS)
+            # ~85% devolvidos no prazo; o resto com até 30 dias de atraso
+            dias = rng.randint(1, PRAZO_DIAS) if rng.random() < 0.85 else PRAZO_DIAS + rng.randint(1, 30)
+            devolvido = emprestado + timedelta(days=dias, seconds=rng.randrange(3600))
+            atraso = (devolvido.date() - prevista).days
+            linhas.append({
+                "id_exemplar": id_exemplar,
+                "id_cliente": rng.randint(1, n_clientes),
+                "data_emprestimo": emprestado,
+                "data_prevista_devolucao": prevista,
+                "data_devolucao": devolvido,
+                "multa": max(atraso, 0) * atrasos.MULTA_POR_DIA,
+                "ativo": False,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(models.Emprestimo), linhas)
+            if mysql:
+                # Desfaz o 'Emprestado' que a trigger acabou de gravar
+                conn.execute(
+                    update(models.Exemplar)
+                    .where(models.Exemplar.status == models.StatusExemplarEnum.Emprestado)
+                    .values(status=models.StatusExemplarEnum.Disponível)
+                )
+        gerados += quantidade
+    return {"emprestimos_historico": gerados}
+
+
+def gerar_situacao_atual(rng: random.Random, n_exemplares: int, n_clientes: int) -> dict:
+    """Empréstimos ativos (até 3 por cliente; parte atrasada), reservas e perdas."""
+    agora = datetime.now()
+    sorteados = rng.sample(range(1, n_exemplares + 1), int(n_exemplares * (FRACAO_ATIVOS + FRACAO_PERDIDOS)))
+    n_ativos = int(n_exemplares * FRACAO_ATIVOS)
+    emprestados, perdidos = sorteados[:n_ativos], sorteados[n_ativos:]
+
+    por_cliente = {}
+    ativos, fila = [], []
+    for id_exemplar in emprestados:
+        id_cliente = rng.randint(1, n_clientes)
+        if por_cliente.get(id_cliente, 0) >= 3:
+            continue
+        por_cliente[id_cliente] = por_cliente.get(id_cliente, 0) + 1
+        # Emprestados nos últimos 30 dias: os de mais de PRAZO_DIAS estão atrasados
+        emprestado = agora - timedelta(days=rng.randint(0, 29), seconds=rng.randrange(86400))
+        ativos.append({
+            "id_exemplar": id_exemplar,
+            "id_cliente": id_cliente,
+            "data_emprestimo": emprestado,
+            "data_prevista_devolucao": emprestado.date() + timedelta(days=PRAZO_DIAS),
+            "ativo": True,
+        })
+        if rng.random() < FRACAO_RESERVADOS:
+            reservado_em = emprestado + timedelta(hours=rng.randint(1, 48))
+            fila.append({
+                "id_exemplar": id_exemplar,
+                "id_cliente": rng.randint(1, n_clientes),
+                "data_reserva": reservado_em,
+                "data_expiracao": reservado_em + timedelta(days=reservas.VALIDADE_DIAS),
+                "status": models.StatusReservaEnum.Ativa,
+            })
+
+    with engine.begin() as conn:
+        _em_lotes(conn, models.Emprestimo, ativos)
+        _em_lotes(conn, models.Reserva, fila)
+        # No MySQL a trigger já marcou os emprestados; no SQLite é aqui
+        for status, ids in ((models.StatusExemplarEnum.Emprestado, [a["id_exemplar"] for a in ativos]),
+                            (models.StatusExemplarEnum.Perda, perdidos)):
+            for inicio in range(0, len(ids), LOTE_INSERCAO):
+                conn.execute(
+                    update(models.Exemplar)
+                    .where(models.Exemplar.id_exemplar.in_(ids[inicio:inicio + LOTE_INSERCAO]))
+                    .values(status=status)
+                )
+
+    # Materializa os atrasados, como o job faria na subida da API
+    db = SessionLocal()
+    try:
+        atrasados = atrasos.atualizar(db, completo=True)["incluidos"]
+    finally:
+        db.close()
+    return {"emprestimos_ativos": len(ativos), "atrasados": atrasados, "reservas": len(fila), "perdidos": len(perdidos)}
+
+
+def gerar(escala: str, anos: int = 3, semente: int = 42) -> dict:
+    """Gera o banco completo da escala e devolve as contagens de cada etapa."""
+    config = ESCALAS[escala]
+    rng = random.Random(semente)
+    resumo = {"escala": escala, "anos": anos, "semente": semente}
+    etapas = (
+        ("limpeza", lambda: limpar() or {}),
+        ("catalogo", lambda: gerar_catalogo(rng, config["livros"])),
+        ("pessoas", lambda: gerar_pessoas(config["clientes"])),
+        ("historico", lambda: gerar_historico(rng, config["emprestimos"], resumo["exemplares"],
+                                              config["clientes"], anos)),
+        ("situacao_atual", lambda: gerar_situacao_atual(rng, resumo["exemplares"], config["clientes"])),
+    )
+    for nome, etapa in etapas:
+        inicio = time.perf_counter()
+        resumo.update(etapa())
+        print(f"  {nome:<15} {time.perf_counter() - inicio:>8.1f}s")
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um acervo sintético para os benchmarks.")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequeno")
+    parser.add_argument("--anos", type=int, default=3, help="Anos de histórico de empréstimos")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"gerando escala '{args.escala}' em {engine.url.render_as_string(hide_password=True)}")
+    resumo = gerar(args.escala, args.anos, args.semente)
+    print(" | ".join(f"{chave}: {valor}" for chave, valor in resumo.items()))
+
+
+if __name__ == "__main__":
+    main()
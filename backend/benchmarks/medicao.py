@@ -0,0 +1,33 @@
+# benchmarks/medicao.py
+# Utilitários comuns dos benchmarks: banco padrão e estatísticas de latência.
+import os
+import tempfile
+
+# Banco padrão compartilhado por dataset.py e carga.py (gere uma vez, meça várias)
+ARQUIVO_PADRAO = os.path.join(tempfile.gettempdir(), "bench_biblioteca.db")
+
+
+def usar_banco_padrao(arquivo: str = ARQUIVO_PADRAO) -> None:
+    """Sem DATABASE_URL definida, usa um arquivo SQLite. Chame ANTES de importar database/models."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{arquivo}")
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def resumir(latencias, decorrido: float, erros: int = 0) -> dict:
+    """Vazão e percentis (em ms) de uma lista de latências em segundos."""
+    ordenados = sorted(latencias)
+    return {
+        "requisicoes": len(ordenados),
+        "erros": erros,
+        "req_s": len(ordenados) / decorrido if decorrido else 0.0,
+        "p50_ms": percentil(ordenados, 50) * 1000,
+        "p95_ms": percentil(ordenados, 95) * 1000,
+        "p99_ms": percentil(ordenados, 99) * 1000,
+    }
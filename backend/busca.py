@@ -0,0 +1,252 @@
+# busca.py
+# Busca textual no catálogo com um índice invertido em memória.
+#
+# Cada livro vira um "documento" com os termos do título, dos nomes dos
+# autores, das categorias, da editora e do ISBN. O índice guarda, para cada
+# termo, os livros que o contêm e o peso do campo onde ele aparece (um termo
+# no título vale mais que na categoria). Os termos são normalizados sem
+# acentos e em minúsculas ("Coração" e "coracao" são o mesmo termo).
+#
+# Na consulta, cada palavra casa com os termos que começam com ela (busca
+# por prefixo, via bisect na lista ordenada de termos); os livros precisam
+# conter todas as palavras e são ordenados pela soma dos pesos.
+#
+# O índice é montado na primeira busca (uma leitura do catálogo inteiro em
+# poucas consultas) e depois atualizado pelo cadastro e pela importação de
+# livros. Cada processo da API (ex.: uvicorn --workers N) tem o seu; os
+# livros (re)indexados por um processo são avisados aos outros pelo estado
+# compartilhado (canal "busca") e reindexados por eles na próxima busca.
+# indexar_livros() nunca levanta erro (o livro já foi gravado): se a
+# indexação falhar, o livro fica pendente e é indexado na próxima busca.
+import bisect
+import heapq
+import json
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from estado_compartilhado import estado
+
+# Peso de cada campo na pontuação
+PESO_TITULO = 3
+PESO_AUTOR = 2
+PESO_CATEGORIA = 1
+PESO_EDITORA = 1
+PESO_ISBN = 5
+
+# Palavras com menos letras que isso só casam com o termo exato
+# (evita que "a" expanda para metade do vocabulário)
+TAMANHO_MINIMO_PREFIXO = 2
+# Um termo que é só prefixo vale menos que o termo exato
+FATOR_PREFIXO = 0.5
+# Linhas lidas por vez ao montar o índice
+TAMANHO_LOTE_CARGA = 5000
+
+_TOKEN = re.compile(r"\w+")
+_HIFEN_ENTRE_DIGITOS = re.compile(r"(?<=\d)-(?=\d)")
+CANAL = "busca"
+
+logger = logging.getLogger("biblioteca.busca")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas e sem acentos: 'Ação' -> 'acao'."""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+def tokenizar(texto: Optional[str]) -> List[str]:
+    """Termos normalizados. Hífens entre dígitos são removidos (ISBN 978-85-... vira 97885...)."""
+    return _TOKEN.findall(_HIFEN_ENTRE_DIGITOS.sub("", normalizar(texto)))
+
+
+class IndiceBusca:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.carregado = False
+        # termo -> {numero_documento: peso}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Lista ordenada dos termos, para a busca por prefixo
+        self._termos: List[str] = []
+        # id_livro <-> número interno do documento (inteiros ocupam menos memória nos postings)
+        self._numeros: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        # número do documento -> termos dele (para reindexar um livro)
+        self._termos_documento: Dict[int, Tuple[str, ...]] = {}
+        # Livros (re)indexados por outros processos, a reindexar aqui
+        self._pendentes: Set[str] = set()
+
+    # --- Montagem e atualização ---
+
+    def garantir_carregado(self, db: Session) -> None:
+        if self.carregado and not self._pendentes:
+            return
+        with self._lock:
+            if not self.carregado:
+                self._pendentes = set()
+                for documento in _documentos(db):
+                    self._indexar(*documento, ordenar=False)
+                self._termos = sorted(self._postings)
+                self.carregado = True
+                return
+            pendentes, self._pendentes = self._pendentes, set()
+        self._reindexar(db, list(pendentes))
+
+    def indexar_livros(self, db: Session, ids_livros: Iterable[str]) -> None:
+        """(Re)indexa os livros informados e avisa os outros processos. Chame depois do commit."""
+        ids_livros = list(ids_livros)
+        if not ids_livros:
+            return
+        try:
+            estado.publicar(CANAL, json.dumps(ids_livros))
+        except Exception:
+            logger.exception("Falha ao avisar os outros processos sobre %d livros", len(ids_livros))
+        # Se o índice ainda não foi montado, a carga inicial já vai incluir esses livros
+        if self.carregado:
+            try:
+                self._reindexar(db, ids_livros)
+            except Exception:
+                logger.exception("Falha ao indexar %d livros; ficam para a próxima busca", len(ids_livros))
+                with self._lock:
+                    self._pendentes.update(ids_livros)
+
+    def marcar_alterados(self, mensagem: str) -> None:
+        """Assinatura do canal: livros indexados por outro processo."""
+        if self.carregado:
+            with self._lock:
+                self._pendentes.update(json.loads(mensagem))
+
+    def _reindexar(self, db: Session, ids_livros: List[str]) -> None:
+        if not ids_livros:
+            return
+        documentos = list(_documentos(db, ids_livros))
+        with self._lock:
+            for documento in documentos:
+                self._indexar(*documento, ordenar=True)
+
+    def _indexar(self, id_livro: str, campos: Dict[str, int], ordenar: bool) -> None:
+        numero = self._numeros.get(id_livro)
+        if numero is None:
+            numero = len(self._ids)
+            self._numeros[id_livro] = numero
+            self._ids.append(id_livro)
+        else:
+            self._remover_termos(numero)
+
+        for termo, peso in campos.items():
+            postings = self._postings.get(termo)
+            if postings is None:
+                postings = self._postings[termo] = {}
+                if ordenar:
+                    bisect.insort(self._termos, termo)
+            postings[numero] = peso
+        self._termos_documento[numero] = tuple(campos)
+
+    def _remover_termos(self, numero: int) -> None:
+        for termo in self._termos_documento.pop(numero, ()):
+            postings = self._postings.get(termo)
+            if postings is not None:
+                postings.pop(numero, None)
+                # O termo fica na lista ordenada mesmo sem livros: não afeta o resultado
+
+    # --- Consulta ---
+
+    def buscar(self, consulta: str, deslocamento: int, limite: int) -> Tuple[List[str], int]:
+        """
+        Retorna (ids_livros_da_pagina, total_encontrado), ordenados pela
+        pontuação (maior primeiro) e, no empate, pelo id_livro.
+        """
+        palavras = list(dict.fromkeys(tokenizar(consulta)))
+        if not palavras:
+            return [], 0
+
+        with self._lock:
+            por_palavra = [self._pontuar_palavra(p) for p in palavras]
+            # Interseção começando pela palavra mais rara (menos candidatos)
+            por_palavra.sort(key=len)
+            pontuacao = dict(por_palavra[0])
+            for pontos in por_palavra[1:]:
+                pontuacao = {n: s + pontos[n] for n, s in pontuacao.items() if n in pontos}
+                if not pontuacao:
+                    break
+            ids = self._ids
+
+        total = len(pontuacao)
+        melhores = heapq.nsmallest(
+            deslocamento + limite, pontuacao.items(), key=lambda item: (-item[1], ids[item[0]])
+        )
+        return [ids[n] for n, _ in melhores[deslocamento:]], total
+
+    def _pontuar_palavra(self, palavra: str) -> Dict[int, float]:
+        pontos: Dict[int, float] = dict(self._postings.get(palavra, {}))
+        if len(palavra) < TAMANHO_MINIMO_PREFIXO:
+            return pontos
+        inicio = bisect.bisect_right(self._termos, palavra)
+        for termo in self._termos[inicio:bisect.bisect_left(self._termos, palavra + "\U0010ffff")]:
+            for numero, peso in self._postings[termo].items():
+                peso = peso * FATOR_PREFIXO
+                if peso > pontos.get(numero, 0):
+                    pontos[numero] = peso
+        return pontos
+
+
+# --- Leitura do catálogo ---
+
+def _documentos(db: Session, ids_livros: Optional[List[str]] = None) -> Iterable[Tuple[str, Dict[str, int]]]:
+    """
+    Lê os campos pesquisáveis com três consultas de projeção (sem montar
+    objetos do ORM) e devolve (id_livro, {termo: peso}) para cada livro.
+    """
+    def filtrar(stmt, coluna):
+        return stmt.where(coluna.in_(ids_livros)) if ids_livros is not None else stmt
+
+    termos: Dict[str, Dict[str, int]] = {}
+
+    def adicionar(id_livro: str, texto: Optional[str], peso: int) -> None:
+        campos = termos.setdefault(id_livro, {})
+        for termo in tokenizar(texto):
+            if peso > campos.get(termo, 0):
+                campos[termo] = peso
+
+    livros = filtrar(
+        select(models.Livro.id_livro, models.Livro.titulo, models.Livro.isbn, models.Editora.nome)
+        .outerjoin(models.Editora, models.Livro.id_editora == models.Editora.id_editora),
+        models.Livro.id_livro,
+    )
+    for id_livro, titulo, isbn, editora in db.execute(livros.execution_options(yield_per=TAMANHO_LOTE_CARGA)):
+        termos.setdefault(id_livro, {})
+        adicionar(id_livro, titulo, PESO_TITULO)
+        adicionar(id_livro, isbn, PESO_ISBN)
+        adicionar(id_livro, editora, PESO_EDITORA)
+
+    autores = filtrar(
+        select(models.livro_autor_table.c.id_livro, models.Autor.nome, models.Autor.sobrenome)
+        .join(models.Autor, models.Autor.id_autor == models.livro_autor_table.c.id_autor),
+        models.livro_autor_table.c.id_livro,
+    )
+    for id_livro, nome, sobrenome in db.execute(autores.execution_options(yield_per=TAMANHO_LOTE_CARGA)):
+        if id_livro in termos:
+            adicionar(id_livro, nome, PESO_AUTOR)
+            adicionar(id_livro, sobrenome, PESO_AUTOR)
+
+    categorias = filtrar(
+        select(models.livro_categoria_table.c.id_livro, models.Categoria.nome)
+        .join(models.Categoria, models.Categoria.id_categoria == models.livro_categoria_table.c.id_categoria),
+        models.livro_categoria_table.c.id_livro,
+    )
+    for id_livro, nome in db.execute(categorias.execution_options(yield_per=TAMANHO_LOTE_CARGA)):
+        if id_livro in termos:
+            adicionar(id_livro, nome, PESO_CATEGORIA)
+
+    return termos.items()
+
+
+indice = IndiceBusca()
+estado.assinar(CANAL, indice.marcar_alterados)
@@ -0,0 +1,177 @@
+# cache_principal.py
+# Cache em memória do usuário autenticado ("principal") por 'sub' do token.
+#
+# Sem o cache, toda rota protegida faz duas consultas extras: a busca do
+# usuário em get_current_user e o lazy-load de 'current_user.grupo'.
+# Aqui guardamos um retrato imutável do usuário + grupo, com:
+#   - tamanho máximo (LRU: o menos usado recentemente sai primeiro)
+#   - tempo de vida (TTL) por entrada
+#   - invalidação automática quando Usuarios ou GruposUsuarios mudam no banco,
+#     avisada aos outros workers pelo estado compartilhado (canal "principais")
+#   - métricas de acertos/erros
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import models
+from estado_compartilhado import estado
+
+TTL_SEGUNDOS = float(os.getenv("AUTH_CACHE_TTL_SEGUNDOS", "60"))
+MAX_ENTRADAS = int(os.getenv("AUTH_CACHE_MAX_ENTRADAS", "10000"))
+
+
+# --- Retrato do usuário autenticado ---
+# Mesmos nomes de atributos do modelo, para que as rotas continuem usando
+# 'current_user.grupo.nome_grupo' e o schemas.Usuario consiga serializá-lo.
+
+@dataclass(frozen=True)
+class GrupoPrincipal:
+    id_grupo: int
+    nome_grupo: str
+    descricao: Optional[str] = None
+
+@dataclass(frozen=True)
+class Principal:
+    id_usuario: int
+    username: str
+    email: Optional[str]
+    id_grupo: int
+    grupo: GrupoPrincipal
+
+    @classmethod
+    def de_usuario(cls, user: models.Usuarios) -> "Principal":
+        return cls(
+            id_usuario=user.id_usuario,
+            username=user.username,
+            email=user.email,
+            id_grupo=user.id_grupo,
+            grupo=GrupoPrincipal(
+                id_grupo=user.grupo.id_grupo,
+                nome_grupo=user.grupo.nome_grupo,
+                descricao=user.grupo.descricao,
+            ),
+        )
+
+
+# --- Cache LRU com TTL ---
+
+class CachePrincipais:
+    def __init__(self, ttl_segundos: float = TTL_SEGUNDOS, max_entradas: int = MAX_ENTRADAS):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.erros = 0
+        self.expirados = 0
+        self.despejados = 0
+        self.invalidacoes = 0
+
+    def obter(self, username: str) -> Optional[Principal]:
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(username)
+            if entrada is None:
+                self.erros += 1
+                return None
+            principal, expira_em = entrada
+            if expira_em <= agora:
+                del self._entradas[username]
+                self.expirados += 1
+                self.erros += 1
+                return None
+            self._entradas.move_to_end(username)
+            self.acertos += 1
+            return principal
+
+    def guardar(self, principal: Principal) -> None:
+        with self._lock:
+            self._entradas[principal.username] = (principal, time.monotonic() + self.ttl_segundos)
+            self._entradas.move_to_end(principal.username)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.despejados += 1
+
+    def invalidar(self, username: str) -> None:
+        with self._lock:
+            if self._entradas.pop(username, None) is not None:
+                self.invalidacoes += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self.invalidacoes += len(self._entradas)
+            self._entradas.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.erros
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "erros": self.erros,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "expirados": self.expirados,
+                "despejados": self.despejados,
+                "invalidacoes": self.invalidacoes,
+            }
+
+
+cache = CachePrincipais()
+
+
+# --- Invalidação automática ---
+# Durante o flush anotamos quais usuários/grupos mudaram; a invalidação
+# só acontece depois do commit (num rollback, nada muda no banco).
+# Mensagem no canal: lista JSON de usernames, ou null para limpar tudo.
+
+_CHAVE_PENDENTES = "cache_principal_pendentes"
+CANAL = "principais"
+
+@event.listens_for(Session, "after_flush")
+def _anotar_alteracoes(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.GruposUsuarios):
+            # Mudança de grupo afeta todos os usuários dele: limpa tudo
+            session.info.setdefault(_CHAVE_PENDENTES, set()).add(None)
+        elif isinstance(obj, models.Usuarios):
+            pendentes = session.info.setdefault(_CHAVE_PENDENTES, set())
+            pendentes.add(obj.username)
+            # Se o username mudou, o nome antigo também precisa sair
+            pendentes.update(inspect(obj).attrs.username.history.deleted or ())
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_invalidacoes(session):
+    pendentes = session.info.pop(_CHAVE_PENDENTES, None)
+    if not pendentes:
+        return
+    if None in pendentes:
+        cache.limpar()
+        estado.publicar(CANAL, json.dumps(None))
+        return
+    for username in pendentes:
+        cache.invalidar(username)
+    estado.publicar(CANAL, json.dumps(sorted(pendentes)))
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendentes(session):
+    session.info.pop(_CHAVE_PENDENTES, None)
+
+# Invalidações feitas por outros workers
+def _invalidacao_remota(mensagem: str) -> None:
+    usernames = json.loads(mensagem)
+    if usernames is None:
+        cache.limpar()
+        return
+    for username in usernames:
+        cache.invalidar(username)
+
+estado.assinar(CANAL, _invalidacao_remota)
@@ -0,0 +1,122 @@
+# cache_referencia.py
+# Cache de leitura ("read-through") das listagens de dados de referência:
+# autores, editoras e categorias.
+#
+# Essas listas quase nunca mudam, mas a tela de livros pede as três sempre
+# que abre. Cada página é guardada já serializada em JSON, junto com seu
+# ETag e o cursor da próxima página:
+#   - a chave inclui a VERSÃO do recurso ("autores:v3:..."); os create_*
+#     só incrementam a versão, e as entradas antigas deixam de ser lidas
+#     (e expiram pelo TTL)
+#   - se o cliente manda If-None-Match com o ETag atual, a resposta é um
+#     304 sem corpo
+#
+# O armazenamento é o estado compartilhado (estado_compartilhado.py): com
+# ESTADO_BACKEND=sqlite, todos os workers do uvicorn na mesma máquina usam
+# o mesmo cache, e um create_* em um worker invalida o cache de todos.
+import hashlib
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+import paginacao
+from estado_compartilhado import estado
+
+TTL_SEGUNDOS = float(os.getenv("CACHE_REFERENCIA_TTL_SEGUNDOS", "300"))
+# Prefixo das chaves no estado compartilhado
+PREFIXO = "referencia:"
+
+
+# --- Cache das listagens ---
+
+class CacheReferencia:
+    def __init__(self, backend, ttl: float = TTL_SEGUNDOS):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.erros = 0
+        self.nao_modificados = 0
+        self._adaptadores = {}
+
+    def invalidar(self, recurso: str) -> None:
+        """Chame depois do commit de qualquer escrita no recurso."""
+        self.backend.incrementar(f"{PREFIXO}versao:{recurso}")
+
+    def responder(
+        self,
+        request: Request,
+        recurso: str,
+        schema,
+        cursor: Optional[str],
+        limite: int,
+        carregar: Callable[[], Tuple[List, Optional[str]]],
+    ) -> Response:
+        """
+        Devolve a página (cursor, limite) de 'recurso'. Se não estiver no
+        cache, 'carregar' é chamado e deve retornar (itens, proximo_cursor).
+        """
+        versao = self.backend.contador(f"{PREFIXO}versao:{recurso}")
+        chave = f"{PREFIXO}{recurso}:v{versao}:{cursor or ''}:{limite}"
+
+        guardado = self.backend.obter(chave)
+        if guardado is None:
+            self._contar("erros")
+            itens, proximo_cursor = carregar()
+            # Valida contra o schema antes de serializar: o corpo (e o ETag) segue
+            # o contrato da resposta, não a ordem/estado dos atributos do ORM
+            adaptador = self._adaptador(schema)
+            corpo = adaptador.dump_json(adaptador.validate_python(itens, from_attributes=True))
+            etag = '"' + hashlib.sha1(corpo).hexdigest()[:20] + '"'
+            guardado = b"\n".join([etag.encode("ascii"), (proximo_cursor or "").encode("ascii"), corpo])
+            self.backend.guardar(chave, guardado, self.ttl)
+        else:
+            self._contar("acertos")
+
+        etag, proximo_cursor, corpo = guardado.split(b"\n", 2)
+        etag = etag.decode("ascii")
+        # no-cache: o navegador pode guardar a resposta, mas revalida sempre (If-None-Match)
+        cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+        if proximo_cursor:
+            cabecalhos[paginacao.CABECALHO_CURSOR] = proximo_cursor.decode("ascii")
+
+        if _etag_confere(request.headers.get("if-none-match"), etag):
+            self._contar("nao_modificados")
+            return Response(status_code=304, headers=cabecalhos)
+        return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+    def _adaptador(self, schema) -> TypeAdapter:
+        adaptador = self._adaptadores.get(schema)
+        if adaptador is None:
+            adaptador = self._adaptadores[schema] = TypeAdapter(List[schema])
+        return adaptador
+
+    def _contar(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            total = self.acertos + self.erros
+            return {
+                "backend": type(self.backend).__name__,
+                "ttl_segundos": self.ttl,
+                "acertos": self.acertos,
+                "erros": self.erros,
+                "nao_modificados_304": self.nao_modificados,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+            }
+
+
+def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [valor.strip() for valor in if_none_match.split(",")]
+    # Aceita também a forma fraca (W/"...") que alguns proxies devolvem
+    return "*" in candidatos or etag in candidatos or f"W/{etag}" in candidatos
+
+
+cache = CacheReferencia(estado)
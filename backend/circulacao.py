@@ -0,0 +1,341 @@
+# circulacao.py
+# Empréstimo e devolução em lote no balcão de atendimento: vários códigos de
+# barras numa só requisição e numa só transação.
+#
+# Empréstimo em lote:
+#   1. UMA consulta trava (FOR UPDATE) o cliente e conta seus empréstimos ativos
+#   2. UMA consulta trava e resolve todos os exemplares pelos códigos de barras
+#   3. cada código é conferido em memória (existe, está disponível, não
+#      repetido, limite de empréstimos ativos do cliente)
+#   4. os aceitos entram num INSERT de várias linhas; as triggers do banco
+#      continuam valendo. Se mesmo assim o INSERT falhar, os itens são
+#      gravados um a um com savepoints para apontar quais falharam
+#
+# Devolução em lote:
+#   1. UMA consulta trava os empréstimos ativos dos códigos de barras
+#   2. para cada um, CALL finalizar_emprestimo(...) dentro de um savepoint
+#      (a procedure calcula a multa e repassa o exemplar à fila de reservas)
+#   3. um único commit no final
+#
+# O resultado informa sucesso ou erro por código de barras. Depois do
+# commit, as atualizações em memória (disponibilidade, painel) não levantam
+# erro: o resultado dos empréstimos já gravados sempre volta ao balcão.
+#
+# Atendimento unitário por leitura de código de barras (balcão):
+#   - MapaCodigosBarras mantém em memória codigo_barras -> (id_exemplar,
+#     id_livro), montado no primeiro uso e atualizado por create_exemplar e
+#     pela importação; o balcão não precisa baixar exemplares nem clientes
+#   - o empréstimo é um INSERT ... SELECT que resolve o cliente pelo CPF no
+#     próprio banco, seguido da leitura da linha criada, numa só transação
+import logging
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, literal, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+import disponibilidade
+import estatisticas
+import models
+import schemas
+
+# Mesmo limite da trigger trg_emprestimo_before_insert_limit
+LIMITE_EMPRESTIMOS_ATIVOS = 3
+
+logger = logging.getLogger("biblioteca.circulacao")
+
+
+def _mensagem_banco(erro: Exception) -> str:
+    """Traduz os erros das triggers/procedures para as mesmas mensagens das rotas unitárias."""
+    mensagem = str(getattr(erro, "orig", erro))
+    if "Limite de 3 emprestimos" in mensagem:
+        return "Limite de 3 emprestimos ativos por cliente atingido."
+    if "Exemplar não está disponível" in mensagem:
+        return "Exemplar não está disponível para empréstimo."
+    return f"Erro de banco de dados: {mensagem}"
+
+def _resumir(itens: List[schemas.ItemCirculacao]) -> schemas.ResultadoCirculacao:
+    sucessos = sum(1 for item in itens if item.sucesso)
+    return schemas.ResultadoCirculacao(itens=itens, sucessos=sucessos, falhas=len(itens) - sucessos)
+
+def _apos_commit(db: Session, ids_livros: Iterable[str], emprestimos: int = 0, devolucoes: int = 0) -> None:
+    """Atualiza disponibilidade e painel depois do commit, sem levantar erro (a circulação já foi gravada)."""
+    try:
+        disponibilidade.projecao.atualizar_livros(db, ids_livros)
+        estatisticas.painel.registrar_emprestimos(emprestimos)
+        estatisticas.painel.registrar_devolucoes(devolucoes)
+    except Exception:
+        logger.exception("Falha ao atualizar as projeções após a circulação")
+
+
+# --- Empréstimo em lote ---
+
+def emprestar_lote(
+    db: Session,
+    id_cliente: int,
+    codigos_barras: List[str],
+    data_prevista_devolucao: Optional[date] = None,
+) -> schemas.ResultadoCirculacao:
+    # 1. Cliente travado: dois lotes simultâneos do mesmo cliente não furam o limite
+    cliente = db.execute(
+        select(models.UsuarioCliente.id_cliente)
+        .where(models.UsuarioCliente.id_cliente == id_cliente)
+        .with_for_update()
+    ).first()
+    if cliente is None:
+        return _resumir([
+            schemas.ItemCirculacao(codigo_barras=codigo, sucesso=False, erro="Cliente não encontrado.")
+            for codigo in codigos_barras
+        ])
+    ativos = db.execute(
+        select(func.count())
+        .select_from(models.Emprestimo)
+        .where(
+            models.Emprestimo.id_cliente == id_cliente,
+            models.Emprestimo.ativo == True,
+            models.Emprestimo.data_devolucao.is_(None),
+        )
+    ).scalar_one()
+
+    # 2. Todos os exemplares de uma vez
+    exemplares: Dict[str, models.Exemplar] = {
+        exemplar.codigo_barras: exemplar
+        for exemplar in db.execute(
+            select(models.Exemplar)
+            .where(models.Exemplar.codigo_barras.in_(set(codigos_barras)))
+            .with_for_update()
+        ).scalars()
+    }
+
+    # 3. Conferência em memória
+    itens: List[schemas.ItemCirculacao] = []
+    aceitos: List[tuple] = []  # (item, exemplar)
+    vistos = set()
+    for codigo in codigos_barras:
+        item = schemas.ItemCirculacao(codigo_barras=codigo, sucesso=False)
+        itens.append(item)
+        exemplar = exemplares.get(codigo)
+        if codigo in vistos:
+            item.erro = "Código de barras repetido no lote."
+        elif exemplar is None:
+            item.erro = "Exemplar não encontrado."
+        elif exemplar.status != models.StatusExemplarEnum.Disponível:
+            item.erro = "Exemplar não está disponível para empréstimo."
+        elif ativos + len(aceitos) >= LIMITE_EMPRESTIMOS_ATIVOS:
+            item.erro = "Limite de 3 emprestimos ativos por cliente atingido."
+        else:
+            aceitos.append((item, exemplar))
+        vistos.add(codigo)
+
+    if not aceitos:
+        db.rollback()
+        return _resumir(itens)
+
+    # 4. Gravação
+    linhas = [
+        {
+            "id_exemplar": exemplar.id_exemplar,
+            "id_cliente": id_cliente,
+            "data_prevista_devolucao": data_prevista_devolucao,  # None: a trigger define 15 dias
+        }
+        for _, exemplar in aceitos
+    ]
+    try:
+        with db.begin_nested():
+            db.execute(insert(models.Emprestimo), linhas)
+        gravados = aceitos
+    except (IntegrityError, OperationalError):
+        gravados = []
+        for (item, exemplar), linha in zip(aceitos, linhas):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(models.Emprestimo), [linha])
+                gravados.append((item, exemplar))
+            except (IntegrityError, OperationalError) as e:
+                item.erro = _mensagem_banco(e)
+
+    # IDs gerados (o INSERT de várias linhas não os devolve no MySQL)
+    ids_exemplares = [exemplar.id_exemplar for _, exemplar in gravados]
+    ids_emprestimos = dict(db.execute(
+        select(models.Emprestimo.id_exemplar, models.Emprestimo.id_emprestimo).where(
+            models.Emprestimo.id_exemplar.in_(ids_exemplares),
+            models.Emprestimo.id_cliente == id_cliente,
+            models.Emprestimo.ativo == True,
+        )
+    ).all()) if ids_exemplares else {}
+    db.commit()
+
+    for item, exemplar in gravados:
+        item.sucesso = True
+        item.id_emprestimo = ids_emprestimos.get(exemplar.id_exemplar)
+    _apos_commit(db, {exemplar.id_livro for _, exemplar in gravados}, emprestimos=len(gravados))
+    return _resumir(itens)
+
+
+# --- Devolução em lote ---
+
+def devolver_lote(db: Session, codigos_barras: List[str]) -> schemas.ResultadoCirculacao:
+    # 1. Empréstimos ativos de todos os códigos, travados até o commit
+    ativos = {
+        codigo: (id_emprestimo, id_livro)
+        for codigo, id_emprestimo, id_livro in db.execute(
+            select(models.Exemplar.codigo_barras, models.Emprestimo.id_emprestimo, models.Exemplar.id_livro)
+            .join(models.Emprestimo, models.Emprestimo.id_exemplar == models.Exemplar.id_exemplar)
+            .where(
+                models.Exemplar.codigo_barras.in_(set(codigos_barras)),
+                models.Emprestimo.ativo == True,
+            )
+            .with_for_update()
+        )
+    }
+
+    # 2. A procedure decide multa e reservas; cada chamada no seu savepoint
+    itens: List[schemas.ItemCirculacao] = []
+    livros = set()
+    vistos = set()
+    for codigo in codigos_barras:
+        item = schemas.ItemCirculacao(codigo_barras=codigo, sucesso=False)
+        itens.append(item)
+        if codigo in vistos:
+            item.erro = "Código de barras repetido no lote."
+            continue
+        vistos.add(codigo)
+        if codigo not in ativos:
+            item.erro = "Nenhum empréstimo ativo para este exemplar."
+            continue
+        id_emprestimo, id_livro = ativos[codigo]
+        try:
+            with db.begin_nested():
+                db.execute(text("CALL finalizar_emprestimo(:id)"), {"id": id_emprestimo})
+            item.sucesso = True
+            item.id_emprestimo = id_emprestimo
+            livros.add(id_livro)
+        except (IntegrityError, OperationalError) as e:
+            item.erro = _mensagem_banco(e)
+
+    # 3. Um commit para o lote inteiro
+    db.commit()
+    _apos_commit(db, livros, devolucoes=sum(1 for item in itens if item.sucesso))
+    return _resumir(itens)
+
+
+# --- Balcão: código de barras + CPF ---
+
+class MapaCodigosBarras:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.carregado = False
+        self._mapa: Dict[str, Tuple[int, str]] = {}
+
+    def garantir_carregado(self, db: Session) -> None:
+        if self.carregado:
+            return
+        with self._lock:
+            if self.carregado:
+                return
+            self._mapa = {
+                codigo: (id_exemplar, id_livro)
+                for codigo, id_exemplar, id_livro in db.execute(
+                    select(models.Exemplar.codigo_barras, models.Exemplar.id_exemplar, models.Exemplar.id_livro)
+                    .where(models.Exemplar.codigo_barras.is_not(None))
+                    .execution_options(yield_per=10000)
+                )
+            }
+            self.carregado = True
+
+    def registrar(self, codigo_barras: Optional[str], id_exemplar: int, id_livro: str) -> None:
+        if codigo_barras and self.carregado:
+            self._mapa[codigo_barras] = (id_exemplar, id_livro)
+
+    def atualizar_livros(self, db: Session, ids_livros: Iterable[str]) -> None:
+        """Registra os exemplares dos livros informados (ex.: após uma importação)."""
+        ids_livros = set(ids_livros)
+        if not ids_livros or not self.carregado:
+            return
+        for codigo, id_exemplar, id_livro in db.execute(
+            select(models.Exemplar.codigo_barras, models.Exemplar.id_exemplar, models.Exemplar.id_livro)
+            .where(models.Exemplar.id_livro.in_(ids_livros), models.Exemplar.codigo_barras.is_not(None))
+        ):
+            self._mapa[codigo] = (id_exemplar, id_livro)
+
+    def resolver(self, db: Session, codigo_barras: str) -> Tuple[int, str]:
+        """(id_exemplar, id_livro) do código. Levanta 404 se o exemplar não existir."""
+        self.garantir_carregado(db)
+        encontrado = self._mapa.get(codigo_barras)
+        if encontrado is None:
+            # Pode ter sido cadastrado por outro processo da API: confere no banco
+            linha = db.execute(
+                select(models.Exemplar.id_exemplar, models.Exemplar.id_livro)
+                .where(models.Exemplar.codigo_barras == codigo_barras)
+            ).first()
+            if linha is None:
+                raise HTTPException(status_code=404, detail="Exemplar não encontrado.")
+            encontrado = self._mapa[codigo_barras] = (linha.id_exemplar, linha.id_livro)
+        return encontrado
+
+
+mapa_codigos = MapaCodigosBarras()
+
+
+def emprestar_por_codigo(
+    db: Session, codigo_barras: str, cpf: str, data_prevista_devolucao: Optional[date] = None
+) -> dict:
+    id_exemplar, id_livro = mapa_codigos.resolver(db, codigo_barras)
+
+    # O cliente é resolvido pelo CPF dentro do próprio INSERT (índice idx_usuario_cpf);
+    # disponibilidade e limite de empréstimos continuam a cargo das triggers
+    origem = select(
+        literal(id_exemplar),
+        models.UsuarioCliente.id_cliente,
+        literal(data_prevista_devolucao, models.Emprestimo.data_prevista_devolucao.type),  # Nulo: a trigger define
+        literal(True),
+    ).where(models.UsuarioCliente.cpf == cpf)
+    try:
+        resultado = db.execute(
+            insert(models.Emprestimo).from_select(
+                ["id_exemplar", "id_cliente", "data_prevista_devolucao", "ativo"], origem
+            )
+        )
+        if resultado.rowcount == 0:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Cliente não encontrado para este CPF.")
+        emprestimo = db.execute(
+            select(
+                models.Emprestimo.id_emprestimo,
+                models.Emprestimo.id_cliente,
+                models.Emprestimo.data_emprestimo,
+                models.Emprestimo.data_prevista_devolucao,
+            ).where(models.Emprestimo.id_emprestimo == resultado.lastrowid)
+        ).one()
+        db.commit()
+    except (IntegrityError, OperationalError) as e:
+        db.rollback()
+        mensagem = _mensagem_banco(e)
+        raise HTTPException(status_code=500 if mensagem.startswith("Erro de banco") else 400, detail=mensagem)
+
+    _apos_commit(db, [id_livro], emprestimos=1)
+    return {**emprestimo._asdict(), "id_exemplar": id_exemplar, "codigo_barras": codigo_barras}
+
+
+def devolver_por_codigo(db: Session, codigo_barras: str) -> dict:
+    id_exemplar, id_livro = mapa_codigos.resolver(db, codigo_barras)
+    id_emprestimo = db.execute(
+        select(models.Emprestimo.id_emprestimo)
+        .where(models.Emprestimo.id_exemplar == id_exemplar, models.Emprestimo.ativo == True)
+        .with_for_update()
+    ).scalar()
+    if id_emprestimo is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Nenhum empréstimo ativo para este exemplar.")
+    try:
+        db.execute(text("CALL finalizar_emprestimo(:id)"), {"id": id_emprestimo})
+        db.commit()
+    except (IntegrityError, OperationalError) as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=_mensagem_banco(e))
+
+    _apos_commit(db, [id_livro], devolucoes=1)
+    return {"id_emprestimo": id_emprestimo, "codigo_barras": codigo_barras, "message": "Empréstimo finalizado com sucesso."}
@@ -0,0 +1,34 @@
+# consultas.py
+# Opções de carregamento (eager loading) compartilhadas pelas rotas
+# síncronas (main.py) e assíncronas (rotas_async.py).
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+
+
+def opcoes_livro():
+    """
+    Estratégia de carregamento das relações de Livro.
+    Autores e categorias (N:N) vêm em consultas separadas com IN sobre os
+    IDs da página (selectinload), em vez de JOINs que multiplicam as linhas
+    (4 autores x 5 categorias = 20 linhas por livro). A editora (N:1) não
+    multiplica linhas, então continua no JOIN.
+    """
+    return (
+        selectinload(models.Livro.autores),
+        selectinload(models.Livro.categorias),
+        joinedload(models.Livro.editora),
+    )
+
+def opcoes_emprestimo():
+    """
+    Carrega tudo o que schemas.Emprestimo serializa: cliente, exemplar e o
+    livro do exemplar (com suas relações). Obrigatório na sessão assíncrona,
+    onde um lazy-load durante a serialização não é permitido.
+    """
+    return (
+        joinedload(models.Emprestimo.cliente),
+        joinedload(models.Emprestimo.exemplar)
+            .joinedload(models.Exemplar.livro)
+            .options(*opcoes_livro()),
+    )
@@ -0,0 +1,131 @@
+# disponibilidade.py
+# Projeção em memória da disponibilidade do acervo: para cada livro, quantos
+# exemplares estão disponíveis, emprestados, reservados ou perdidos.
+#
+# Consultar a view Acervo_Disponivel (livro x exemplar filtrado por status)
+# a cada pergunta não escala. Aqui:
+#   - a carga inicial é UMA consulta agrupada (id_livro, status), coberta
+#     pelo índice idx_exemplar_livro_status
+#   - depois de criar empréstimo, finalizar empréstimo ou criar exemplares,
+#     as rotas chamam atualizar_livros(); a contagem do livro é relida do
+#     banco (também pelo índice). Recontar em vez de somar/subtrair evita
+#     deriva: quem decide se o exemplar devolvido fica 'Disponível' ou
+#     'Reservado' é a procedure finalizar_emprestimo, não a API
+#   - as consultas (inclusive em lote) são só leituras de dicionário
+#   - atualizar_livros() nunca levanta erro: a ação da rota já foi
+#     confirmada. Se a recontagem falhar, o livro fica pendente e é
+#     recontado na próxima consulta
+# Cada processo da API tem a sua projeção, montada no primeiro uso. Os
+# livros recontados por um processo são avisados aos outros pelo estado
+# compartilhado (canal "disponibilidade"); quem recebe reconta esses livros
+# na próxima consulta.
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+from estado_compartilhado import estado
+
+# Ordem dos contadores em cada tupla da projeção
+_STATUS = (
+    models.StatusExemplarEnum.Disponível,
+    models.StatusExemplarEnum.Emprestado,
+    models.StatusExemplarEnum.Reservado,
+    models.StatusExemplarEnum.Perda,
+)
+_POSICAO = {status: i for i, status in enumerate(_STATUS)}
+_VAZIO = (0, 0, 0, 0)
+CANAL = "disponibilidade"
+
+logger = logging.getLogger("biblioteca.disponibilidade")
+
+
+class ProjecaoDisponibilidade:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.carregado = False
+        # id_livro -> (disponiveis, emprestados, reservados, perdidos)
+        self._contagens: Dict[str, Tuple[int, int, int, int]] = {}
+        # Livros alterados por outros processos, a recontar
+        self._pendentes: Set[str] = set()
+
+    def garantir_carregado(self, db: Session) -> None:
+        if self.carregado and not self._pendentes:
+            return
+        with self._lock:
+            if not self.carregado:
+                self._pendentes = set()
+                self._contagens = _contar(db)
+                self.carregado = True
+                return
+            pendentes, self._pendentes = self._pendentes, set()
+        self._recontar(db, pendentes)
+
+    def atualizar_livros(self, db: Session, ids_livros: Iterable[str]) -> None:
+        """Reconta os livros informados e avisa os outros processos. Chame depois do commit."""
+        ids_livros = set(ids_livros)
+        if not ids_livros:
+            return
+        try:
+            estado.publicar(CANAL, json.dumps(sorted(ids_livros)))
+        except Exception:
+            logger.exception("Falha ao avisar os outros processos sobre %d livros", len(ids_livros))
+        # Sem projeção montada, a carga inicial já vai ler o estado atual
+        if self.carregado:
+            try:
+                self._recontar(db, ids_livros)
+            except Exception:
+                logger.exception("Falha ao recontar %d livros; ficam para a próxima consulta", len(ids_livros))
+                with self._lock:
+                    self._pendentes.update(ids_livros)
+
+    def _recontar(self, db: Session, ids_livros: Set[str]) -> None:
+        if not ids_livros:
+            return
+        contagens = _contar(db, ids_livros)
+        with self._lock:
+            for id_livro in ids_livros:
+                self._contagens[id_livro] = contagens.get(id_livro, _VAZIO)
+
+    def marcar_alterados(self, mensagem: str) -> None:
+        """Assinatura do canal: livros recontados por outro processo."""
+        if self.carregado:
+            with self._lock:
+                self._pendentes.update(json.loads(mensagem))
+
+    def consultar(self, ids_livros: List[str]) -> List[dict]:
+        """Dicionários no formato de schemas.Disponibilidade (a rota valida pelo response_model)."""
+        contagens = self._contagens
+        resultado = []
+        for id_livro in ids_livros:
+            disponiveis, emprestados, reservados, perdidos = contagens.get(id_livro, _VAZIO)
+            resultado.append({
+                "id_livro": id_livro,
+                "disponiveis": disponiveis,
+                "emprestados": emprestados,
+                "reservados": reservados,
+                "perdidos": perdidos,
+                "total": disponiveis + emprestados + reservados + perdidos,
+            })
+        return resultado
+
+
+def _contar(db: Session, ids_livros=None) -> Dict[str, Tuple[int, int, int, int]]:
+    stmt = select(models.Exemplar.id_livro, models.Exemplar.status, func.count()).group_by(
+        models.Exemplar.id_livro, models.Exemplar.status
+    )
+    if ids_livros is not None:
+        stmt = stmt.where(models.Exemplar.id_livro.in_(ids_livros))
+
+    parciais: Dict[str, List[int]] = {}
+    for id_livro, status, quantidade in db.execute(stmt):
+        parciais.setdefault(id_livro, [0, 0, 0, 0])[_POSICAO[status]] = quantidade
+    return {id_livro: tuple(valores) for id_livro, valores in parciais.items()}
+
+
+projecao = ProjecaoDisponibilidade()
+estado.assinar(CANAL, projecao.marcar_alterados)
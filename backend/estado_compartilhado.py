@@ -0,0 +1,391 @@
+# estado_compartilhado.py
+# Estado compartilhado entre os processos da API (uvicorn --workers N).
+#
+# Caches e contadores em memória são por processo: com vários workers, um
+# cadastro feito no worker A não aparece no cache do worker B, e cada um
+# conta só o seu movimento. Este módulo oferece, atrás de uma interface só:
+#   - chave/valor com TTL:   obter(chave), guardar(chave, valor, ttl), remover(chave)
+#   - contadores atômicos:   incrementar(chave, delta, ttl) -> int, contador(chave)
+#   - publicação/assinatura: publicar(canal, mensagem), assinar(canal, funcao)
+#   - baldes de fichas:      consumir_fichas([(chave, capacidade, por_segundo), ...])
+#     (limite de taxa: tira 1 ficha de todos os baldes ou de nenhum)
+# Valores são bytes; mensagens são texto.
+#
+# Quem publica já aplicou a mudança no próprio processo: a mensagem chega
+# só aos OUTROS processos (ex.: "reconte estes livros").
+#
+# O backend é escolhido por ESTADO_BACKEND:
+#   - "memoria": dicionários do próprio processo (padrão; um worker só).
+#     publicar não tem a quem entregar
+#   - "sqlite": um arquivo SQLite local (ESTADO_ARQUIVO) usado por todos os
+#     workers da mesma máquina. As mensagens ficam numa tabela que cada
+#     processo lê a cada ESTADO_INTERVALO_ASSINATURA_MS
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND = os.getenv("ESTADO_BACKEND", "memoria")
+ARQUIVO_SQLITE = os.getenv("ESTADO_ARQUIVO", os.path.join(tempfile.gettempdir(), "biblioteca_estado.db"))
+MAX_ENTRADAS = int(os.getenv("ESTADO_MAX_ENTRADAS", "10000"))
+MAX_BALDES = int(os.getenv("ESTADO_MAX_BALDES", "100000"))
+INTERVALO_ASSINATURA_SEGUNDOS = float(os.getenv("ESTADO_INTERVALO_ASSINATURA_MS", "200")) / 1000
+# Mensagens mais velhas que isso são apagadas (um processo parado mais tempo recarrega tudo ao voltar)
+RETENCAO_MENSAGENS_SEGUNDOS = 60.0
+
+logger = logging.getLogger("biblioteca.estado")
+
+
+class _Assinaturas:
+    """Funções assinadas por canal e a contagem de mensagens trocadas."""
+
+    def __init__(self):
+        self._funcoes: Dict[str, List[Callable[[str], None]]] = {}
+        self.publicadas = 0
+        self.recebidas = 0
+
+    def adicionar(self, canal: str, funcao: Callable[[str], None]) -> None:
+        self._funcoes.setdefault(canal, []).append(funcao)
+
+    def entregar(self, canal: str, mensagem: str) -> None:
+        self.recebidas += 1
+        for funcao in self._funcoes.get(canal, ()):
+            try:
+                funcao(mensagem)
+            except Exception:
+                logger.exception("Falha ao tratar mensagem do canal %s", canal)
+
+
+Balde = Tuple[str, float, float]  # (chave, capacidade, fichas por segundo)
+
+
+def _consumir(baldes: List[Balde], estados: List[Optional[Tuple[float, float]]], agora: float):
+    """
+    Regra comum aos backends. 'estados' traz (fichas, atualizado_em) de cada
+    balde (None = balde novo, cheio). Devolve (novos estados, None) se todos
+    tinham ficha, ou (None, (índice do balde que recusou, segundos até haver ficha)).
+    """
+    novos = []
+    recusa = None
+    for i, ((_, capacidade, por_segundo), estado_balde) in enumerate(zip(baldes, estados)):
+        fichas, atualizado_em = estado_balde if estado_balde is not None else (capacidade, agora)
+        fichas = min(capacidade, fichas + max(0.0, agora - atualizado_em) * por_segundo)
+        if fichas < 1:
+            espera = (1 - fichas) / por_segundo if por_segundo > 0 else math.inf
+            if recusa is None or espera > recusa[1]:
+                recusa = (i, espera)
+        # Instante em que o balde estaria cheio de novo: depois disso pode ser apagado
+        cheio_em = agora + (capacidade - (fichas - 1)) / por_segundo if por_segundo > 0 else math.inf
+        novos.append((fichas - 1, agora, cheio_em))
+    if recusa is not None:
+        return None, recusa
+    return novos, None
+
+
+class EstadoMemoria:
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, max_baldes: int = MAX_BALDES):
+        self.max_entradas = max_entradas
+        self.max_baldes = max_baldes
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Contadores não entram no LRU: perder uma versão faria o cache servir dados velhos
+        self._contadores: Dict[str, Tuple[int, Optional[float]]] = {}
+        # chave -> (fichas, atualizado_em, cheio_em)
+        self._baldes: Dict[str, Tuple[float, float, float]] = {}
+        self._assinaturas = _Assinaturas()
+
+    # --- Chave/valor ---
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: str, valor: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entradas[chave] = (time.monotonic() + ttl, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def remover(self, chave: str) -> None:
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+    # --- Contadores ---
+
+    def incrementar(self, chave: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        """Soma 'delta' e devolve o novo valor. O TTL vale a partir da criação do contador."""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._contadores.get(chave)
+            if entrada is None or entrada[1] is not None and entrada[1] < agora:
+                valor, expira_em = 0, (agora + ttl if ttl is not None else None)
+            else:
+                valor, expira_em = entrada
+            valor += delta
+            self._contadores[chave] = (valor, expira_em)
+            if ttl is not None and len(self._contadores) > self.max_entradas:
+                self._limpar_contadores(agora)
+            return valor
+
+    def contador(self, chave: str) -> int:
+        with self._lock:
+            valor, expira_em = self._contadores.get(chave, (0, None))
+            if expira_em is not None and expira_em < time.monotonic():
+                return 0
+            return valor
+
+    def _limpar_contadores(self, agora: float) -> None:
+        for chave in [c for c, (_, expira_em) in self._contadores.items() if expira_em is not None and expira_em < agora]:
+            del self._contadores[chave]
+
+    # --- Baldes de fichas ---
+
+    def consumir_fichas(self, baldes: List[Balde]) -> Optional[Tuple[int, float]]:
+        """
+        Tira 1 ficha de cada balde. Se faltar ficha em algum, não debita nenhum
+        e devolve (índice do balde que recusou, segundos até haver ficha).
+        """
+        agora = time.monotonic()
+        with self._lock:
+            estados = [self._baldes.get(chave) for chave, _, _ in baldes]
+            novos, recusa = _consumir(baldes, [e[:2] if e is not None else None for e in estados], agora)
+            if novos is None:
+                return recusa
+            if len(self._baldes) + len(baldes) > self.max_baldes:
+                self._limpar_baldes(agora)
+            for (chave, _, _), novo in zip(baldes, novos):
+                self._baldes[chave] = novo
+            return None
+
+    def _limpar_baldes(self, agora: float) -> None:
+        # Chamado com o lock. Baldes que já estariam cheios (clientes parados): recriá-los dá no mesmo
+        for chave in [c for c, (_, _, cheio_em) in self._baldes.items() if cheio_em <= agora]:
+            del self._baldes[chave]
+        # Ainda cheio (muitos clientes ativos): descarta os mais antigos
+        excesso = len(self._baldes) - self.max_baldes // 2
+        if excesso > 0:
+            for chave in list(self._baldes)[:excesso]:
+                del self._baldes[chave]
+
+    # --- Publicação/assinatura ---
+
+    def publicar(self, canal: str, mensagem: str) -> None:
+        self._assinaturas.publicadas += 1
+
+    def assinar(self, canal: str, funcao: Callable[[str], None]) -> None:
+        self._assinaturas.adicionar(canal, funcao)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memoria",
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "contadores": len(self._contadores),
+                "baldes": len(self._baldes),
+                "mensagens_publicadas": self._assinaturas.publicadas,
+                "mensagens_recebidas": self._assinaturas.recebidas,
+            }
+
+
+class EstadoSqlite:
+    # A cada quantas gravações as entradas e mensagens vencidas são apagadas do arquivo
+    LIMPEZA_A_CADA = 200
+
+    def __init__(self, arquivo: str = ARQUIVO_SQLITE, intervalo_assinatura: float = INTERVALO_ASSINATURA_SEGUNDOS):
+        self.arquivo = arquivo
+        self.intervalo_assinatura = intervalo_assinatura
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        # Identifica este processo nas mensagens (o pid pode se repetir entre reinícios)
+        self._origem = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._assinaturas = _Assinaturas()
+        self._leitor: Optional[threading.Thread] = None
+        self._conexao = sqlite3.connect(arquivo, timeout=5, check_same_thread=False, isolation_level=None)
+        # WAL: leitores de outros processos não bloqueiam quem grava
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS valor (chave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira_em REAL NOT NULL)"
+        )
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS contador (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL, expira_em REAL)"
+        )
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS balde (chave TEXT PRIMARY KEY, fichas REAL NOT NULL, "
+            "atualizado_em REAL NOT NULL, cheio_em REAL NOT NULL)"
+        )
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS mensagem (id INTEGER PRIMARY KEY AUTOINCREMENT, canal TEXT NOT NULL, "
+            "conteudo TEXT NOT NULL, origem TEXT NOT NULL, criado_em REAL NOT NULL)"
+        )
+        # Só as mensagens publicadas depois de subir interessam
+        self._ultima_mensagem = self._conexao.execute("SELECT COALESCE(MAX(id), 0) FROM mensagem").fetchone()[0]
+
+    # --- Chave/valor ---
+    # time.time (e não monotonic): os prazos são comparados entre processos
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT valor FROM valor WHERE chave = ? AND expira_em >= ?", (chave, time.time())
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def guardar(self, chave: str, valor: bytes, ttl: float) -> None:
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO valor (chave, valor, expira_em) VALUES (?, ?, ?)",
+                (chave, valor, time.time() + ttl),
+            )
+            self._contar_gravacao()
+
+    def remover(self, chave: str) -> None:
+        with self._lock:
+            self._conexao.execute("DELETE FROM valor WHERE chave = ?", (chave,))
+
+    # --- Contadores ---
+
+    def incrementar(self, chave: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        """Soma 'delta' e devolve o novo valor (atômico entre processos). O TTL vale a partir da criação."""
+        agora = time.time()
+        expira_em = agora + ttl if ttl is not None else None
+        with self._lock:
+            valor = self._conexao.execute(
+                "INSERT INTO contador (chave, valor, expira_em) VALUES (?, ?, ?) "
+                "ON CONFLICT(chave) DO UPDATE SET "
+                "  valor = CASE WHEN contador.expira_em < ? THEN excluded.valor ELSE contador.valor + excluded.valor END, "
+                "  expira_em = CASE WHEN contador.expira_em < ? THEN excluded.expira_em ELSE contador.expira_em END "
+                "RETURNING valor",
+                (chave, delta, expira_em, agora, agora),
+            ).fetchone()[0]
+            if ttl is not None:
+                self._contar_gravacao()
+        return valor
+
+    def contador(self, chave: str) -> int:
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT valor FROM contador WHERE chave = ? AND (expira_em IS NULL OR expira_em >= ?)",
+                (chave, time.time()),
+            ).fetchone()
+        return linha[0] if linha else 0
+
+    def _contar_gravacao(self) -> None:
+        # Chamado com o lock
+        self._gravacoes += 1
+        if self._gravacoes % self.LIMPEZA_A_CADA == 0:
+            agora = time.time()
+            self._conexao.execute("DELETE FROM valor WHERE expira_em < ?", (agora,))
+            self._conexao.execute("DELETE FROM contador WHERE expira_em < ?", (agora,))
+            self._conexao.execute("DELETE FROM balde WHERE cheio_em < ?", (agora,))
+            self._conexao.execute("DELETE FROM mensagem WHERE criado_em < ?", (agora - RETENCAO_MENSAGENS_SEGUNDOS,))
+
+    # --- Baldes de fichas ---
+
+    def consumir_fichas(self, baldes: List[Balde]) -> Optional[Tuple[int, float]]:
+        """Como EstadoMemoria.consumir_fichas, atômico entre processos (uma transação de escrita)."""
+        agora = time.time()
+        chaves = [chave for chave, _, _ in baldes]
+        with self._lock:
+            # IMMEDIATE: trava a escrita já na leitura, senão dois processos gastariam a mesma ficha
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                atuais = {
+                    chave: (fichas, atualizado_em)
+                    for chave, fichas, atualizado_em in self._conexao.execute(
+                        f"SELECT chave, fichas, atualizado_em FROM balde WHERE chave IN ({','.join('?' * len(chaves))})",
+                        chaves,
+                    )
+                }
+                novos, recusa = _consumir(baldes, [atuais.get(chave) for chave in chaves], agora)
+                if novos is not None:
+                    self._conexao.executemany(
+                        "INSERT OR REPLACE INTO balde (chave, fichas, atualizado_em, cheio_em) VALUES (?, ?, ?, ?)",
+                        [(chave, *novo) for chave, novo in zip(chaves, novos)],
+                    )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            if novos is not None:
+                self._contar_gravacao()
+        return recusa
+
+    # --- Publicação/assinatura ---
+
+    def publicar(self, canal: str, mensagem: str) -> None:
+        with self._lock:
+            self._conexao.execute(
+                "INSERT INTO mensagem (canal, conteudo, origem, criado_em) VALUES (?, ?, ?, ?)",
+                (canal, mensagem, self._origem, time.time()),
+            )
+            self._assinaturas.publicadas += 1
+            self._contar_gravacao()
+
+    def assinar(self, canal: str, funcao: Callable[[str], None]) -> None:
+        """'funcao(mensagem)' roda na thread leitora deste processo: deve ser rápida."""
+        self._assinaturas.adicionar(canal, funcao)
+        with self._lock:
+            if self._leitor is None:
+                self._leitor = threading.Thread(target=self._ler_mensagens, name="estado-mensagens", daemon=True)
+                self._leitor.start()
+
+    def _ler_mensagens(self) -> None:
+        while True:
+            time.sleep(self.intervalo_assinatura)
+            try:
+                with self._lock:
+                    linhas = self._conexao.execute(
+                        "SELECT id, canal, conteudo, origem FROM mensagem WHERE id > ? ORDER BY id",
+                        (self._ultima_mensagem,),
+                    ).fetchall()
+                    if linhas:
+                        self._ultima_mensagem = linhas[-1][0]
+            except sqlite3.Error:
+                logger.exception("Falha ao ler mensagens do estado compartilhado")
+                continue
+            for _, canal, conteudo, origem in linhas:
+                if origem != self._origem:
+                    self._assinaturas.entregar(canal, conteudo)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            entradas = self._conexao.execute("SELECT COUNT(*) FROM valor").fetchone()[0]
+            contadores = self._conexao.execute("SELECT COUNT(*) FROM contador").fetchone()[0]
+            baldes = self._conexao.execute("SELECT COUNT(*) FROM balde").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "arquivo": self.arquivo,
+            "entradas": entradas,
+            "contadores": contadores,
+            "baldes": baldes,
+            "mensagens_publicadas": self._assinaturas.publicadas,
+            "mensagens_recebidas": self._assinaturas.recebidas,
+        }
+
+
+def criar_estado(nome: str = BACKEND):
+    if nome == "memoria":
+        return EstadoMemoria()
+    if nome == "sqlite":
+        return EstadoSqlite()
+    raise ValueError(f"ESTADO_BACKEND inválido: {nome!r} (use 'memoria' ou 'sqlite')")
+
+
+estado = criar_estado()
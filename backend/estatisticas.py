@@ -0,0 +1,274 @@
+# estatisticas.py
+# Números do painel (dashboard) servidos de memória.
+#
+# Um job periódico (agendador.py) calcula um retrato agregado com poucas
+# consultas agrupadas (totais, exemplares por status, empréstimos por dia e
+# rankings dos últimos DIAS_JANELA dias). Entre um retrato e outro, os
+# empréstimos e devoluções registrados pela API ajustam contadores (ativos
+# e movimento do dia), então esses números não esperam o próximo retrato. A rota /api/stats só lê o retrato + contadores: O(1).
+#
+# Defasagem máxima: se o retrato ficar mais velho que VALIDADE_SEGUNDOS
+# (ex.: agendador desligado), a requisição continua recebendo o retrato
+# velho e dispara um recálculo em segundo plano. Só a primeira leitura, sem
+# retrato nenhum, calcula na própria requisição.
+#
+# Retrato e contadores ficam no estado compartilhado (estado_compartilhado.py),
+# então todos os workers mostram os mesmos números. Cada retrato tem uma
+# geração; os contadores de movimento são por geração, de modo que um novo
+# retrato começa com contadores zerados sem precisar apagar nada:
+#   - a geração nova é reservada ANTES das consultas: um movimento confirmado
+#     durante o cálculo cai nos contadores dela (se as consultas já o viram,
+#     conta duas vezes até o retrato seguinte; nunca se perde)
+#   - a leitura soma os contadores desde a geração do retrato até a atual:
+#     enquanto o retrato novo não é gravado (ou se o cálculo falhar), o
+#     movimento da geração reservada continua aparecendo
+#   - um recálculo por vez entre os workers (reserva com TTL no estado
+#     compartilhado); se dois se sobrepuserem mesmo assim, só a geração mais
+#     nova é gravada
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import agendador
+import models
+from estado_compartilhado import estado
+
+NOME_JOB = "estatisticas"
+INTERVALO_SEGUNDOS = float(os.getenv("ESTATISTICAS_INTERVALO_SEGUNDOS", "60"))
+VALIDADE_SEGUNDOS = float(os.getenv("ESTATISTICAS_VALIDADE_SEGUNDOS", str(INTERVALO_SEGUNDOS * 3)))
+DIAS_JANELA = 30
+TAMANHO_RANKING = 10
+# Retrato velho ainda é servido enquanto o recálculo não termina; depois disso some
+RETENCAO_SEGUNDOS = 24 * 3600
+# Duração máxima da reserva de um recálculo (liberada ao terminar; o TTL cobre um worker que morreu no meio)
+RESERVA_SEGUNDOS = INTERVALO_SEGUNDOS / 2
+# Gerações somadas na leitura, no máximo (recálculos seguidos sem gravar retrato)
+MAX_GERACOES_SOMADAS = 5
+# Primeira leitura com outro worker calculando: espera o retrato dele até este limite
+ESPERA_RETRATO_SEGUNDOS = 10.0
+# Prefixo das chaves no estado compartilhado
+PREFIXO = "estatisticas:"
+
+logger = logging.getLogger("biblioteca.estatisticas")
+
+
+class PainelEstatisticas:
+    def __init__(self, estado):
+        self.estado = estado
+        self._lock = threading.Lock()
+        self._atualizando = threading.Lock()  # Um recálculo em segundo plano por processo
+        # Último retrato lido (bytes guardados, geração, retrato): evita decodificar o JSON a cada requisição
+        self._local: Optional[Tuple[bytes, int, dict]] = None
+
+    # --- Eventos (chamados pelas rotas depois do commit) ---
+
+    def registrar_emprestimos(self, quantidade: int = 1) -> None:
+        if quantidade:
+            self._registrar(quantidade, 0)
+
+    def registrar_devolucoes(self, quantidade: int = 1) -> None:
+        if quantidade:
+            self._registrar(0, quantidade)
+
+    def _registrar(self, emprestimos: int, devolucoes: int) -> None:
+        # Movimento registrado depois do último retrato, nos contadores da geração atual.
+        # Vivem tanto quanto um retrato pode ser servido, então nunca somem antes dele.
+        # Nunca levanta erro: a ação já foi confirmada (o próximo retrato corrige a contagem).
+        try:
+            prefixo = f"{PREFIXO}g{self.estado.contador(PREFIXO + 'geracao')}:"
+            hoje = date.today().isoformat()
+            ttl = RETENCAO_SEGUNDOS
+            if emprestimos - devolucoes:
+                self.estado.incrementar(prefixo + "ativos", emprestimos - devolucoes, ttl)
+            if emprestimos:
+                self.estado.incrementar(f"{prefixo}emprestimos:{hoje}", emprestimos, ttl)
+            if devolucoes:
+                self.estado.incrementar(f"{prefixo}devolucoes:{hoje}", devolucoes, ttl)
+        except Exception:
+            logger.exception("Falha ao registrar movimento no painel (%d empréstimos, %d devoluções)", emprestimos, devolucoes)
+
+    # --- Retrato ---
+
+    def recalcular(self, db: Session) -> dict:
+        """Job: recalcula o retrato e começa uma geração nova de contadores."""
+        gerado = self._gerar(db)
+        if gerado is None:
+            return {"recalculado": False}  # Outro worker está recalculando
+        return {"recalculado": True, "gerado_em": gerado[1]["gerado_em"].isoformat()}
+
+    def _gerar(self, db: Session) -> Optional[Tuple[int, dict]]:
+        """Recalcula e grava o retrato. Devolve None se outro recálculo estiver reservado."""
+        reserva = PREFIXO + "recalculo"
+        if self.estado.incrementar(reserva, 1, RESERVA_SEGUNDOS) != 1:
+            self.estado.incrementar(reserva, -1, RESERVA_SEGUNDOS)
+            return None
+        try:
+            # Reservada antes das consultas: movimento confirmado durante o cálculo não se perde
+            geracao = self.estado.incrementar(PREFIXO + "geracao")
+            retrato = _calcular(db)
+            if self.estado.contador(PREFIXO + "geracao") != geracao:
+                # Um recálculo sobreposto reservou uma geração mais nova e gravará o retrato dela
+                return geracao, retrato
+            corpo = json.dumps({"geracao": geracao, **retrato}, default=lambda valor: valor.isoformat()).encode("utf-8")
+            self.estado.guardar(PREFIXO + "retrato", corpo, RETENCAO_SEGUNDOS)
+            with self._lock:
+                self._local = (corpo, geracao, retrato)
+            return geracao, retrato
+        finally:
+            self.estado.incrementar(reserva, -1, RESERVA_SEGUNDOS)
+
+    def _retrato_atual(self, db: Session) -> Tuple[int, dict]:
+        bruto = self.estado.obter(PREFIXO + "retrato")
+        if bruto is None:
+            return self._primeiro_retrato(db)
+        with self._lock:
+            if self._local is not None and self._local[0] == bruto:
+                geracao, retrato = self._local[1], self._local[2]
+                bruto = None
+        if bruto is not None:
+            guardado = json.loads(bruto)
+            geracao = guardado.pop("geracao")
+            guardado["gerado_em"] = datetime.fromisoformat(guardado["gerado_em"])
+            for item in guardado["emprestimos_por_dia"]:
+                item["dia"] = date.fromisoformat(item["dia"])
+            with self._lock:
+                self._local = (bruto, geracao, guardado)
+            retrato = guardado
+        if (datetime.now() - retrato["gerado_em"]).total_seconds() > VALIDADE_SEGUNDOS:
+            self._atualizar_em_segundo_plano()
+        return geracao, retrato
+
+    def _primeiro_retrato(self, db: Session) -> Tuple[int, dict]:
+        """Sem retrato nenhum (subida, retrato expirado): calcula aqui ou espera o worker que já está calculando."""
+        gerado = self._gerar(db)
+        if gerado is not None:
+            return gerado
+        limite = time.monotonic() + ESPERA_RETRATO_SEGUNDOS
+        while time.monotonic() < limite:
+            time.sleep(0.1)
+            if self.estado.obter(PREFIXO + "retrato") is not None:
+                return self._retrato_atual(db)
+        raise HTTPException(
+            status_code=503,
+            detail="Estatísticas em cálculo. Tente novamente em instantes.",
+            headers={"Retry-After": str(int(ESPERA_RETRATO_SEGUNDOS))},
+        )
+
+    def _atualizar_em_segundo_plano(self) -> None:
+        if not self._atualizando.acquire(blocking=False):
+            return
+
+        def executar():
+            try:
+                # Pelo agendador: mesma sessão, métricas e lock do job periódico
+                agendador.agendador.executar(NOME_JOB)
+            finally:
+                self._atualizando.release()
+
+        threading.Thread(target=executar, name="estatisticas-recalculo", daemon=True).start()
+
+    def obter(self, db: Session) -> dict:
+        geracao, retrato = self._retrato_atual(db)
+        # Normalmente só a geração do retrato; mais de uma durante um recálculo
+        atual = self.estado.contador(PREFIXO + "geracao")
+        prefixos = [f"{PREFIXO}g{g}:" for g in range(geracao, min(max(atual, geracao), geracao + MAX_GERACOES_SOMADAS - 1) + 1)]
+
+        por_dia = {item["dia"]: dict(item) for item in retrato["emprestimos_por_dia"]}
+        # Dias com movimento possível desde o retrato (normalmente só hoje)
+        dia = retrato["gerado_em"].date()
+        while dia <= date.today():
+            emprestimos = sum(self.estado.contador(f"{p}emprestimos:{dia.isoformat()}") for p in prefixos)
+            devolucoes = sum(self.estado.contador(f"{p}devolucoes:{dia.isoformat()}") for p in prefixos)
+            if emprestimos or devolucoes:
+                item = por_dia.setdefault(dia, {"dia": dia, "emprestimos": 0, "devolucoes": 0})
+                item["emprestimos"] += emprestimos
+                item["devolucoes"] += devolucoes
+            dia += timedelta(days=1)
+
+        ativos = sum(self.estado.contador(p + "ativos") for p in prefixos)
+        return {
+            **retrato,
+            "emprestimos_ativos": retrato["emprestimos_ativos"] + ativos,
+            "emprestimos_por_dia": sorted(por_dia.values(), key=lambda item: item["dia"]),
+            "defasagem_maxima_segundos": VALIDADE_SEGUNDOS,
+        }
+
+
+def _calcular(db: Session) -> dict:
+    agora = datetime.now()
+    inicio = datetime.combine(date.today() - timedelta(days=DIAS_JANELA - 1), datetime.min.time())
+    Emprestimo, Exemplar = models.Emprestimo, models.Exemplar
+
+    exemplares = {status.value: 0 for status in models.StatusExemplarEnum}
+    for status, quantidade in db.execute(select(Exemplar.status, func.count()).group_by(Exemplar.status)):
+        exemplares[status.value] = quantidade
+
+    ativos = db.execute(select(func.count()).where(Emprestimo.ativo == True)).scalar_one()
+    atrasados = db.execute(
+        select(func.count())
+        .select_from(models.EmprestimoAtrasado)
+        .join(Emprestimo, Emprestimo.id_emprestimo == models.EmprestimoAtrasado.id_emprestimo)
+        .where(Emprestimo.ativo == True)
+    ).scalar_one()
+
+    # Janela dos últimos dias: faixa do índice idx_emprestimo_data
+    dia_emprestimo = func.date(Emprestimo.data_emprestimo)
+    por_dia = {}
+    for dia, quantidade in db.execute(
+        select(dia_emprestimo, func.count()).where(Emprestimo.data_emprestimo >= inicio).group_by(dia_emprestimo)
+    ):
+        dia = date.fromisoformat(dia) if isinstance(dia, str) else dia
+        por_dia[dia] = {"dia": dia, "emprestimos": quantidade, "devolucoes": 0}
+    dia_devolucao = func.date(Emprestimo.data_devolucao)
+    for dia, quantidade in db.execute(
+        select(dia_devolucao, func.count()).where(Emprestimo.data_devolucao >= inicio).group_by(dia_devolucao)
+    ):
+        dia = date.fromisoformat(dia) if isinstance(dia, str) else dia
+        por_dia.setdefault(dia, {"dia": dia, "emprestimos": 0, "devolucoes": 0})["devolucoes"] = quantidade
+
+    na_janela = Emprestimo.data_emprestimo >= inicio
+    total = func.count().label("emprestimos")
+    top_titulos = db.execute(
+        select(models.Livro.id_livro, models.Livro.titulo, total)
+        .select_from(Emprestimo)
+        .join(Exemplar, Exemplar.id_exemplar == Emprestimo.id_exemplar)
+        .join(models.Livro, models.Livro.id_livro == Exemplar.id_livro)
+        .where(na_janela)
+        .group_by(models.Livro.id_livro, models.Livro.titulo)
+        .order_by(total.desc())
+        .limit(TAMANHO_RANKING)
+    ).all()
+    top_categorias = db.execute(
+        select(models.Categoria.id_categoria, models.Categoria.nome, total)
+        .select_from(Emprestimo)
+        .join(Exemplar, Exemplar.id_exemplar == Emprestimo.id_exemplar)
+        .join(models.livro_categoria_table, models.livro_categoria_table.c.id_livro == Exemplar.id_livro)
+        .join(models.Categoria, models.Categoria.id_categoria == models.livro_categoria_table.c.id_categoria)
+        .where(na_janela)
+        .group_by(models.Categoria.id_categoria, models.Categoria.nome)
+        .order_by(total.desc())
+        .limit(TAMANHO_RANKING)
+    ).all()
+
+    return {
+        "gerado_em": agora,
+        "janela_dias": DIAS_JANELA,
+        "livros": db.execute(select(func.count()).select_from(models.Livro)).scalar_one(),
+        "exemplares": exemplares,
+        "emprestimos_ativos": ativos,
+        "emprestimos_atrasados": atrasados,
+        "emprestimos_por_dia": list(por_dia.values()),
+        "top_titulos": [linha._asdict() for linha in top_titulos],
+        "top_categorias": [linha._asdict() for linha in top_categorias],
+    }
+
+
+painel = PainelEstatisticas(estado)
@@ -0,0 +1,373 @@
+# exportacao.py
+# Exportação de empréstimos, livros, exemplares e clientes em CSV ou Parquet,
+# para relatórios, sem carregar as tabelas em memória.
+#
+# As linhas são lidas em lotes de TAMANHO_LOTE por chave primária ("as
+# próximas N com chave maior que a última exportada", como em paginacao.py)
+# e cada lote é escrito e liberado antes do próximo. Cada lote é uma consulta
+# curta numa transação própria: uma exportação de dezenas de milhões de
+# linhas não segura um cursor nem uma transação aberta por horas, e pode
+# ser retomada a partir da última chave escrita ('apos').
+#
+# - empréstimos: a tabela quente e o histórico arquivado (arquivamento.py),
+#   intercalados pela chave, com a coluna 'arquivado'
+# - livros: autores e categorias achatados numa célula, separados por ";"
+#   (o mesmo formato aceito pela importação do catálogo)
+# - filtros 'de'/'ate' (datas, inclusive) pela data do empréstimo ou pela
+#   data de cadastro
+#
+# Parquet precisa do pyarrow (pip install pyarrow); cada lote vira um row
+# group. CSV não tem dependências.
+#
+# Uso pela linha de comando (a partir da pasta 'backend'):
+#   python exportacao.py emprestimos --formato parquet --saida emprestimos.parquet --de 2024-01-01
+#   python exportacao.py emprestimos --saida emprestimos.csv --retomar
+import argparse
+import csv
+import io
+import os
+import sys
+from datetime import date, timedelta
+from enum import Enum
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+import importacao
+import models
+from database import SessionLocal
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+TAMANHO_LOTE = int(os.getenv("EXPORTACAO_TAMANHO_LOTE", "5000"))
+SEPARADOR_LISTA = importacao.SEPARADOR_LISTA
+FORMATOS = ("csv", "parquet")
+
+
+# --- Tabelas exportáveis ---
+
+class Fonte:
+    """Um SELECT de onde saem as linhas, com a sua coluna de chave e de data."""
+    def __init__(self, stmt, chave, coluna_data):
+        self.stmt = stmt
+        self.chave = chave
+        self.coluna_data = coluna_data
+
+class Tabela:
+    def __init__(self, nome: str, chave: str, colunas: List[Tuple[str, str]],
+                 fontes: Callable[[], List[Fonte]], completar: Optional[Callable[[Session, List[dict]], None]] = None):
+        self.nome = nome
+        self.chave = chave
+        self.colunas = colunas      # (nome, tipo) na ordem do arquivo
+        self.fontes = fontes
+        self.completar = completar  # Acrescenta colunas a um lote (ex.: autores do livro)
+
+
+def _fontes_emprestimos() -> List[Fonte]:
+    fontes = []
+    for modelo, arquivado in ((models.Emprestimo, False), (models.EmprestimoHistorico, True)):
+        stmt = (
+            select(
+                modelo.id_emprestimo, modelo.id_exemplar, models.Exemplar.id_livro, modelo.id_cliente,
+                modelo.data_emprestimo, modelo.data_prevista_devolucao, modelo.data_devolucao,
+                modelo.multa, modelo.ativo, literal(arquivado).label("arquivado"),
+            )
+            .join(models.Exemplar, models.Exemplar.id_exemplar == modelo.id_exemplar)
+        )
+        fontes.append(Fonte(stmt, modelo.id_emprestimo, modelo.data_emprestimo))
+    return fontes
+
+def _fontes_livros() -> List[Fonte]:
+    Livro = models.Livro
+    stmt = (
+        select(
+            Livro.id_livro, Livro.titulo, Livro.isbn, Livro.ano_publicacao, Livro.id_editora,
+            models.Editora.nome.label("editora"), Livro.criado_em,
+        )
+        .outerjoin(models.Editora, models.Editora.id_editora == Livro.id_editora)
+    )
+    return [Fonte(stmt, Livro.id_livro, Livro.criado_em)]
+
+def _completar_livros(db: Session, livros: List[dict]) -> None:
+    """Autores e categorias do lote com uma consulta cada (IN sobre os livros do lote)."""
+    ids = [livro["id_livro"] for livro in livros]
+    autores, categorias = {}, {}
+    for linha in db.execute(
+        select(models.livro_autor_table.c.id_livro, models.Autor.id_autor, models.Autor.nome, models.Autor.sobrenome)
+        .join(models.Autor, models.Autor.id_autor == models.livro_autor_table.c.id_autor)
+        .where(models.livro_autor_table.c.id_livro.in_(ids))
+        .order_by(models.Autor.id_autor)
+    ):
+        nome = f"{linha.nome} {linha.sobrenome}" if linha.sobrenome else linha.nome
+        autores.setdefault(linha.id_livro, []).append((str(linha.id_autor), nome))
+    for linha in db.execute(
+        select(models.livro_categoria_table.c.id_livro, models.Categoria.id_categoria, models.Categoria.nome)
+        .join(models.Categoria, models.Categoria.id_categoria == models.livro_categoria_table.c.id_categoria)
+        .where(models.livro_categoria_table.c.id_livro.in_(ids))
+        .order_by(models.Categoria.id_categoria)
+    ):
+        categorias.setdefault(linha.id_livro, []).append((str(linha.id_categoria), linha.nome))
+
+    for livro in livros:
+        for coluna, itens in (("autores", autores.get(livro["id_livro"], [])),
+                              ("categorias", categorias.get(livro["id_livro"], []))):
+            livro[f"{coluna}_ids"] = SEPARADOR_LISTA.join(id_ for id_, _ in itens)
+            livro[coluna] = SEPARADOR_LISTA.join(nome for _, nome in itens)
+
+def _fontes_exemplares() -> List[Fonte]:
+    Exemplar = models.Exemplar
+    stmt = select(
+        Exemplar.id_exemplar, Exemplar.id_livro, Exemplar.codigo_barras, Exemplar.status,
+        Exemplar.localizacao, Exemplar.criado_em,
+    )
+    return [Fonte(stmt, Exemplar.id_exemplar, Exemplar.criado_em)]
+
+def _fontes_clientes() -> List[Fonte]:
+    Cliente = models.UsuarioCliente
+    stmt = select(Cliente.id_cliente, Cliente.nome, Cliente.cpf, Cliente.email, Cliente.telefone, Cliente.criado_em)
+    return [Fonte(stmt, Cliente.id_cliente, Cliente.criado_em)]
+
+
+TABELAS = {
+    tabela.nome: tabela for tabela in (
+        Tabela("emprestimos", "id_emprestimo", [
+            ("id_emprestimo", "inteiro"), ("id_exemplar", "inteiro"), ("id_livro", "texto"),
+            ("id_cliente", "inteiro"), ("data_emprestimo", "data_hora"), ("data_prevista_devolucao", "data"),
+            ("data_devolucao", "data_hora"), ("multa", "decimal"), ("ativo", "logico"), ("arquivado", "logico"),
+        ], _fontes_emprestimos),
+        Tabela("livros", "id_livro", [
+            ("id_livro", "texto"), ("titulo", "texto"), ("isbn", "texto"), ("ano_publicacao", "inteiro"),
+            ("id_editora", "inteiro"), ("editora", "texto"), ("autores_ids", "texto"), ("autores", "texto"),
+            ("categorias_ids", "texto"), ("categorias", "texto"), ("criado_em", "data_hora"),
+        ], _fontes_livros, _completar_livros),
+        Tabela("exemplares", "id_exemplar", [
+            ("id_exemplar", "inteiro"), ("id_livro", "texto"), ("codigo_barras", "texto"), ("status", "texto"),
+            ("localizacao", "texto"), ("criado_em", "data_hora"),
+        ], _fontes_exemplares),
+        Tabela("clientes", "id_cliente", [
+            ("id_cliente", "inteiro"), ("nome", "texto"), ("cpf", "texto"), ("email", "texto"),
+            ("telefone", "texto"), ("criado_em", "data_hora"),
+        ], _fontes_clientes),
+    )
+}
+
+
+# --- Leitura em lotes ---
+
+def lotes(db: Session, tabela: Tabela, de: Optional[date] = None, ate: Optional[date] = None,
+          apos=None, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[List[dict]]:
+    """
+    Lotes de até 'tamanho_lote' linhas (dicts), em ordem de chave, a partir
+    da chave 'apos' (exclusiva). Com mais de uma fonte, busca o próximo lote
+    de cada uma e intercala pela chave.
+    """
+    fontes = tabela.fontes()
+    while True:
+        linhas = []
+        for fonte in fontes:
+            stmt = fonte.stmt
+            if apos is not None:
+                stmt = stmt.where(fonte.chave > apos)
+            if de is not None:
+                stmt = stmt.where(fonte.coluna_data >= de)
+            if ate is not None:
+                stmt = stmt.where(fonte.coluna_data < ate + timedelta(days=1))
+            linhas.extend(db.execute(stmt.order_by(fonte.chave).limit(tamanho_lote)).mappings().all())
+        # Encerra a transação do lote: nada fica preso entre um lote e outro
+        db.rollback()
+        if not linhas:
+            return
+        if len(fontes) > 1:
+            linhas.sort(key=lambda linha: linha[tabela.chave])
+            linhas = linhas[:tamanho_lote]
+
+        registros = [{coluna: _valor(valor) for coluna, valor in linha.items()} for linha in linhas]
+        if tabela.completar is not None:
+            tabela.completar(db, registros)
+            db.rollback()
+        yield registros
+        apos = registros[-1][tabela.chave]
+
+def _valor(valor):
+    return valor.value if isinstance(valor, Enum) else valor
+
+
+# --- Escrita ---
+
+def csv_em_partes(tabela: Tabela, fluxo: Iterator[List[dict]], cabecalho: bool = True) -> Iterator[bytes]:
+    """Um pedaço de CSV (UTF-8) por lote, começando pelo cabeçalho."""
+    nomes = [nome for nome, _ in tabela.colunas]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if cabecalho:
+        escritor.writerow(nomes)
+    for lote in fluxo:
+        escritor.writerows([registro[nome] for nome in nomes] for registro in lote)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _esquema_parquet(tabela: Tabela):
+    tipos = {
+        "inteiro": pyarrow.int64(),
+        "texto": pyarrow.string(),
+        "data": pyarrow.date32(),
+        "data_hora": pyarrow.timestamp("us"),
+        "decimal": pyarrow.decimal128(10, 2),
+        "logico": pyarrow.bool_(),
+    }
+    return pyarrow.schema([(nome, tipos[tipo]) for nome, tipo in tabela.colunas])
+
+class _Destino:
+    """Destino do ParquetWriter que só acumula os bytes, para enviá-los a cada row group."""
+    closed = False
+
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+
+    def write(self, dados) -> int:
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self.posicao
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self.partes)
+        self.partes = []
+        return dados
+
+def parquet_em_partes(tabela: Tabela, fluxo: Iterator[List[dict]]) -> Iterator[bytes]:
+    """O arquivo Parquet em pedaços: um row group por lote e, no fim, o rodapé."""
+    esquema = _esquema_parquet(tabela)
+    destino = _Destino()
+    escritor = pyarrow.parquet.ParquetWriter(destino, esquema, compression="zstd")
+    try:
+        for lote in fluxo:
+            escritor.write_table(pyarrow.Table.from_pylist(lote, schema=esquema))
+            yield destino.esvaziar()
+    finally:
+        escritor.close()
+    yield destino.esvaziar()
+
+def exportar(db: Session, nome: str, formato: str, de: Optional[date] = None, ate: Optional[date] = None,
+             apos=None, cabecalho: bool = True) -> Iterator[bytes]:
+    """Os bytes do arquivo exportado, em pedaços (um por lote)."""
+    tabela = TABELAS[nome]
+    if formato == "parquet" and pyarrow is None:
+        raise RuntimeError("Exportação em Parquet requer o pyarrow (pip install pyarrow).")
+    if apos is not None and dict(tabela.colunas)[tabela.chave] == "inteiro":
+        apos = int(apos)  # ValueError se a chave não for um número
+    fluxo = lotes(db, tabela, de, ate, apos)
+    if formato == "parquet":
+        return parquet_em_partes(tabela, fluxo)
+    return csv_em_partes(tabela, fluxo, cabecalho)
+
+
+def em_streaming(nome: str, formato: str, de: Optional[date] = None, ate: Optional[date] = None, apos=None) -> Iterator[bytes]:
+    """
+    Como exportar, com uma sessão própria: a resposta continua sendo enviada
+    depois que a rota retornou. Erros de parâmetro saem já na chamada.
+    """
+    db = SessionLocal()
+    try:
+        partes = exportar(db, nome, formato, de, ate, apos)
+    except Exception:
+        db.close()
+        raise
+
+    def gerar() -> Iterator[bytes]:
+        try:
+            yield from partes
+        finally:
+            db.close()
+
+    return gerar()
+
+
+# --- Linha de comando ---
+
+def _ultima_chave_csv(caminho: str, tabela: Tabela) -> Optional[str]:
+    """Chave (primeira coluna) da última linha de um CSV já exportado; None se só houver o cabeçalho."""
+    with open(caminho, "rb") as arquivo:
+        arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(max(0, arquivo.tell() - 64 * 1024))
+        final = arquivo.read().decode("utf-8", errors="ignore")
+    if final and not final.endswith("\n"):
+        raise SystemExit(f"{caminho}: a última linha está incompleta; remova-a antes de retomar.")
+    linhas = final.splitlines()
+    ultima = next(csv.reader([linhas[-1]])) if linhas else None
+    if not ultima or ultima == [nome for nome, _ in tabela.colunas]:
+        return None
+    return ultima[0]
+
+def _ultima_chave_parquet(caminho: str, tabela: Tabela):
+    """Maior chave de um Parquet já exportado, pelas estatísticas dos row groups (sem ler os dados)."""
+    metadados = pyarrow.parquet.ParquetFile(caminho).metadata
+    indice = [nome for nome, _ in tabela.colunas].index(tabela.chave)
+    maximos = [metadados.row_group(i).column(indice).statistics.max for i in range(metadados.num_row_groups)]
+    return max(maximos) if maximos else None
+
+def _proxima_parte(caminho: str) -> str:
+    base, extensao = os.path.splitext(caminho)
+    numero = 2
+    while os.path.exists(f"{base}.parte{numero}{extensao}"):
+        numero += 1
+    return f"{base}.parte{numero}{extensao}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta uma tabela da biblioteca em CSV ou Parquet, em lotes.")
+    parser.add_argument("tabela", choices=sorted(TABELAS))
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--saida", required=True, help="Arquivo de saída")
+    parser.add_argument("--de", type=date.fromisoformat, help="Data inicial (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--ate", type=date.fromisoformat, help="Data final (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--apos", help="Exporta só as linhas com chave maior que esta")
+    parser.add_argument("--retomar", action="store_true",
+                        help="Continua uma exportação interrompida a partir da última chave do arquivo de saída "
+                             "(CSV: acrescenta ao arquivo; Parquet: grava um arquivo .parteN ao lado)")
+    args = parser.parse_args()
+
+    tabela = TABELAS[args.tabela]
+    saida, modo, apos, cabecalho = args.saida, "wb", args.apos, True
+    if args.retomar and os.path.exists(args.saida):
+        if args.formato == "csv":
+            apos, modo = _ultima_chave_csv(args.saida, tabela), "ab"
+            cabecalho = os.path.getsize(args.saida) == 0
+        else:
+            if pyarrow is None:
+                raise SystemExit("Exportação em Parquet requer o pyarrow (pip install pyarrow).")
+            apos, saida = _ultima_chave_parquet(args.saida, tabela), _proxima_parte(args.saida)
+        print(f"Retomando {args.tabela} após a chave {apos} em {saida}", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        with open(saida, modo) as arquivo:
+            for parte in exportar(db, args.tabela, args.formato, args.de, args.ate, apos, cabecalho):
+                arquivo.write(parte)
+    except KeyboardInterrupt:
+        raise SystemExit("Interrompido; rode de novo com --retomar para continuar.")
+    except (RuntimeError, ValueError) as e:
+        raise SystemExit(str(e))
+    finally:
+        db.close()
+    print(f"{args.tabela}: exportação concluída em {saida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
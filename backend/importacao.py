@@ -0,0 +1,267 @@
+# importacao.py
+# Importação em lote do catálogo (livros, exemplares e vínculos com autores
+# e categorias) a partir de CSV ou NDJSON.
+#
+# O arquivo é lido em streaming e processado em lotes de TAMANHO_LOTE linhas.
+# Para cada lote:
+#   1. valida cada linha com o schema LivroImportacao
+#   2. resolve autores, categorias, editoras, ISBNs e códigos de barras já
+#      existentes com UMA consulta por tabela (IN sobre o conjunto do lote)
+#   3. reserva todos os IDs de livro de uma vez (alocador_livro)
+#   4. grava livro, livro_autor, livro_categoria e exemplar com INSERTs de
+#      várias linhas e faz um commit por lote
+# Linhas inválidas entram no relatório de erros sem abortar o lote. Se o
+# INSERT do lote falhar mesmo assim (ex.: ISBN inserido por outra pessoa no
+# meio do caminho), o lote é regravado linha a linha com savepoints para
+# descobrir quais linhas falham.
+# Qualquer outro erro (leitura do arquivo, banco fora do ar...) desfaz só o
+# lote em andamento e interrompe a importação: os lotes anteriores já estão
+# gravados, e o resultado parcial diz em que linha parou.
+import csv
+import io
+import json
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+import busca
+import circulacao
+import disponibilidade
+import models
+import schemas
+from alocador_ids import alocador_livro
+
+TAMANHO_LOTE = int(os.getenv("IMPORTACAO_TAMANHO_LOTE", "1000"))
+MAX_ERROS_LISTADOS = 1000
+SEPARADOR_LISTA = ";"  # Separador das listas dentro de uma célula do CSV (ex.: "1;2;3")
+
+logger = logging.getLogger("biblioteca.importacao")
+
+
+# --- Leitura do arquivo ---
+
+def _lista_csv(valor: Optional[str]) -> List[str]:
+    if not valor:
+        return []
+    return [item.strip() for item in valor.split(SEPARADOR_LISTA) if item.strip()]
+
+def _registro_csv(linha: dict) -> dict:
+    """
+    Converte uma linha do CSV no formato do schema. Colunas aceitas:
+    titulo, isbn, ano_publicacao, id_editora, autores_ids, categorias_ids,
+    codigos_barras e localizacao (aplicada a todos os exemplares da linha).
+    """
+    registro = {chave: (valor or None) for chave, valor in linha.items()
+                if chave in ("titulo", "isbn", "ano_publicacao", "id_editora")}
+    registro["autores_ids"] = _lista_csv(linha.get("autores_ids"))
+    registro["categorias_ids"] = _lista_csv(linha.get("categorias_ids"))
+    localizacao = linha.get("localizacao") or None
+    registro["exemplares"] = [
+        {"codigo_barras": codigo, "localizacao": localizacao}
+        for codigo in _lista_csv(linha.get("codigos_barras"))
+    ]
+    return registro
+
+def ler_registros(arquivo, formato: str) -> Iterator[Tuple[int, object]]:
+    """
+    Lê o arquivo (binário) sob demanda e devolve (numero_linha, registro).
+    O registro é um dict, ou a mensagem de erro (str) se a linha não puder
+    ser interpretada.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            yield leitor.line_num, _registro_csv(registro)
+    else:
+        for numero, linha in enumerate(texto, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except json.JSONDecodeError as e:
+                yield numero, f"JSON inválido: {e.msg}"
+
+def _em_lotes(registros: Iterable, tamanho: int) -> Iterator[list]:
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# --- Importação ---
+
+class Importador:
+    def __init__(self, db: Session):
+        self.db = db
+        self.resultado = schemas.ResultadoImportacao()
+        # ISBNs e códigos de barras já vistos neste arquivo (duplicatas internas)
+        self._isbns_vistos = set()
+        self._codigos_vistos = set()
+
+    def importar(self, registros: Iterable[Tuple[int, object]], tamanho_lote: int = TAMANHO_LOTE) -> schemas.ResultadoImportacao:
+        lotes = _em_lotes(registros, tamanho_lote)
+        ultima_linha = 0
+        while True:
+            try:
+                lote = next(lotes)
+            except StopIteration:
+                break
+            except UnicodeDecodeError:
+                if not ultima_linha:
+                    raise  # Nada lido: o arquivo inteiro está em outra codificação
+                self._interromper(ultima_linha + 1, "O arquivo precisa estar em UTF-8.")
+                break
+            except Exception as e:
+                logger.exception("Falha ao ler o arquivo depois da linha %d", ultima_linha)
+                self._interromper(ultima_linha + 1, f"Erro ao ler o arquivo: {e}")
+                break
+            try:
+                self._processar_lote(lote)
+            except Exception as e:
+                self.db.rollback()
+                logger.exception("Falha no lote das linhas %d a %d", lote[0][0], lote[-1][0])
+                self._interromper(lote[0][0], f"Lote das linhas {lote[0][0]} a {lote[-1][0]} não gravado: {e}")
+                break
+            ultima_linha = lote[-1][0]
+        self.resultado.erros.sort(key=lambda erro: erro.linha)
+        return self.resultado
+
+    def _interromper(self, linha: int, mensagem: str) -> None:
+        """Registra o erro que parou a importação (sempre listado, mesmo acima do limite)."""
+        self.resultado.interrompida = True
+        self.resultado.erros.append(schemas.ErroImportacao(linha=linha, erro=mensagem))
+
+    def _erro(self, linha: int, mensagem: str) -> None:
+        if len(self.resultado.erros) < MAX_ERROS_LISTADOS:
+            self.resultado.erros.append(schemas.ErroImportacao(linha=linha, erro=mensagem))
+        else:
+            self.resultado.erros_omitidos += 1
+
+    def _processar_lote(self, lote: list) -> None:
+        self.resultado.linhas_lidas += len(lote)
+
+        # 1. Validação de formato
+        validos: List[Tuple[int, schemas.LivroImportacao]] = []
+        for linha, registro in lote:
+            if isinstance(registro, str):
+                self._erro(linha, registro)
+                continue
+            try:
+                validos.append((linha, schemas.LivroImportacao.model_validate(registro)))
+            except ValidationError as e:
+                self._erro(linha, "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+
+        # 2. Consultas por conjunto (uma por tabela para o lote inteiro)
+        autores = self._existentes(models.Autor.id_autor, {i for _, l in validos for i in l.autores_ids})
+        categorias = self._existentes(models.Categoria.id_categoria, {i for _, l in validos for i in l.categorias_ids})
+        editoras = self._existentes(models.Editora.id_editora, {l.id_editora for _, l in validos if l.id_editora})
+        isbns = self._existentes(models.Livro.isbn, {l.isbn for _, l in validos if l.isbn})
+        codigos = self._existentes(
+            models.Exemplar.codigo_barras,
+            {e.codigo_barras for _, l in validos for e in l.exemplares if e.codigo_barras},
+        )
+
+        # 3. Regras de integridade linha a linha (em memória)
+        aceitos = []
+        for linha, livro in validos:
+            problema = self._verificar(livro, autores, categorias, editoras, isbns, codigos)
+            if problema:
+                self._erro(linha, problema)
+                continue
+            if livro.isbn:
+                self._isbns_vistos.add(livro.isbn)
+            self._codigos_vistos.update(e.codigo_barras for e in livro.exemplares if e.codigo_barras)
+            aceitos.append((linha, livro))
+
+        if not aceitos:
+            return
+
+        # 4. IDs para o lote inteiro, numa única reserva
+        ids = alocador_livro.proximos_ids(len(aceitos))
+        linhas = [(linha, id_livro, livro) for (linha, livro), id_livro in zip(aceitos, ids)]
+
+        try:
+            with self.db.begin_nested():
+                self._gravar(linhas)
+            self.db.commit()
+            self._concluir(linhas)
+        except (IntegrityError, OperationalError):
+            self.db.rollback()
+            self._gravar_linha_a_linha(linhas)
+
+    def _existentes(self, coluna, valores: set) -> set:
+        if not valores:
+            return set()
+        return set(self.db.execute(select(coluna).where(coluna.in_(valores))).scalars())
+
+    def _verificar(self, livro, autores, categorias, editoras, isbns, codigos) -> Optional[str]:
+        faltando = sorted(set(livro.autores_ids) - autores)
+        if faltando:
+            return f"Autor(es) não encontrado(s): {faltando}"
+        faltando = sorted(set(livro.categorias_ids) - categorias)
+        if faltando:
+            return f"Categoria(s) não encontrada(s): {faltando}"
+        if livro.id_editora and livro.id_editora not in editoras:
+            return f"Editora não encontrada: {livro.id_editora}"
+        if livro.isbn and (livro.isbn in isbns or livro.isbn in self._isbns_vistos):
+            return f"ISBN já cadastrado: {livro.isbn}"
+        codigos_linha = [e.codigo_barras for e in livro.exemplares if e.codigo_barras]
+        repetidos = sorted(
+            {c for c in codigos_linha if c in codigos or c in self._codigos_vistos}
+            | {c for c in codigos_linha if codigos_linha.count(c) > 1}
+        )
+        if repetidos:
+            return f"Código(s) de barras já cadastrado(s): {repetidos}"
+        return None
+
+    def _gravar(self, linhas: list) -> None:
+        """INSERTs de várias linhas para todo o conjunto (dentro de um savepoint)."""
+        livros, autores, categorias, exemplares = [], [], [], []
+        for _, id_livro, livro in linhas:
+            dados = livro.model_dump(exclude={"autores_ids", "categorias_ids", "exemplares"})
+            livros.append({**dados, "id_livro": id_livro})
+            autores += [{"id_livro": id_livro, "id_autor": i} for i in dict.fromkeys(livro.autores_ids)]
+            categorias += [{"id_livro": id_livro, "id_categoria": i} for i in dict.fromkeys(livro.categorias_ids)]
+            exemplares += [{"id_livro": id_livro, **e.model_dump()} for e in livro.exemplares]
+
+        self.db.execute(insert(models.Livro), livros)
+        if autores:
+            self.db.execute(insert(models.livro_autor_table), autores)
+        if categorias:
+            self.db.execute(insert(models.livro_categoria_table), categorias)
+        if exemplares:
+            self.db.execute(insert(models.Exemplar), exemplares)
+
+    def _gravar_linha_a_linha(self, linhas: list) -> None:
+        gravadas = []
+        for item in linhas:
+            try:
+                with self.db.begin_nested():
+                    self._gravar([item])
+                gravadas.append(item)
+            except (IntegrityError, OperationalError) as e:
+                self._erro(item[0], f"Erro de integridade: {getattr(e, 'orig', e)}")
+        self.db.commit()
+        self._concluir(gravadas)
+
+    def _concluir(self, linhas: list) -> None:
+        """Contabiliza as linhas gravadas (já com commit) e atualiza as estruturas em memória."""
+        ids_livros = [id_livro for _, id_livro, _ in linhas]
+        busca.indice.indexar_livros(self.db, ids_livros)
+        com_exemplares = [id_livro for _, id_livro, livro in linhas if livro.exemplares]
+        disponibilidade.projecao.atualizar_livros(self.db, com_exemplares)
+        circulacao.mapa_codigos.atualizar_livros(self.db, com_exemplares)
+        self.resultado.livros_importados += len(linhas)
+        self.resultado.exemplares_criados += sum(len(livro.exemplares) for _, _, livro in linhas)
@@ -0,0 +1,204 @@
+# limite_taxa.py
+# Limite de requisições por usuário, por IP e por rota ("token bucket").
+#
+# Uma aba do frontend presa num laço chamando /api/emprestimos/, ou uma
+# rajada de /token, ocupa o pool de conexões e atrasa todo mundo. Cada
+# requisição consome 1 ficha de alguns baldes; cada balde tem uma capacidade
+# (a rajada permitida) e é reabastecido continuamente (fichas por segundo):
+#   - USUARIO: por usuário autenticado (o 'sub' do token, o mesmo que
+#     get_current_user usa; sem consulta ao banco)
+#   - IP: por endereço de origem, para todos (com ou sem token)
+#   - LOGIN: POST /token por IP (tentativas de senha)
+#   - VARREDURA: por usuário (ou IP) nas leituras completas: listagens com
+#     formato=ndjson e exportações
+#   - LISTAGEM: por rota, somando todos os clientes, nas listagens mais
+#     pesadas (ROTAS_LISTAGEM): protege o banco mesmo com muitos clientes
+# Se algum balde não tiver a ficha, a resposta é 429 com Retry-After (em
+# segundos) e nenhum balde é debitado.
+#
+# A verificação é uma dependência global do app (main.py): roda depois do
+# roteamento (a rota já é conhecida) e antes de qualquer acesso ao banco.
+# Os baldes ficam no estado compartilhado (estado_compartilhado.py): com
+# ESTADO_BACKEND=sqlite, os workers da máquina gastam dos mesmos baldes (o
+# limite vale para o conjunto, não para cada worker); com "memoria", é um
+# dicionário do próprio processo. Se o estado compartilhado falhar, a
+# requisição passa (o limitador nunca derruba a API).
+#
+# Cada política é configurável por LIMITE_<NOME>_POR_SEGUNDO e
+# LIMITE_<NOME>_RAJADA; LIMITE_TAXA_ATIVO=false desliga tudo.
+import logging
+import math
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+import security
+from estado_compartilhado import estado
+
+ATIVO = os.getenv("LIMITE_TAXA_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+# Atrás de um proxy reverso, o IP do cliente vem no X-Forwarded-For
+CONFIAR_PROXY = os.getenv("LIMITE_TAXA_CONFIAR_PROXY", "false").lower() in ("1", "true", "sim", "yes")
+MAX_RECUSADOS_LISTADOS = 10
+MAX_TOKENS_LEMBRADOS = 10000
+# Prefixo das chaves no estado compartilhado
+PREFIXO = "limite:"
+
+logger = logging.getLogger("biblioteca.limite_taxa")
+
+
+@dataclass(frozen=True)
+class Politica:
+    nome: str
+    por_segundo: float  # Reabastecimento
+    rajada: float       # Capacidade do balde
+
+
+def _politica(nome: str, por_segundo: float, rajada: float) -> Politica:
+    return Politica(
+        nome.lower(),
+        float(os.getenv(f"LIMITE_{nome}_POR_SEGUNDO", str(por_segundo))),
+        float(os.getenv(f"LIMITE_{nome}_RAJADA", str(rajada))),
+    )
+
+
+USUARIO = _politica("USUARIO", 10, 40)
+IP = _politica("IP", 20, 100)
+LOGIN = _politica("LOGIN", 0.2, 10)         # 10 seguidas, depois 1 a cada 5 s
+VARREDURA = _politica("VARREDURA", 0.05, 3) # 3 seguidas, depois 1 a cada 20 s
+LISTAGEM = _politica("LISTAGEM", 100, 200)
+POLITICAS = {p.nome: p for p in (USUARIO, IP, LOGIN, VARREDURA, LISTAGEM)}
+
+ROTAS_LOGIN = {"POST /token"}
+ROTAS_LISTAGEM = {
+    "GET /api/livros/",
+    "GET /api/livros/search",
+    "GET /api/clientes/",
+    "GET /api/emprestimos/",
+    "GET /api/emprestimos/atrasados",
+    "GET /api/emprestimos/por-cliente/{cliente_id}",
+    "GET /api/async/livros/",
+    "GET /api/async/clientes/",
+    "GET /api/async/emprestimos/",
+    "GET /api/async/emprestimos/por-cliente/{cliente_id}",
+}
+PREFIXOS_VARREDURA = ("/api/admin/exportacao/",)
+
+
+class LimitadorTaxa:
+    def __init__(self, estado):
+        self.estado = estado
+        self._lock = threading.Lock()
+        # Métricas deste processo
+        self.permitidas = 0
+        self.recusadas: Counter = Counter()  # Por política
+        self.clientes_recusados: Counter = Counter()
+        self.falhas = 0
+
+    def consumir(self, baldes: List[Tuple[Politica, str]], cliente: str) -> Optional[Tuple[Politica, float]]:
+        """
+        Tira 1 ficha de cada balde. Se faltar ficha em algum, não debita nenhum
+        e devolve (política que recusou, segundos até haver ficha).
+        """
+        try:
+            recusa = self.estado.consumir_fichas(
+                [(f"{PREFIXO}{politica.nome}:{chave}", politica.rajada, politica.por_segundo) for politica, chave in baldes]
+            )
+        except Exception:
+            with self._lock:
+                self.falhas += 1
+                if self.falhas % 1000 == 1:
+                    logger.exception("Falha no estado compartilhado do limitador: %d requisições liberadas sem contar", self.falhas)
+            return None
+        with self._lock:
+            if recusa is None:
+                self.permitidas += 1
+                return None
+            politica = baldes[recusa[0]][0]
+            self.recusadas[politica.nome] += 1
+            self.clientes_recusados[cliente] += 1
+            if len(self.clientes_recusados) > 1000:
+                self.clientes_recusados = Counter(dict(self.clientes_recusados.most_common(MAX_RECUSADOS_LISTADOS)))
+            return politica, recusa[1]
+
+    def metricas(self) -> dict:
+        with self._lock:
+            metricas = {
+                "ativo": ATIVO,
+                "politicas": {p.nome: {"por_segundo": p.por_segundo, "rajada": p.rajada} for p in POLITICAS.values()},
+                "permitidas": self.permitidas,
+                "recusadas": dict(self.recusadas),
+                "mais_recusados": dict(self.clientes_recusados.most_common(MAX_RECUSADOS_LISTADOS)),
+                "falhas_estado": self.falhas,
+            }
+        estado_metricas = self.estado.metricas()
+        metricas["estado"] = estado_metricas["backend"]
+        metricas["baldes"] = estado_metricas["baldes"]
+        return metricas
+
+
+limitador = LimitadorTaxa(estado)
+
+
+def _ip(request: Request) -> str:
+    if CONFIAR_PROXY:
+        encaminhado = request.headers.get("x-forwarded-for")
+        if encaminhado:
+            return encaminhado.split(",")[0].strip()
+    return request.client.host if request.client else "desconhecido"
+
+
+# Token -> username dos tokens válidos já vistos: decodificar o JWT custa mais
+# que toda a contagem. Um token que expirou continua contando para o mesmo
+# usuário (a rota é que responde 401).
+_usuarios_por_token: Dict[str, str] = {}
+
+
+def _usuario(request: Request) -> Optional[str]:
+    autorizacao = request.headers.get("authorization")
+    if not autorizacao or autorizacao[:7].lower() != "bearer ":
+        return None
+    token = autorizacao[7:].strip()
+    usuario = _usuarios_por_token.get(token)
+    if usuario is None:
+        usuario = security.username_do_token(token)
+        if usuario is not None:
+            if len(_usuarios_por_token) >= MAX_TOKENS_LEMBRADOS:
+                _usuarios_por_token.clear()
+            _usuarios_por_token[token] = usuario
+    return usuario
+
+
+async def verificar(request: Request) -> None:
+    """Dependência global: levanta 429 se o cliente, o IP ou a rota passou do limite."""
+    if not ATIVO:
+        return
+    rota = request.scope.get("route")
+    nome_rota = f"{request.method} {rota.path if rota is not None else request.url.path}"
+    ip = _ip(request)
+    usuario = _usuario(request)
+    cliente = f"usuario:{usuario}" if usuario is not None else f"ip:{ip}"
+
+    baldes = [(IP, ip)]
+    if usuario is not None:
+        baldes.append((USUARIO, usuario))
+    if nome_rota in ROTAS_LOGIN:
+        baldes.append((LOGIN, ip))
+    if nome_rota in ROTAS_LISTAGEM:
+        baldes.append((LISTAGEM, nome_rota))
+    if request.query_params.get("formato") == "ndjson" or request.url.path.startswith(PREFIXOS_VARREDURA):
+        baldes.append((VARREDURA, cliente))
+
+    recusa = limitador.consumir(baldes, cliente)
+    if recusa is None:
+        return
+    politica, espera = recusa
+    segundos = max(1, math.ceil(espera)) if espera != math.inf else 60
+    raise HTTPException(
+        status_code=429,
+        detail=f"Muitas requisições (limite '{politica.nome}'). Tente novamente em {segundos} s.",
+        headers={"Retry-After": str(segundos)},
+    )
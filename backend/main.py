@@ -1,23 +1,64 @@
 #para rodar o codigo, executar no terminal: uvicorn main:app --reload
 # main.py
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError, IntegrityError # Para capturar erros do DB
+from contextlib import asynccontextmanager
+from datetime import date
 from typing import List, Optional
 
-import datetime
+import arquivamento
+import atrasos
+import auditoria
+import busca
+import circulacao
+import consultas
+import disponibilidade
+import estatisticas
+import exportacao
+import importacao
+import limite_taxa
 import models
+import paginacao
+import perfil
+import projecoes
+import reservas
+import rotas_async
 import schemas
 import security
-from database import engine, get_db
+import serializacao
+from agendador import agendador
+from alocador_ids import alocador_livro
+from cache_referencia import cache as cache_referencia
+from database import AsyncSessionLocal, async_engine, engine, get_db
+from estado_compartilhado import estado as estado_compartilhado
+from telemetria_pool import telemetria as telemetria_pool
+
+# Jobs periódicos (rodam em threads enquanto a API estiver de pé)
+agendador.registrar(atrasos.NOME_JOB, atrasos.atualizar, atrasos.INTERVALO_SEGUNDOS)
+agendador.registrar(reservas.NOME_JOB, reservas.expirar_vencidas, reservas.INTERVALO_SEGUNDOS)
+agendador.registrar(estatisticas.NOME_JOB, estatisticas.painel.recalcular, estatisticas.INTERVALO_SEGUNDOS)
+agendador.registrar(arquivamento.NOME_JOB, arquivamento.arquivar, arquivamento.INTERVALO_SEGUNDOS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    agendador.iniciar()
+    auditoria.fila.iniciar()
+    yield
+    agendador.parar()
+    auditoria.fila.parar()  # Grava os eventos que ainda estão na fila
 
 app = FastAPI(
     title="API da Biblioteca",
     description="API para o sistema de gerenciamento da biblioteca",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Limite de requisições por usuário, IP e rota (429 + Retry-After)
+    dependencies=[Depends(limite_taxa.verificar)],
 )
 origins = [
     "http://localhost",       # Para testes locais
@@ -31,71 +72,37 @@ app.add_middleware(
     allow_credentials=True,    # Permitir cookies/autenticação
     allow_methods=["*"],         # Permitir todos os métodos (GET, POST, etc.)
     allow_headers=["*"],         # Permitir todos os cabeçalhos
+    expose_headers=[paginacao.CABECALHO_CURSOR, "ETag", "Retry-After"],  # O frontend precisa ler o cursor da próxima página, o ETag e a espera após um 429
 )
 
-#gerar id por erro da api não conseguir ativar o trigger no mysql
-def gerar_id_livro_py(db: Session) -> str:
-    """
-    Recria a lógica da FUNÇÃO gerar_id_livro do MySQL em Python.
-    """
-    v_year = datetime.datetime.now().year
-    
-    try:
-        # 1. Encontra ou cria o contador
-        contador_db = db.query(models.SeqCounters).filter_by(
-            seq_name='livro', 
-            seq_year=v_year
-        ).first()
-        
-        if not contador_db:
-            contador_db = models.SeqCounters(
-                seq_name='livro', 
-                seq_year=v_year, 
-                seq_value=0
-            )
-            db.add(contador_db)
-            db.commit() # Commit inicial para criar o contador
-            db.refresh(contador_db)
-
-        # 2. Incrementa o valor
-        # Usamos uma atualização "atômica" para segurança
-        db.query(models.SeqCounters).filter_by(
-            seq_name='livro', 
-            seq_year=v_year
-        ).update({'seq_value': models.SeqCounters.seq_value + 1})
-        
-        # 3. Busca o valor atualizado
-        db.commit() # Commit do update
-        
-        contador_atualizado = db.query(models.SeqCounters).filter_by(
-            seq_name='livro', 
-            seq_year=v_year
-        ).first()
-        
-        if not contador_atualizado:
-             raise Exception("Falha ao ler o contador após o incremento.")
-             
-        v_seq = contador_atualizado.seq_value
-        
-        # 4. Formata o ID
-        v_id = f"LIV-{v_year:04d}-{v_seq:04d}"
-        return v_id
-        
-    except Exception as e:
-        db.rollback() # Desfaz qualquer commit parcial
-        raise Exception(f"Erro ao gerar ID do livro: {str(e)}")
+# Contagem de SQL e tempo no banco por requisição (Server-Timing, log de lentas)
+perfil.instrumentar(engine)
+if async_engine is not None:
+    perfil.instrumentar(async_engine.sync_engine)
+app.add_middleware(perfil.MiddlewarePerfil)
 
+# Rotas assíncronas (/api/async/...) só existem com ASYNC_DATABASE_URL definida
+if AsyncSessionLocal is not None:
+    app.include_router(rotas_async.router)
 
 # =======================================================================
 # 1. ENDPOINTS DE AUTENTICAÇÃO E SEGURANÇA
 # =======================================================================
 
 @app.post("/token", response_model=schemas.Token, tags=["Segurança"])
-def login_for_access_token(
+async def login_for_access_token(
     db: Session = Depends(get_db), 
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = security.authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await security.authenticate_user_async(db, form_data.username, form_data.password)
+    except security.PoolSaturadaError as e:
+        # Pico de logins: recusa rápido em vez de enfileirar sem limite
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,7 +114,7 @@ def login_for_access_token(
 
 @app.get("/api/usuarios/me", response_model=schemas.Usuario, tags=["Usuários"])
 def read_users_me(
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     return current_user
 
@@ -115,7 +122,7 @@ def read_users_me(
 def create_user(
     user_to_create: schemas.UsuarioCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo != "Administrador":
         raise HTTPException(
@@ -130,7 +137,10 @@ def create_user(
             detail="Username já registrado"
         )
         
-    hashed_password = security.get_password_hash(user_to_create.senha)
+    try:
+        hashed_password = security.get_password_hash(user_to_create.senha)
+    except security.PoolSaturadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     
     new_user = models.Usuarios(
         username=user_to_create.username,
@@ -142,9 +152,185 @@ def create_user(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    auditoria.fila.registrar("Usuario", new_user.id_usuario, "UsuarioCriado",
+                             f"Usuário {new_user.username} (grupo {new_user.id_grupo})", current_user.username)
     
     return new_user
 
+@app.get("/api/admin/cache-autenticacao", tags=["Administração"])
+def read_cache_autenticacao(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Métricas do cache de usuários autenticados (acertos, erros, despejos)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return security.cache_principais.metricas()
+
+@app.get("/api/admin/pool-hash", tags=["Administração"])
+def read_pool_hash(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Ocupação do pool de bcrypt (em andamento, concluídos, recusados)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return security.pool_hash.metricas()
+
+@app.get("/api/admin/pool", tags=["Administração"])
+def read_pool_conexoes(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Telemetria do pool de conexões (ocupação, espera por conexão, overflow, timeouts)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return telemetria_pool.snapshot(engine.pool)
+
+@app.get("/api/admin/agendador", tags=["Administração"])
+def read_agendador(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Situação dos jobs periódicos (execuções, falhas, último resultado)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return agendador.metricas()
+
+@app.post("/api/admin/agendador/{nome_job}/executar", tags=["Administração"])
+def executar_job(
+    nome_job: str,
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Executa um job agora, sem esperar o próximo intervalo."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    if nome_job not in agendador.jobs:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    resultado = agendador.executar(nome_job)
+    if resultado is None:
+        job = agendador.jobs[nome_job]
+        raise HTTPException(status_code=409, detail=job.ultimo_erro or "Job já em execução.")
+    return resultado
+
+@app.get("/api/admin/cache-referencia", tags=["Administração"])
+def read_cache_referencia(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Métricas do cache de autores, editoras e categorias (acertos, erros, respostas 304)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return cache_referencia.metricas()
+
+@app.get("/api/admin/estado-compartilhado", tags=["Administração"])
+def read_estado_compartilhado(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Backend do estado compartilhado entre workers (entradas, contadores, mensagens trocadas)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return estado_compartilhado.metricas()
+
+@app.get("/api/admin/limite-taxa", tags=["Administração"])
+def read_limite_taxa(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Limites por política, requisições permitidas e recusadas (429) e os clientes mais recusados."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return limite_taxa.limitador.metricas()
+
+@app.get("/api/admin/perfil", tags=["Administração"])
+def read_perfil(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Tempo, tempo no banco e número de consultas SQL por rota (as mais custosas primeiro)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return perfil.perfilador.metricas()
+
+@app.delete("/api/admin/perfil", tags=["Administração"])
+def zerar_perfil(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Zera as estatísticas por rota (ex.: antes de uma medição)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    perfil.perfilador.zerar()
+    return {"message": "Estatísticas de perfil zeradas."}
+
+@app.get("/api/admin/arquivamento", tags=["Administração"])
+def read_arquivamento(
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Tamanho da tabela de empréstimos e do histórico arquivado (o job é 'arquivamento' no agendador)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return arquivamento.resumo(db)
+
+@app.get("/api/admin/exportacao/{tabela}", tags=["Administração"])
+def exportar_tabela(
+    tabela: str,
+    formato: str = Query("csv", pattern="^(csv|parquet)$"),
+    de: Optional[date] = Query(None, description="Data inicial (inclusive) do empréstimo ou do cadastro"),
+    ate: Optional[date] = Query(None, description="Data final (inclusive)"),
+    apos: Optional[str] = Query(None, description="Última chave já recebida, para retomar uma exportação"),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Exporta 'emprestimos' (com os arquivados), 'livros', 'exemplares' ou 'clientes'
+    em CSV ou Parquet, em streaming: a tabela é lida em lotes por chave, sem ir
+    inteira para a memória. A primeira coluna é a chave; se a transferência cair,
+    peça de novo com 'apos' = a última chave recebida.
+    """
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    if tabela not in exportacao.TABELAS:
+        raise HTTPException(status_code=404, detail="Tabela de exportação não encontrada.")
+    try:
+        partes = exportacao.em_streaming(tabela, formato, de, ate, apos)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Chave 'apos' inválida.")
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(
+        partes,
+        media_type="text/csv; charset=utf-8" if formato == "csv" else "application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{tabela}.{formato}"'},
+    )
+
+@app.get("/api/admin/auditoria", response_model=List[schemas.RegistroAuditoria], tags=["Administração"])
+def read_auditoria(
+    response: Response,
+    entidade: Optional[str] = None,
+    entidade_id: Optional[str] = None,
+    acao: Optional[str] = None,
+    usuario: Optional[str] = None,
+    de: Optional[date] = Query(None, description="Data inicial (inclusive)"),
+    ate: Optional[date] = Query(None, description="Data final (inclusive)"),
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Trilha de auditoria, dos eventos mais recentes para os mais antigos.
+    Os eventos são gravados em lote pela fila de auditoria: um evento
+    aparece aqui alguns instantes depois da ação.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    """
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    eventos, proximo_cursor = auditoria.listar(db, cursor, limit, entidade, entidade_id, acao, usuario, de, ate)
+    paginacao.definir_cursor(response, proximo_cursor)
+    return eventos
+
+@app.get("/api/admin/auditoria/fila", tags=["Administração"])
+def read_fila_auditoria(
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Situação da fila de auditoria (eventos na fila, gravados, descartados, falhas)."""
+    if current_user.grupo.nome_grupo != "Administrador":
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    return auditoria.fila.metricas()
+
 # =======================================================================
 # 2. ENDPOINTS DE CLIENTES (UsuarioCliente)
 # =======================================================================
@@ -153,7 +339,7 @@ def create_user(
 def create_cliente(
     cliente: schemas.UsuarioClienteCreate, 
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -163,6 +349,7 @@ def create_cliente(
         db.add(db_cliente)
         db.commit()
         db.refresh(db_cliente)
+        auditoria.fila.registrar("Cliente", db_cliente.id_cliente, "ClienteCriado", None, current_user.username)
         return db_cliente
     except IntegrityError: # Captura erro de CPF duplicado
         db.rollback()
@@ -172,7 +359,7 @@ def create_cliente(
 def read_cliente(
     cliente_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     db_cliente = db.query(models.UsuarioCliente).filter(models.UsuarioCliente.id_cliente == cliente_id).first()
     if db_cliente is None:
@@ -181,10 +368,35 @@ def read_cliente(
 
 @app.get("/api/clientes/", response_model=List[schemas.UsuarioCliente], tags=["Clientes"])
 def read_all_clientes(
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Colunas, separadas por vírgula (ex.: nome,cpf)"),
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
-    return db.query(models.UsuarioCliente).all()
+    """
+    Lista os clientes paginados por 'id_cliente'.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    Com 'fields' só as colunas pedidas são lidas do banco e enviadas.
+    Com 'formato=ndjson' a lista inteira é enviada em streaming.
+    """
+    sel = projecoes.selecao(projecoes.CLIENTE, fields)
+    if formato == "ndjson":
+        _exigir_formato_completo(fields)
+        return paginacao.stream_ndjson(
+            lambda s: s.query(models.UsuarioCliente),
+            models.UsuarioCliente.id_cliente, schemas.UsuarioCliente, cursor
+        )
+    clientes, proximo_cursor = projecoes.pagina_clientes(db, cursor, limit, sel)
+    return serializacao.responder(
+        clientes, projecoes.contrato(projecoes.CLIENTE, sel, List[schemas.UsuarioCliente]), proximo_cursor
+    )
+
+def _exigir_formato_completo(*campos_esparsos: Optional[str]) -> None:
+    # O streaming NDJSON segue sempre o schema completo
+    if any(campos_esparsos):
+        raise HTTPException(status_code=400, detail="'fields' e 'include' valem apenas para formato=json.")
 
 # =======================================================================
 # 3. ENDPOINTS DO ACERVO (Livros, Autores, etc.)
@@ -195,19 +407,19 @@ def read_all_clientes(
 def create_livro(
     livro_data: schemas.LivroCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     """
-    Cria um novo livro. O ID (LIV-AAAA-NNNN) é gerado pela
-    função Python 'gerar_id_livro_py', ignorando a Trigger do DB.
+    Cria um novo livro. O ID (LIV-AAAA-NNNN) é gerado em Python pelo
+    'alocador_livro' (blocos reservados em seq_counters), ignorando a Trigger do DB.
     """
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
         
     try:
         # 1. Gerar o novo ID
-        # A função 'gerar_id_livro_py' lida com seus próprios commits
-        novo_id_livro = gerar_id_livro_py(db)
+        # O alocador usa sua própria conexão; só vai ao banco quando o bloco acaba
+        novo_id_livro = alocador_livro.proximo_id()
 
         # 2. Preparar os dados do livro
         livro_dict = livro_data.model_dump(exclude={'autores_ids', 'categorias_ids'})
@@ -225,33 +437,133 @@ def create_livro(
         db.add(db_livro)
         db.commit() # Commit final para o livro
         db.refresh(db_livro)
-        return db_livro
-        
     except IntegrityError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro de integridade: {e.orig}")
     except Exception as e:
         db.rollback()
-        # Captura erros da função 'gerar_id_livro_py'
+        # Captura erros do alocador de IDs
         raise HTTPException(status_code=500, detail=f"Erro inesperado: {str(e)}")
 
+    # Livro já gravado: a indexação não levanta erro (um 500 faria o cliente criar o livro de novo)
+    busca.indice.indexar_livros(db, [db_livro.id_livro])
+    auditoria.fila.registrar("Livro", db_livro.id_livro, "LivroCriado", db_livro.titulo, current_user.username)
+    return db_livro
+
+@app.post("/api/livros/importar", response_model=schemas.ResultadoImportacao, tags=["Acervo - Livros"])
+def importar_livros(
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Importa livros, seus vínculos com autores/categorias e seus exemplares em lote.
+    - CSV: colunas titulo, isbn, ano_publicacao, id_editora, autores_ids,
+      categorias_ids, codigos_barras (listas separadas por ';') e localizacao.
+    - NDJSON: um objeto LivroImportacao por linha.
+    O formato é deduzido da extensão do arquivo se não for informado.
+    Linhas com erro são listadas no resultado; as demais são gravadas.
+    Um erro inesperado desfaz só o lote em andamento e encerra a importação
+    com 'interrompida' = true; o resultado mostra o que já foi gravado.
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+
+    if formato is None:
+        nome = (arquivo.filename or "").lower()
+        if nome.endswith(".csv"):
+            formato = "csv"
+        elif nome.endswith((".ndjson", ".jsonl")):
+            formato = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Informe formato=csv ou formato=ndjson.")
+
+    # Depois do primeiro lote, falhas viram resultado parcial (sem 500)
+    try:
+        registros = importacao.ler_registros(arquivo.file, formato)
+        resultado = importacao.Importador(db).importar(registros)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="O arquivo precisa estar em UTF-8.")
+    auditoria.fila.registrar(
+        "Livro", None, "LivrosImportados",
+        f"{arquivo.filename}: {resultado.livros_importados} livros, {resultado.exemplares_criados} exemplares"
+        + (" (interrompida)" if resultado.interrompida else ""),
+        current_user.username,
+    )
+    return resultado
+
+# Declarada antes de qualquer rota /api/livros/{...} para "search" não ser lido como ID
+@app.get("/api/livros/search", response_model=List[schemas.Livro], tags=["Acervo - Livros"])
+def search_livros(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    fields: Optional[str] = Query(None, description="Colunas, separadas por vírgula (ex.: titulo,editora.nome)"),
+    include: Optional[str] = Query(None, description="Relações, separadas por vírgula (ex.: autores,categorias)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Busca livros por título, autor, categoria, editora ou ISBN.
+    - Ignora acentos e maiúsculas; cada palavra casa por prefixo ("dom cas" acha "Dom Casmurro").
+    - Retorna só livros que contêm todas as palavras, dos mais relevantes
+      (palavra no título/ISBN) para os menos relevantes.
+    - 'fields'/'include' escolhem colunas e relações, como em GET /api/livros/.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    """
+    sel = projecoes.selecao(projecoes.LIVRO, fields, include)
+    busca.indice.garantir_carregado(db)
+    deslocamento = paginacao.decodificar_cursor(cursor) or 0
+    if not isinstance(deslocamento, int) or deslocamento < 0:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+    ids, total = busca.indice.buscar(q, deslocamento, limit)
+    proximo_cursor = None
+    if deslocamento + len(ids) < total:
+        proximo_cursor = paginacao.codificar_cursor(deslocamento + len(ids))
+
+    # A página inteira de uma vez, devolvida na ordem da pontuação
+    livros = projecoes.livros_por_ids(db, ids, sel)
+    return serializacao.responder(
+        [livros[id_livro] for id_livro in ids if id_livro in livros],
+        projecoes.contrato(projecoes.LIVRO, sel, List[schemas.Livro]), proximo_cursor
+    )
+
+def _query_livros(db: Session):
+    return db.query(models.Livro).options(*consultas.opcoes_livro())
+
 @app.get("/api/livros/", response_model=List[schemas.Livro], tags=["Acervo - Livros"])
 def read_all_livros(
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Colunas, separadas por vírgula (ex.: titulo,isbn,editora.nome)"),
+    include: Optional[str] = Query(None, description="Relações, separadas por vírgula (ex.: autores,categorias)"),
     db: Session = Depends(get_db),
 ):
-    livros = db.query(models.Livro).options(
-        joinedload(models.Livro.autores),
-        joinedload(models.Livro.categorias),
-        joinedload(models.Livro.editora)
-    ).all()
-    return livros
+    """
+    Lista os livros paginados por 'id_livro'.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    Sem 'fields' nem 'include' cada livro vem completo (editora, autores e categorias).
+    Com eles só o pedido é lido do banco: 'fields=titulo,editora.nome' seleciona
+    essas colunas e faz só o JOIN da editora; 'include=autores' traz os autores
+    inteiros. O 'id_livro' sempre vem (é o cursor).
+    Com 'formato=ndjson' o catálogo inteiro é enviado em streaming.
+    """
+    sel = projecoes.selecao(projecoes.LIVRO, fields, include)
+    if formato == "ndjson":
+        _exigir_formato_completo(fields, include)
+        return paginacao.stream_ndjson(_query_livros, models.Livro.id_livro, schemas.Livro, cursor)
+    livros, proximo_cursor = projecoes.pagina_livros(db, cursor, limit, sel)
+    return serializacao.responder(livros, projecoes.contrato(projecoes.LIVRO, sel, List[schemas.Livro]), proximo_cursor)
 
 # --- CRUDs auxiliares para Autores e Categorias ---
 @app.post("/api/autores/", response_model=schemas.Autor, tags=["Acervo - Autores"])
 def create_autor(
     autor: schemas.AutorCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -259,11 +571,31 @@ def create_autor(
     db.add(db_autor)
     db.commit()
     db.refresh(db_autor)
+    cache_referencia.invalidar("autores")
+    auditoria.fila.registrar("Autor", db_autor.id_autor, "AutorCriado", None, current_user.username)
     return db_autor
 
 @app.get("/api/autores/", response_model=List[schemas.Autor], tags=["Acervo - Autores"])
-def read_all_autores(db: Session = Depends(get_db)):
-    return db.query(models.Autor).all()
+def read_all_autores(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Lista os autores paginados por 'id_autor'. Autores, editoras e categorias
+    são servidos pelo cache de dados de referência (cache_referencia.py):
+    responde 304 se o If-None-Match trouxer o ETag atual.
+    """
+    if formato == "ndjson":
+        return paginacao.stream_ndjson(
+            lambda s: s.query(models.Autor), models.Autor.id_autor, schemas.Autor, cursor
+        )
+    return cache_referencia.responder(
+        request, "autores", schemas.Autor, cursor, limit,
+        lambda: paginacao.paginar(db.query(models.Autor), models.Autor.id_autor, cursor, limit),
+    )
     
 # =======================================================================
 # 4. ENDPOINTS DE LÓGICA DE NEGÓCIO (Empréstimos)
@@ -273,7 +605,7 @@ def read_all_autores(db: Session = Depends(get_db)):
 def create_emprestimo(
     emprestimo_data: schemas.EmprestimoCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -284,14 +616,6 @@ def create_emprestimo(
         db.add(db_emprestimo)
         db.commit()
         db.refresh(db_emprestimo)
-        
-        db_emprestimo_completo = db.query(models.Emprestimo).options(
-            joinedload(models.Emprestimo.cliente),
-            joinedload(models.Emprestimo.exemplar)
-        ).filter(models.Emprestimo.id_emprestimo == db_emprestimo.id_emprestimo).first()
-        
-        return db_emprestimo_completo
-        
     except OperationalError as e:
         db.rollback()
         erro_msg = str(e.orig)
@@ -306,12 +630,96 @@ def create_emprestimo(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro inesperado: {str(e)}")
 
+    # Empréstimo já confirmado: as atualizações em memória abaixo não levantam erro (um 500 faria o cliente repetir o empréstimo)
+    db_emprestimo_completo = db.query(models.Emprestimo).options(
+        joinedload(models.Emprestimo.cliente),
+        joinedload(models.Emprestimo.exemplar)
+    ).filter(models.Emprestimo.id_emprestimo == db_emprestimo.id_emprestimo).first()
+
+    disponibilidade.projecao.atualizar_livros(db, [db_emprestimo_completo.exemplar.id_livro])
+    estatisticas.painel.registrar_emprestimos()
+    auditoria.fila.registrar("Emprestimo", db_emprestimo.id_emprestimo, "EmprestimoCriado",
+                             f"Exemplar ID={db_emprestimo.id_exemplar}", current_user.username)
+    return db_emprestimo_completo
+
+
+@app.post("/api/emprestimos/lote", response_model=schemas.ResultadoCirculacao, tags=["Empréstimos"])
+def create_emprestimos_lote(
+    dados: schemas.EmprestimoLoteCreate,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Empresta vários exemplares (por código de barras) a um cliente numa só transação.
+    O resultado informa, por código, o empréstimo criado ou o motivo da recusa
+    (exemplar indisponível, limite de 3 empréstimos ativos, etc.).
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    try:
+        resultado = circulacao.emprestar_lote(db, dados.id_cliente, dados.codigos_barras, dados.data_prevista_devolucao)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro inesperado: {str(e)}")
+    auditoria.registrar_circulacao(resultado, "EmprestimoCriado", current_user.username)
+    return resultado
+
+@app.post("/api/emprestimos/devolucoes/lote", response_model=schemas.ResultadoCirculacao, tags=["Empréstimos"])
+def finalizar_emprestimos_lote(
+    dados: schemas.DevolucaoLote,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Devolve vários exemplares (por código de barras) numa só transação,
+    finalizando o empréstimo ativo de cada um pela procedure finalizar_emprestimo.
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    try:
+        resultado = circulacao.devolver_lote(db, dados.codigos_barras)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao finalizar empréstimos: {str(e)}")
+    auditoria.registrar_circulacao(resultado, "EmprestimoFinalizado", current_user.username)
+    return resultado
+
+@app.post("/api/balcao/emprestimos", response_model=schemas.EmprestimoBalcao, tags=["Empréstimos"])
+def create_emprestimo_por_codigo(
+    dados: schemas.EmprestimoPorCodigo,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Empréstimo pela leitura do código de barras do exemplar e do CPF do
+    cliente, sem precisar conhecer os IDs (uma transação, sem pré-carga).
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    emprestimo = circulacao.emprestar_por_codigo(db, dados.codigo_barras, dados.cpf, dados.data_prevista_devolucao)
+    auditoria.fila.registrar("Emprestimo", emprestimo["id_emprestimo"], "EmprestimoCriado",
+                             f"Exemplar {dados.codigo_barras}", current_user.username)
+    return emprestimo
+
+@app.post("/api/balcao/devolucoes", tags=["Empréstimos"])
+def finalizar_emprestimo_por_codigo(
+    dados: schemas.DevolucaoPorCodigo,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Finaliza o empréstimo ativo do exemplar lido no balcão."""
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    resultado = circulacao.devolver_por_codigo(db, dados.codigo_barras)
+    auditoria.fila.registrar("Emprestimo", resultado["id_emprestimo"], "EmprestimoFinalizado",
+                             f"Exemplar {dados.codigo_barras}", current_user.username)
+    return resultado
 
 @app.post("/api/emprestimos/{emprestimo_id}/finalizar", tags=["Empréstimos"])
 def finalizar_emprestimo(
     emprestimo_id: int,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -324,62 +732,113 @@ def finalizar_emprestimo(
     if not db_emprestimo:
         raise HTTPException(status_code=404, detail="Empréstimo não encontrado ou já finalizado.")
         
+    id_livro = db_emprestimo.exemplar.id_livro
     try:
         db.execute(text(f"CALL finalizar_emprestimo({emprestimo_id})"))
         db.commit()
-        
-        return {"message": "Empréstimo finalizado com sucesso."}
-        
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao finalizar empréstimo: {str(e)}")
+
+    disponibilidade.projecao.atualizar_livros(db, [id_livro])
+    estatisticas.painel.registrar_devolucoes()
+    auditoria.fila.registrar("Emprestimo", emprestimo_id, "EmprestimoFinalizado", None, current_user.username)
+    return {"message": "Empréstimo finalizado com sucesso."}
     
 @app.get("/api/emprestimos/", response_model=List[schemas.Emprestimo], tags=["Empréstimos"])
 def read_all_emprestimos(
     ativo: Optional[bool] = None, # Filtro opcional: /api/emprestimos/?ativo=true
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Colunas, separadas por vírgula (ex.: data_emprestimo,cliente.nome,exemplar.livro.titulo)"),
+    include: Optional[str] = Query(None, description="Relações, separadas por vírgula (ex.: cliente,exemplar.livro)"),
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     """
-    Lista todos os empréstimos.
+    Lista os empréstimos paginados por 'id_emprestimo'.
     - Se 'ativo=true', lista apenas empréstimos não devolvidos.
     - Se 'ativo=false', lista apenas empréstimos já finalizados.
     - Se não for fornecido, lista todos.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    Sem 'fields' nem 'include' cada empréstimo vem com o cliente e o exemplar
+    (com o livro) completos. Com eles só o pedido é lido do banco, ex.:
+    'fields=data_emprestimo,ativo,cliente.nome,exemplar.livro.titulo' faz os
+    JOINs de cliente, exemplar e livro selecionando só essas colunas, e
+    'include=cliente' traz o cliente inteiro. O 'id_emprestimo' sempre vem.
+    Com 'formato=ndjson' todos os empréstimos são enviados em streaming.
     """
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
+    sel = projecoes.selecao(projecoes.EMPRESTIMO, fields, include)
 
-    query = db.query(models.Emprestimo).options(
-        joinedload(models.Emprestimo.cliente),
-        joinedload(models.Emprestimo.exemplar)
+    def montar_query(sessao: Session):
+        # Inclui o livro do exemplar, que o schema serializa (evita um lazy-load por linha)
+        query = sessao.query(models.Emprestimo).options(*consultas.opcoes_emprestimo())
+        if ativo is not None:
+            query = query.filter(models.Emprestimo.ativo == ativo)
+        return query
+
+    if formato == "ndjson":
+        _exigir_formato_completo(fields, include)
+        return paginacao.stream_ndjson(
+            montar_query, models.Emprestimo.id_emprestimo, schemas.Emprestimo, cursor
+        )
+    emprestimos, proximo_cursor = projecoes.pagina_emprestimos(db, ativo, cursor, limit, sel)
+    return serializacao.responder(
+        emprestimos, projecoes.contrato(projecoes.EMPRESTIMO, sel, List[schemas.Emprestimo]), proximo_cursor
     )
-    
-    if ativo is not None:
-        query = query.filter(models.Emprestimo.ativo == ativo)
-        
-    return query.all()
+
+# Declarada antes de /api/emprestimos/{emprestimo_id} para "atrasados" não ser lido como ID
+@app.get("/api/emprestimos/atrasados", response_model=List[schemas.EmprestimoAtrasado], tags=["Empréstimos"])
+def read_emprestimos_atrasados(
+    response: Response,
+    ordem: str = Query("dias_desc", pattern="^(dias_desc|dias_asc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Empréstimos vencidos e não devolvidos, com dias de atraso e multa acumulada até hoje.
+    - 'ordem=dias_desc' (padrão): mais atrasados primeiro; 'dias_asc': menos atrasados primeiro.
+    Lê a tabela mantida pelo job de atrasos (atualizada a cada ATRASOS_INTERVALO_SEGUNDOS).
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    itens, proximo_cursor = atrasos.listar(db, ordem, cursor, limit)
+    paginacao.definir_cursor(response, proximo_cursor)
+    return itens
 
 @app.get("/api/emprestimos/por-cliente/{cliente_id}", response_model=List[schemas.Emprestimo], tags=["Empréstimos"])
 def read_emprestimos_por_cliente(
     cliente_id: int,
+    fields: Optional[str] = Query(None, description="Colunas, separadas por vírgula (ex.: data_emprestimo,ativo,exemplar.livro.titulo)"),
+    include: Optional[str] = Query(None, description="Relações, separadas por vírgula (ex.: exemplar.livro)"),
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     """
-    Lista o histórico de todos os empréstimos de um cliente específico.
+    Lista o histórico de todos os empréstimos de um cliente específico,
+    inclusive os já movidos para o arquivo (emprestimo_historico).
+    'fields'/'include' escolhem colunas e relações, como em GET /api/emprestimos/.
     """
     # Verificação de segurança:
     # (Idealmente, um cliente só pode ver o seu próprio, e um admin/bibliotecário pode ver todos)
     
-    return db.query(models.Emprestimo).options(
-        joinedload(models.Emprestimo.exemplar) # Carrega dados do exemplar junto
-    ).filter(models.Emprestimo.id_cliente == cliente_id).all()
+    sel = projecoes.selecao(projecoes.EMPRESTIMO, fields, include)
+    return serializacao.responder(
+        projecoes.emprestimos_do_cliente(db, cliente_id, sel),
+        projecoes.contrato(projecoes.EMPRESTIMO, sel, List[schemas.Emprestimo])
+    )
 
 @app.get("/api/emprestimos/{emprestimo_id}", response_model=schemas.Emprestimo, tags=["Empréstimos"])
 def read_emprestimo_por_id(
     emprestimo_id: int,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     """
     Busca um empréstimo específico pelo seu ID.
@@ -388,6 +847,9 @@ def read_emprestimo_por_id(
         joinedload(models.Emprestimo.cliente),
         joinedload(models.Emprestimo.exemplar)
     ).filter(models.Emprestimo.id_emprestimo == emprestimo_id).first()
+    if not emprestimo:
+        # Empréstimos antigos já podem ter sido movidos para o histórico
+        emprestimo = projecoes.emprestimo_arquivado(db, emprestimo_id)
     
     if not emprestimo:
         raise HTTPException(status_code=404, detail="Empréstimo não encontrado.")
@@ -402,7 +864,7 @@ def read_emprestimo_por_id(
 def create_exemplar(
     exemplar_data: schemas.ExemplarCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -417,20 +879,46 @@ def create_exemplar(
         db.add(db_exemplar)
         db.commit()
         db.refresh(db_exemplar)
-        return db_exemplar
     except IntegrityError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro de integridade (ex: código de barras duplicado): {e.orig}")
 
+    disponibilidade.projecao.atualizar_livros(db, [db_exemplar.id_livro])
+    circulacao.mapa_codigos.registrar(db_exemplar.codigo_barras, db_exemplar.id_exemplar, db_exemplar.id_livro)
+    auditoria.fila.registrar("Exemplar", db_exemplar.id_exemplar, "ExemplarCriado",
+                             f"Livro {db_exemplar.id_livro}, código {db_exemplar.codigo_barras}", current_user.username)
+    return db_exemplar
+
 @app.get("/api/exemplares/por-livro/{livro_id}", response_model=List[schemas.Exemplar], tags=["Acervo - Exemplares"])
 def get_exemplares_por_livro(
     livro_id: str,
     db: Session = Depends(get_db)
 ):
-    exemplares = db.query(models.Exemplar).filter(models.Exemplar.id_livro == livro_id).all()
+    exemplares = projecoes.exemplares_do_livro(db, livro_id)
     if not exemplares:
         raise HTTPException(status_code=404, detail="Nenhum exemplar encontrado para este livro.")
-    return exemplares
+    return serializacao.responder(exemplares, List[schemas.Exemplar])
+
+# Contagens por status servidas da projeção em memória (disponibilidade.py)
+@app.get("/api/disponibilidade/{livro_id}", response_model=schemas.Disponibilidade, tags=["Acervo - Exemplares"])
+def read_disponibilidade(
+    livro_id: str,
+    db: Session = Depends(get_db)
+):
+    disponibilidade.projecao.garantir_carregado(db)
+    return disponibilidade.projecao.consultar([livro_id])[0]
+
+@app.post("/api/disponibilidade/lote", response_model=List[schemas.Disponibilidade], tags=["Acervo - Exemplares"])
+def read_disponibilidade_lote(
+    consulta: schemas.ConsultaDisponibilidade,
+    db: Session = Depends(get_db)
+):
+    """
+    Disponibilidade de até 1000 livros numa chamada, na ordem pedida.
+    Livros sem exemplares (ou inexistentes) vêm com todos os contadores zerados.
+    """
+    disponibilidade.projecao.garantir_carregado(db)
+    return disponibilidade.projecao.consultar(consulta.ids_livros)
 
 # =======================================================================
 # 6. ENDPOINTS DE ENTIDADES DE APOIO (Editora, Categoria)
@@ -440,7 +928,7 @@ def get_exemplares_por_livro(
 def create_editora(
     editora: schemas.EditoraCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -451,20 +939,35 @@ def create_editora(
         db.add(db_editora)
         db.commit()
         db.refresh(db_editora)
+        cache_referencia.invalidar("editoras")
+        auditoria.fila.registrar("Editora", db_editora.id_editora, "EditoraCriada", None, current_user.username)
         return db_editora
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Editora já cadastrada.")
 
 @app.get("/api/editoras/", response_model=List[schemas.Editora], tags=["Acervo - Editoras"])
-def read_all_editoras(db: Session = Depends(get_db)):
-    return db.query(models.Editora).all()
+def read_all_editoras(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    if formato == "ndjson":
+        return paginacao.stream_ndjson(
+            lambda s: s.query(models.Editora), models.Editora.id_editora, schemas.Editora, cursor
+        )
+    return cache_referencia.responder(
+        request, "editoras", schemas.Editora, cursor, limit,
+        lambda: paginacao.paginar(db.query(models.Editora), models.Editora.id_editora, cursor, limit),
+    )
 
 @app.post("/api/categorias/", response_model=schemas.Categoria, tags=["Acervo - Categorias"])
 def create_categoria(
     categoria: schemas.CategoriaCreate,
     db: Session = Depends(get_db),
-    current_user: models.Usuarios = Depends(security.get_current_user)
+    current_user: security.Principal = Depends(security.get_current_user)
 ):
     if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
         raise HTTPException(status_code=403, detail="Permissão negada.")
@@ -475,11 +978,93 @@ def create_categoria(
         db.add(db_categoria)
         db.commit()
         db.refresh(db_categoria)
+        cache_referencia.invalidar("categorias")
+        auditoria.fila.registrar("Categoria", db_categoria.id_categoria, "CategoriaCriada", None, current_user.username)
         return db_categoria
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Categoria já cadastrada.")
 
 @app.get("/api/categorias/", response_model=List[schemas.Categoria], tags=["Acervo - Categorias"])
-def read_all_categorias(db: Session = Depends(get_db)):
-    return db.query(models.Categoria).all()
\ No newline at end of file
+def read_all_categorias(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    if formato == "ndjson":
+        return paginacao.stream_ndjson(
+            lambda s: s.query(models.Categoria), models.Categoria.id_categoria, schemas.Categoria, cursor
+        )
+    return cache_referencia.responder(
+        request, "categorias", schemas.Categoria, cursor, limit,
+        lambda: paginacao.paginar(db.query(models.Categoria), models.Categoria.id_categoria, cursor, limit),
+    )
+
+# =======================================================================
+# 7. ENDPOINTS DE RESERVAS
+# =======================================================================
+
+@app.post("/api/reservas/", response_model=schemas.Reserva, tags=["Reservas"])
+def create_reserva(
+    reserva: schemas.ReservaCreate,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Coloca o cliente no fim da fila do exemplar (emprestado ou reservado).
+    A reserva vale RESERVA_VALIDADE_DIAS dias; depois disso é expirada pelo job de varredura.
+    """
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    db_reserva = reservas.criar(db, reserva)
+    auditoria.fila.registrar("Reserva", db_reserva.id_reserva, "ReservaCriada",
+                             f"Exemplar ID={db_reserva.id_exemplar}, cliente ID={db_reserva.id_cliente}", current_user.username)
+    return db_reserva
+
+@app.post("/api/reservas/{reserva_id}/cancelar", response_model=schemas.Reserva, tags=["Reservas"])
+def cancelar_reserva(
+    reserva_id: int,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+    db_reserva = reservas.cancelar(db, reserva_id)
+    auditoria.fila.registrar("Reserva", reserva_id, "ReservaCancelada", None, current_user.username)
+    return db_reserva
+
+@app.get("/api/reservas/{reserva_id}/posicao", response_model=schemas.PosicaoReserva, tags=["Reservas"])
+def read_posicao_reserva(
+    reserva_id: int,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Posição da reserva na fila do exemplar (1 = a próxima a ser atendida)."""
+    return reservas.posicao(db, reserva_id)
+
+@app.get("/api/reservas/fila/{exemplar_id}", response_model=List[schemas.Reserva], tags=["Reservas"])
+def read_fila_reservas(
+    exemplar_id: int,
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """Reservas ativas do exemplar, na ordem em que serão atendidas."""
+    return reservas.fila(db, exemplar_id)
+
+# =======================================================================
+# 8. ENDPOINT DE ESTATÍSTICAS (Painel)
+# =======================================================================
+
+@app.get("/api/stats", response_model=schemas.Estatisticas, tags=["Estatísticas"])
+def read_estatisticas(
+    db: Session = Depends(get_db),
+    current_user: security.Principal = Depends(security.get_current_user)
+):
+    """
+    Números do painel, lidos do retrato em memória (estatisticas.py).
+    Empréstimos ativos e o movimento do dia já incluem as operações feitas
+    depois do retrato; o resto pode ter até 'defasagem_maxima_segundos' de atraso.
+    """
+    return estatisticas.painel.obter(db)
\ No newline at end of file
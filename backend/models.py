@@ -1,7 +1,7 @@
 # models.py
 import enum
 from sqlalchemy import (Column, Integer, String, DateTime, ForeignKey, Table,
-                        Boolean, DECIMAL, Date, Enum as SqlEnum, TEXT)
+                        Boolean, DECIMAL, Date, Enum as SqlEnum, TEXT, Index)
 # 'FetchedValue' foi REMOVIDO daqui
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -95,6 +95,9 @@ class Exemplar(Base):
     emprestimos = relationship("Emprestimo", back_populates="exemplar")
     reservas = relationship("Reserva", back_populates="exemplar")
 
+    # Contagem por livro e status sem varrer a tabela (veja disponibilidade.py)
+    __table_args__ = (Index("idx_exemplar_livro_status", "id_livro", "status"),)
+
 class UsuarioCliente(Base):
     __tablename__ = "usuario_cliente"
     id_cliente = Column(Integer, primary_key=True, autoincrement=True)
@@ -141,6 +144,12 @@ class Emprestimo(Base):
     exemplar = relationship("Exemplar", back_populates="emprestimos")
     cliente = relationship("UsuarioCliente", back_populates="emprestimos")
 
+    __table_args__ = (
+        # Movimento por dia do painel de estatísticas (estatisticas.py)
+        Index("idx_emprestimo_data", "data_emprestimo"),
+        Index("idx_emprestimo_devolucao", "data_devolucao"),
+    )
+
 class Reserva(Base):
     __tablename__ = "reserva"
     id_reserva = Column(Integer, primary_key=True, autoincrement=True)
@@ -155,6 +164,13 @@ class Reserva(Base):
     exemplar = relationship("Exemplar", back_populates="reservas")
     cliente = relationship("UsuarioCliente", back_populates="reservas")
 
+    __table_args__ = (
+        # Fila de cada exemplar: reservas ativas em ordem de chegada
+        Index("idx_reserva_fila", "id_exemplar", "status", "data_reserva"),
+        # Varredura de reservas vencidas (reservas.py)
+        Index("idx_reserva_expiracao", "status", "data_expiracao"),
+    )
+
 class AuditLog(Base):
     __tablename__ = "audit_log"
     id_log = Column(Integer, primary_key=True, autoincrement=True)
@@ -162,7 +178,14 @@ class AuditLog(Base):
     entidade_id = Column(String(50))
     acao = Column(String(50))
     descricao = Column(TEXT)
+    usuario = Column(String(100))  # Quem fez a ação (username); NULL para eventos do sistema
     criado_em = Column(DateTime, server_default=func.now())
+    __table_args__ = (
+        Index("idx_audit_entidade", "entidade", "entidade_id", "id_log"),
+        Index("idx_audit_usuario", "usuario", "id_log"),
+        Index("idx_audit_acao", "acao", "id_log"),
+        Index("idx_audit_criado", "criado_em"),
+    )
 
 # ===== NOVO MODELO AQUI =====
 # Mapeia a tabela de contadores para o Python
@@ -170,4 +193,48 @@ class SeqCounters(Base):
     __tablename__ = "seq_counters"
     seq_name = Column(String(100), primary_key=True)
     seq_year = Column(Integer, primary_key=True)
-    seq_value = Column(Integer, nullable=False, default=0)
\ No newline at end of file
+    seq_value = Column(Integer, nullable=False, default=0)
+
+# Empréstimos vencidos e não devolvidos, mantidos pelo job de atrasos (atrasos.py).
+# Dias de atraso e multa são calculados na leitura a partir da data prevista,
+# então uma linha só é escrita quando o empréstimo vence e sai quando é devolvido.
+class EmprestimoAtrasado(Base):
+    __tablename__ = "emprestimo_atrasado"
+    id_emprestimo = Column(Integer, ForeignKey("emprestimo.id_emprestimo"), primary_key=True)
+    id_exemplar = Column(Integer, nullable=False)
+    id_cliente = Column(Integer, nullable=False)
+    data_prevista_devolucao = Column(Date, nullable=False)
+    incluido_em = Column(DateTime, server_default=func.now())
+
+    # Ordenação por dias de atraso = ordenação pela data prevista
+    __table_args__ = (Index("idx_atrasado_prevista", "data_prevista_devolucao", "id_emprestimo"),)
+
+# Marca d'água dos jobs periódicos (até onde cada um já processou)
+class JobMarca(Base):
+    __tablename__ = "job_marca"
+    nome = Column(String(50), primary_key=True)
+    valor = Column(String(50))
+    atualizado_em = Column(DateTime)
+
+# Empréstimos encerrados há mais de ARQUIVO_IDADE_DIAS, movidos em lotes pelo
+# job de arquivamento (arquivamento.py) para 'emprestimo' ficar pequena.
+# Sem chaves estrangeiras: no MySQL a tabela é particionada por ano de
+# data_emprestimo (veja biblioteca_db.sql), e a chave de partição precisa
+# fazer parte da chave primária.
+class EmprestimoHistorico(Base):
+    __tablename__ = "emprestimo_historico"
+    id_emprestimo = Column(Integer, primary_key=True, autoincrement=False)
+    data_emprestimo = Column(DateTime, primary_key=True)
+    id_exemplar = Column(Integer, nullable=False)
+    id_cliente = Column(Integer, nullable=False)
+    data_prevista_devolucao = Column(Date, nullable=False)
+    data_devolucao = Column(DateTime)
+    multa = Column(DECIMAL(10, 2), default=0.00)
+    ativo = Column(Boolean, nullable=False, default=False)
+    criado_em = Column(DateTime)
+    arquivado_em = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        # Histórico de um cliente (GET /api/emprestimos/por-cliente/{id})
+        Index("idx_historico_cliente", "id_cliente", "data_emprestimo"),
+    )
@@ -0,0 +1,133 @@
+# paginacao.py
+# Paginação por chave (keyset / cursor) e streaming NDJSON para as listagens.
+#
+# Em vez de OFFSET (que obriga o banco a percorrer todas as linhas anteriores),
+# cada página pede "as próximas N linhas com chave primária maior que a última
+# vista". O cursor entregue ao cliente é opaco: apenas a última chave codificada
+# em base64, que ele devolve sem interpretar para pedir a página seguinte.
+import base64
+import json
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+
+from database import SessionLocal
+
+LIMITE_PADRAO = 100      # Tamanho de página quando o cliente não informa 'limit'
+LIMITE_MAXIMO = 1000     # Teto de segurança para 'limit'
+TAMANHO_LOTE_STREAM = 500  # Linhas lidas do banco por vez no modo NDJSON
+
+# Cabeçalho onde o próximo cursor é devolvido (o corpo continua sendo uma lista)
+CABECALHO_CURSOR = "X-Next-Cursor"
+
+
+# --- Codificação do cursor ---
+
+def codificar_cursor(chave: Any) -> str:
+    """Transforma a última chave vista em um cursor opaco (base64 url-safe)."""
+    bruto = json.dumps({"k": chave}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor: Optional[str]) -> Any:
+    """Recupera a chave de um cursor. Cursor ausente = começar do início."""
+    if not cursor:
+        return None
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        bruto = base64.urlsafe_b64decode(cursor + preenchimento)
+        return json.loads(bruto)["k"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+
+# --- Paginação ---
+
+def paginar(query: Query, coluna_chave, cursor: Optional[str], limite: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Aplica a paginação por chave a uma query do ORM.
+    Retorna (itens_da_pagina, proximo_cursor). O próximo cursor é None
+    quando não há mais páginas.
+    """
+    apos = decodificar_cursor(cursor)
+    # Pedimos uma linha a mais só para saber se existe próxima página
+    itens = _buscar_pagina(query, coluna_chave, apos, limite + 1)
+    return _cortar_pagina(itens, coluna_chave, limite)
+
+def paginar_select(db: Session, stmt: Select, coluna_chave, cursor: Optional[str], limite: int) -> Tuple[List[Any], Optional[str]]:
+    """Igual a paginar, para um select() de colunas (devolve as linhas, sem objetos do ORM)."""
+    apos = decodificar_cursor(cursor)
+    if apos is not None:
+        stmt = stmt.where(coluna_chave > apos)
+    linhas = db.execute(stmt.order_by(coluna_chave).limit(limite + 1)).all()
+    return _cortar_pagina(linhas, coluna_chave, limite)
+
+async def paginar_async(db: AsyncSession, stmt: Select, coluna_chave, cursor: Optional[str], limite: int) -> Tuple[List[Any], Optional[str]]:
+    """Igual a paginar, para um select() executado em uma AsyncSession."""
+    apos = decodificar_cursor(cursor)
+    if apos is not None:
+        stmt = stmt.where(coluna_chave > apos)
+    resultado = await db.execute(stmt.order_by(coluna_chave).limit(limite + 1))
+    itens = list(resultado.scalars().unique())
+    return _cortar_pagina(itens, coluna_chave, limite)
+
+def _cortar_pagina(itens: List[Any], coluna_chave, limite: int) -> Tuple[List[Any], Optional[str]]:
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo_cursor = codificar_cursor(getattr(itens[-1], coluna_chave.key))
+    return itens, proximo_cursor
+
+def _buscar_pagina(query: Query, coluna_chave, apos: Any, quantidade: int) -> List[Any]:
+    if apos is not None:
+        query = query.filter(coluna_chave > apos)
+    return query.order_by(coluna_chave).limit(quantidade).all()
+
+def definir_cursor(response: Response, proximo_cursor: Optional[str]) -> None:
+    """Publica o próximo cursor no cabeçalho da resposta (se houver)."""
+    if proximo_cursor:
+        response.headers[CABECALHO_CURSOR] = proximo_cursor
+
+
+# --- Streaming NDJSON ---
+
+def stream_ndjson(
+    montar_query: Callable[[Session], Query],
+    coluna_chave,
+    schema,
+    cursor: Optional[str] = None,
+    tamanho_lote: int = TAMANHO_LOTE_STREAM,
+) -> StreamingResponse:
+    """
+    Devolve uma StreamingResponse que lê a tabela em lotes (por chave) e
+    envia uma linha JSON por registro. Nunca há mais que 'tamanho_lote'
+    objetos em memória.
+
+    'montar_query' recebe a sessão e devolve a query base (com filtros e
+    opções de carregamento); a sessão é própria do stream, pois a resposta
+    continua sendo enviada depois que o endpoint retornou.
+    """
+    apos = decodificar_cursor(cursor)
+
+    def gerar() -> Iterator[bytes]:
+        nonlocal apos
+        db = SessionLocal()
+        try:
+            while True:
+                lote = _buscar_pagina(montar_query(db), coluna_chave, apos, tamanho_lote)
+                if not lote:
+                    break
+                for item in lote:
+                    yield schema.model_validate(item).model_dump_json().encode("utf-8") + b"\n"
+                apos = getattr(lote[-1], coluna_chave.key)
+                # Libera os objetos do lote já enviado
+                db.expunge_all()
+                if len(lote) < tamanho_lote:
+                    break
+        finally:
+            db.close()
+
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
@@ -0,0 +1,200 @@
+# perfil.py
+# Perfil de cada requisição: quantas instruções SQL ela emitiu e quanto
+# tempo passou no banco.
+#
+# MiddlewarePerfil abre uma "medição" por requisição numa ContextVar; os
+# eventos before/after_cursor_execute da engine somam nela cada instrução
+# executada. A ContextVar acompanha a requisição até o threadpool onde rodam
+# as rotas síncronas e o get_db, então a contagem inclui tudo o que a rota
+# disparou, inclusive carregamentos preguiçosos durante a serialização da
+# resposta (ex.: current_user.grupo, exemplar.livro). Jobs do agendador
+# rodam fora de requisições e não são contados.
+#
+# Para cada requisição:
+#   - cabeçalho Server-Timing com o tempo no banco, o número de consultas e
+#     o tempo total (aparece na aba Network do navegador)
+#   - acima de PERFIL_LIMITE_LENTO_MS (ou de PERFIL_LIMITE_CONSULTAS
+#     consultas), um aviso no log com as instruções agrupadas: a mesma
+#     consulta repetida dezenas de vezes é o sinal de um N+1
+#   - estatísticas agregadas por rota, em /api/admin/perfil
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+ATIVO = os.getenv("PERFIL_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+LIMITE_LENTO_MS = float(os.getenv("PERFIL_LIMITE_LENTO_MS", "500"))
+LIMITE_CONSULTAS = int(os.getenv("PERFIL_LIMITE_CONSULTAS", "50"))
+MAX_INSTRUCOES_GUARDADAS = 200   # Por requisição, para o log de lentas
+AMOSTRAS_POR_ROTA = 1000         # Últimas durações usadas nos percentis
+
+logger = logging.getLogger("biblioteca.perfil")
+
+
+class Medicao:
+    __slots__ = ("consultas", "tempo_db", "instrucoes")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.instrucoes = []  # (ms, sql)
+
+
+_medicao_atual: ContextVar[Optional[Medicao]] = ContextVar("medicao_perfil", default=None)
+
+
+# --- Eventos da engine ---
+
+def instrumentar(engine) -> None:
+    """Liga a contagem de instruções numa engine síncrona (para a assíncrona, passe async_engine.sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _antes_da_instrucao)
+    event.listen(engine, "after_cursor_execute", _depois_da_instrucao)
+
+# O início fica no contexto da execução, não em conn.info: uma instrução que
+# falha não chega ao after_cursor_execute, e o contexto dela é descartado
+def _antes_da_instrucao(conn, cursor, statement, parameters, context, executemany):
+    context._perfil_inicio = time.perf_counter()
+
+def _depois_da_instrucao(conn, cursor, statement, parameters, context, executemany):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return
+    duracao = time.perf_counter() - context._perfil_inicio
+    medicao.consultas += 1
+    medicao.tempo_db += duracao
+    if len(medicao.instrucoes) < MAX_INSTRUCOES_GUARDADAS:
+        medicao.instrucoes.append((duracao * 1000, statement))
+
+
+# --- Agregado por rota ---
+
+class EstatisticasRota:
+    def __init__(self):
+        self.requisicoes = 0
+        self.lentas = 0
+        self.tempo_total_ms = 0.0
+        self.tempo_db_total_ms = 0.0
+        self.consultas_total = 0
+        self.consultas_max = 0
+        self.duracoes = deque(maxlen=AMOSTRAS_POR_ROTA)
+
+
+class Perfilador:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rotas = {}
+
+    def registrar(self, rota: str, duracao_ms: float, medicao: Medicao, lenta: bool) -> None:
+        with self._lock:
+            estatisticas = self.rotas.get(rota)
+            if estatisticas is None:
+                estatisticas = self.rotas[rota] = EstatisticasRota()
+            estatisticas.requisicoes += 1
+            estatisticas.lentas += lenta
+            estatisticas.tempo_total_ms += duracao_ms
+            estatisticas.tempo_db_total_ms += medicao.tempo_db * 1000
+            estatisticas.consultas_total += medicao.consultas
+            estatisticas.consultas_max = max(estatisticas.consultas_max, medicao.consultas)
+            estatisticas.duracoes.append(duracao_ms)
+
+    def metricas(self) -> dict:
+        """Rotas ordenadas pelo tempo total gasto (onde otimizar primeiro)."""
+        with self._lock:
+            rotas = sorted(self.rotas.items(), key=lambda item: item[1].tempo_total_ms, reverse=True)
+            return {
+                "limite_lento_ms": LIMITE_LENTO_MS,
+                "limite_consultas": LIMITE_CONSULTAS,
+                "rotas": {
+                    rota: {
+                        "requisicoes": e.requisicoes,
+                        "lentas": e.lentas,
+                        "tempo_total_ms": round(e.tempo_total_ms, 1),
+                        "media_ms": round(e.tempo_total_ms / e.requisicoes, 2),
+                        "p95_ms": round(_p95(e.duracoes), 2),
+                        "db_media_ms": round(e.tempo_db_total_ms / e.requisicoes, 2),
+                        "consultas_media": round(e.consultas_total / e.requisicoes, 2),
+                        "consultas_max": e.consultas_max,
+                    }
+                    for rota, e in rotas
+                },
+            }
+
+    def zerar(self) -> None:
+        with self._lock:
+            self.rotas = {}
+
+
+def _p95(valores) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))] if ordenados else 0.0
+
+
+perfilador = Perfilador()
+
+
+# --- Middleware ---
+
+class MiddlewarePerfil:
+    """Middleware ASGI: mede a requisição inteira, inclusive o corpo de respostas em streaming."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ATIVO:
+            await self.app(scope, receive, send)
+            return
+
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - inicio) * 1000
+                MutableHeaders(scope=mensagem).append(
+                    "Server-Timing",
+                    f'db;dur={medicao.tempo_db * 1000:.1f};desc="{medicao.consultas} consultas", '
+                    f"total;dur={total_ms:.1f}",
+                )
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao_atual.reset(token)
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            # O roteador grava a rota casada no scope (ex.: /api/livros/{livro_id})
+            rota = scope.get("route")
+            nome = f"{scope['method']} {rota.path if rota is not None else '(sem rota)'}"
+            lenta = duracao_ms >= LIMITE_LENTO_MS or medicao.consultas >= LIMITE_CONSULTAS
+            perfilador.registrar(nome, duracao_ms, medicao, lenta)
+            if lenta:
+                _registrar_lenta(nome, scope, duracao_ms, medicao)
+
+
+def _registrar_lenta(nome: str, scope, duracao_ms: float, medicao: Medicao) -> None:
+    # Agrupa instruções iguais: a mesma consulta repetida N vezes indica um N+1
+    tempos = Counter()
+    repeticoes = Counter()
+    for ms, sql in medicao.instrucoes:
+        tempos[sql] += ms
+        repeticoes[sql] += 1
+    linhas = [
+        f"  {repeticoes[sql]:>4}x {tempos[sql]:>8.1f} ms  {' '.join(sql.split())[:300]}"
+        for sql, _ in tempos.most_common()
+    ]
+    omitidas = medicao.consultas - len(medicao.instrucoes)
+    if omitidas > 0:
+        linhas.append(f"  ... e mais {omitidas} instruções não guardadas")
+    caminho = scope["path"] + (f"?{scope['query_string'].decode()}" if scope.get("query_string") else "")
+    logger.warning(
+        "Requisição lenta: %s (%s) %.1f ms, %d consultas, %.1f ms no banco\n%s",
+        nome, caminho, duracao_ms, medicao.consultas, medicao.tempo_db * 1000, "\n".join(linhas),
+    )
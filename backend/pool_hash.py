@@ -0,0 +1,79 @@
+# pool_hash.py
+# Pool dedicado para o bcrypt (hash e verificação de senha).
+#
+# O bcrypt é propositalmente lento (~0,2 s por verificação). Rodando dentro
+# do threadpool do FastAPI, uma rajada de logins ocupa as threads que
+# atenderiam as demais rotas. Aqui ele roda em um pool próprio e limitado:
+#   - no máximo HASH_WORKERS verificações simultâneas (uma por núcleo)
+#   - no máximo HASH_FILA_MAX pedidos aguardando; acima disso o pedido é
+#     recusado na hora (PoolSaturadaError -> HTTP 503), em vez de acumular
+#     uma fila que nunca será atendida a tempo.
+# A biblioteca bcrypt libera o GIL durante o cálculo, então threads bastam
+# para usar todos os núcleos.
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_FILA_MAX = int(os.getenv("HASH_FILA_MAX", str(HASH_WORKERS * 4)))
+
+
+class PoolSaturadaError(Exception):
+    """O pool de hash já tem o máximo de pedidos em execução + espera."""
+
+
+class PoolHash:
+    def __init__(self, max_workers: int = HASH_WORKERS, fila_max: int = HASH_FILA_MAX):
+        self.max_workers = max_workers
+        self.fila_max = fila_max
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        # Vagas = executando + aguardando
+        self._vagas = threading.BoundedSemaphore(max_workers + fila_max)
+        self._lock = threading.Lock()
+        self.em_andamento = 0
+        self.concluidos = 0
+        self.recusados = 0
+
+    def submeter(self, funcao: Callable[..., Any], *args) -> Future:
+        """Agenda a função no pool ou levanta PoolSaturadaError se não houver vaga."""
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.recusados += 1
+            raise PoolSaturadaError("Muitas operações de senha simultâneas. Tente novamente.")
+        with self._lock:
+            self.em_andamento += 1
+        futuro = self._executor.submit(funcao, *args)
+        futuro.add_done_callback(self._liberar_vaga)
+        return futuro
+
+    def _liberar_vaga(self, _futuro: Future) -> None:
+        with self._lock:
+            self.em_andamento -= 1
+            self.concluidos += 1
+        self._vagas.release()
+
+    def executar(self, funcao: Callable[..., Any], *args) -> Any:
+        """Versão síncrona: executa no pool e espera o resultado."""
+        return self.submeter(funcao, *args).result()
+
+    async def executar_async(self, funcao: Callable[..., Any], *args) -> Any:
+        """Versão assíncrona: espera o resultado sem bloquear o event loop."""
+        return await asyncio.wrap_future(self.submeter(funcao, *args))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "fila_max": self.fila_max,
+                "em_andamento": self.em_andamento,
+                "concluidos": self.concluidos,
+                "recusados": self.recusados,
+            }
+
+    def encerrar(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+pool = PoolHash()
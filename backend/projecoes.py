@@ -0,0 +1,256 @@
+# projecoes.py
+# Listagens montadas direto do SQL, em dicionários com o formato dos schemas.
+#
+# O caminho pelo ORM cria um objeto por linha (com identity map e controle de
+# alterações), carrega as relações e o response_model percorre tudo de novo.
+# Pior: o que o schema aninha e a query não carregou vira um lazy-load por
+# linha na serialização (ex.: exemplar.livro em cada empréstimo).
+#
+# Aqui cada listagem seleciona só as colunas pedidas (tuplas do Core):
+#   - relações N:1 (editora, cliente, exemplar, exemplar.livro) entram como
+#     JOIN na mesma consulta, só quando pedidas
+#   - relações N:N (autores, categorias) vêm em uma consulta por relação
+#     com IN sobre as chaves da página, só quando pedidas
+# O resultado sai por serializacao.responder, sem revalidação.
+#
+# Campos esparsos (parâmetros 'fields' e 'include' das listagens):
+#   fields=id_emprestimo,data_emprestimo,cliente.nome,exemplar.livro.titulo
+#   include=cliente,exemplar.livro
+# 'fields' escolhe colunas (com caminho para as das relações); 'include'
+# traz relações inteiras. Sem nenhum dos dois, vem o formato completo do
+# schema. A chave da listagem (ex.: id_livro) sempre vem, pois é o cursor.
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import literal_column, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+import models
+import paginacao
+
+
+# --- Recursos: colunas e relações que cada listagem pode expor ---
+
+class Recurso:
+    def __init__(self, modelo, chave: str, campos: Tuple[str, ...], relacoes: Optional[dict] = None):
+        self.modelo = modelo
+        self.chave = chave
+        self.campos = campos      # Na ordem do schema
+        self.relacoes = relacoes or {}
+
+class UmPara:
+    """Relação N:1 (ou 1:1): JOIN na consulta principal."""
+    def __init__(self, recurso: Recurso, coluna_local: str, obrigatoria: bool):
+        self.recurso = recurso
+        self.coluna_local = coluna_local
+        self.obrigatoria = obrigatoria  # FK NOT NULL: JOIN interno
+
+class Colecao:
+    """Relação N:N: uma consulta com IN pela tabela de associação."""
+    def __init__(self, recurso: Recurso, associacao, coluna_origem: str, coluna_destino: str):
+        self.recurso = recurso
+        self.associacao = associacao
+        self.coluna_origem = coluna_origem
+        self.coluna_destino = coluna_destino
+
+
+AUTOR = Recurso(models.Autor, "id_autor", ("nome", "sobrenome", "id_autor"))
+CATEGORIA = Recurso(models.Categoria, "id_categoria", ("nome", "id_categoria"))
+EDITORA = Recurso(models.Editora, "id_editora", ("nome", "id_editora"))
+LIVRO = Recurso(models.Livro, "id_livro", ("titulo", "isbn", "ano_publicacao", "id_editora", "id_livro"), {
+    "editora": UmPara(EDITORA, "id_editora", obrigatoria=False),
+    "autores": Colecao(AUTOR, models.livro_autor_table, "id_livro", "id_autor"),
+    "categorias": Colecao(CATEGORIA, models.livro_categoria_table, "id_livro", "id_categoria"),
+})
+EXEMPLAR = Recurso(models.Exemplar, "id_exemplar", ("id_livro", "codigo_barras", "status", "localizacao", "id_exemplar"), {
+    "livro": UmPara(LIVRO, "id_livro", obrigatoria=True),
+})
+CLIENTE = Recurso(models.UsuarioCliente, "id_cliente", ("nome", "cpf", "email", "telefone", "id_cliente"))
+EMPRESTIMO = Recurso(models.Emprestimo, "id_emprestimo", (
+    "id_exemplar", "id_cliente", "data_prevista_devolucao", "id_emprestimo",
+    "data_emprestimo", "data_devolucao", "multa", "ativo",
+), {
+    "cliente": UmPara(CLIENTE, "id_cliente", obrigatoria=True),
+    "exemplar": UmPara(EXEMPLAR, "id_exemplar", obrigatoria=True),
+})
+# Empréstimos arquivados (arquivamento.py): mesmo formato, outra tabela
+EMPRESTIMO_ARQUIVADO = Recurso(models.EmprestimoHistorico, "id_emprestimo", EMPRESTIMO.campos, EMPRESTIMO.relacoes)
+
+
+# --- Seleção (o que foi pedido) ---
+
+class Selecao:
+    def __init__(self, campos: List[str], relacoes: Dict[str, "Selecao"]):
+        self.campos = campos
+        self.relacoes = relacoes
+
+def _completa(recurso: Recurso) -> Selecao:
+    return Selecao(list(recurso.campos), {nome: _completa(rel.recurso) for nome, rel in recurso.relacoes.items()})
+
+_COMPLETAS = {}
+
+def selecao(recurso: Recurso, fields: Optional[str] = None, include: Optional[str] = None) -> Selecao:
+    """Interpreta 'fields' e 'include'. Sem nenhum dos dois: o formato completo do schema."""
+    if not fields and not include:
+        if recurso not in _COMPLETAS:
+            _COMPLETAS[recurso] = _completa(recurso)
+        return _COMPLETAS[recurso]
+
+    # Nó da árvore: [recurso, campos explícitos, relações, pedida inteira]
+    # Uma relação que só aparece no caminho de um campo (o 'exemplar' em
+    # 'exemplar.livro.titulo') não traz colunas próprias.
+    raiz = [recurso, [], {}, not fields]
+
+    def descer(caminho: List[str], item: str):
+        no = raiz
+        for nome in caminho:
+            relacao = no[0].relacoes.get(nome)
+            if relacao is None:
+                raise HTTPException(status_code=400, detail=f"Campo desconhecido: {item}")
+            no = no[2].setdefault(nome, [relacao.recurso, [], {}, False])
+        return no
+
+    for item in _itens(include):
+        descer(item.split("."), item)[3] = True
+    for item in _itens(fields):
+        *caminho, ultimo = item.split(".")
+        no = descer(caminho, item)
+        if ultimo in no[0].relacoes:
+            descer(caminho + [ultimo], item)[3] = True
+        elif ultimo in no[0].campos:
+            no[1].append(ultimo)
+        else:
+            raise HTTPException(status_code=400, detail=f"Campo desconhecido: {item}")
+
+    def montar(no) -> Selecao:
+        recurso_no, explicitos, relacoes, inteira = no
+        if inteira and not explicitos:
+            campos = list(recurso_no.campos)
+        else:
+            campos = [c for c in recurso_no.campos if c in explicitos or (no is raiz and c == recurso_no.chave)]
+        return Selecao(campos, {
+            nome: montar(relacoes[nome]) for nome in recurso_no.relacoes if nome in relacoes
+        })
+
+    return montar(raiz)
+
+def _itens(valor: Optional[str]) -> List[str]:
+    return [item.strip() for item in (valor or "").split(",") if item.strip()]
+
+def contrato(recurso: Recurso, sel: Selecao, tipo):
+    """Tipo para a validação opcional da saída: só o formato completo segue o schema."""
+    return tipo if sel is selecao(recurso) else None
+
+
+# --- Montagem da consulta e do resultado ---
+
+def _select(recurso: Recurso, sel: Selecao):
+    """SELECT com as colunas pedidas e os JOINs das relações N:1 pedidas."""
+    colunas = []
+    juncoes = []
+
+    def visitar(recurso_no, sel_no, entidade, prefixo):
+        if prefixo:
+            # Chave da relação (escondida): diz se ela existe e liga as coleções
+            colunas.append(getattr(entidade, recurso_no.chave).label(prefixo + "_chave"))
+        for campo in sel_no.campos:
+            colunas.append(getattr(entidade, campo).label(prefixo + campo))
+        for nome, sub in sel_no.relacoes.items():
+            relacao = recurso_no.relacoes[nome]
+            if isinstance(relacao, UmPara):
+                alvo = aliased(relacao.recurso.modelo)
+                condicao = getattr(alvo, relacao.recurso.chave) == getattr(entidade, relacao.coluna_local)
+                juncoes.append((alvo, condicao, relacao.obrigatoria))
+                visitar(relacao.recurso, sub, alvo, f"{prefixo}{nome}__")
+
+    visitar(recurso, sel, recurso.modelo, "")
+    chave = getattr(recurso.modelo, recurso.chave)
+    if recurso.chave not in sel.campos:
+        colunas.insert(0, chave.label(recurso.chave))  # Usada pelo cursor
+    stmt = select(*colunas)
+    for alvo, condicao, obrigatoria in juncoes:
+        stmt = stmt.join(alvo, condicao) if obrigatoria else stmt.outerjoin(alvo, condicao)
+    return stmt
+
+def _montar(db: Session, recurso: Recurso, sel: Selecao, linhas) -> List[dict]:
+    pendentes = {}  # caminho -> (nome, Colecao, Selecao, [(chave, dict)])
+
+    def montar(linha, recurso_no, sel_no, prefixo):
+        if prefixo and linha[prefixo + "_chave"] is None:
+            return None
+        item = {campo: linha[prefixo + campo] for campo in sel_no.campos}
+        for nome, sub in sel_no.relacoes.items():
+            relacao = recurso_no.relacoes[nome]
+            if isinstance(relacao, UmPara):
+                item[nome] = montar(linha, relacao.recurso, sub, f"{prefixo}{nome}__")
+            else:
+                chave = linha[prefixo + "_chave"] if prefixo else linha[recurso_no.chave]
+                pendentes.setdefault(prefixo + nome, (nome, relacao, sub, []))[3].append((chave, item))
+        return item
+
+    itens = [montar(linha._mapping, recurso, sel, "") for linha in linhas]
+
+    # Uma consulta por coleção pedida, com IN sobre as chaves da página
+    for nome, relacao, sub, destinos in pendentes.values():
+        origem = relacao.associacao.c[relacao.coluna_origem]
+        alvo = relacao.recurso.modelo
+        por_chave = {chave: [] for chave, _ in destinos}
+        for linha in db.execute(
+            select(origem.label("_origem"), *[getattr(alvo, campo) for campo in sub.campos])
+            .join(alvo, getattr(alvo, relacao.recurso.chave) == relacao.associacao.c[relacao.coluna_destino])
+            .where(origem.in_(list(por_chave)))
+        ):
+            valores = linha._mapping
+            por_chave[valores["_origem"]].append({campo: valores[campo] for campo in sub.campos})
+        for chave, item in destinos:
+            item[nome] = por_chave[chave]
+    return itens
+
+
+def listar(db: Session, recurso: Recurso, sel: Selecao, cursor: Optional[str], limite: int, *filtros) -> Tuple[List[dict], Optional[str]]:
+    """Página (paginação por chave) de um recurso, com a seleção pedida."""
+    chave = getattr(recurso.modelo, recurso.chave)
+    linhas, proximo_cursor = paginacao.paginar_select(db, _select(recurso, sel).where(*filtros), chave, cursor, limite)
+    return _montar(db, recurso, sel, linhas), proximo_cursor
+
+def todos(db: Session, recurso: Recurso, sel: Selecao, *filtros) -> List[dict]:
+    """Todas as linhas que atendem aos filtros, em ordem de chave (listagens pequenas, sem paginação)."""
+    chave = getattr(recurso.modelo, recurso.chave)
+    linhas = db.execute(_select(recurso, sel).where(*filtros).order_by(chave)).all()
+    return _montar(db, recurso, sel, linhas)
+
+
+# --- Listagens das rotas ---
+
+def livros_por_ids(db: Session, ids: Iterable[str], sel: Optional[Selecao] = None) -> Dict[str, dict]:
+    ids = list(set(ids))
+    if not ids:
+        return {}
+    livros = todos(db, LIVRO, sel or selecao(LIVRO), models.Livro.id_livro.in_(ids))
+    return {livro["id_livro"]: livro for livro in livros}
+
+def pagina_livros(db: Session, cursor: Optional[str], limite: int, sel: Optional[Selecao] = None) -> Tuple[List[dict], Optional[str]]:
+    return listar(db, LIVRO, sel or selecao(LIVRO), cursor, limite)
+
+def exemplares_do_livro(db: Session, id_livro: str) -> List[dict]:
+    return todos(db, EXEMPLAR, selecao(EXEMPLAR), models.Exemplar.id_livro == id_livro)
+
+def pagina_clientes(db: Session, cursor: Optional[str], limite: int, sel: Optional[Selecao] = None) -> Tuple[List[dict], Optional[str]]:
+    return listar(db, CLIENTE, sel or selecao(CLIENTE), cursor, limite)
+
+def pagina_emprestimos(db: Session, ativo: Optional[bool], cursor: Optional[str], limite: int, sel: Optional[Selecao] = None) -> Tuple[List[dict], Optional[str]]:
+    filtros = [] if ativo is None else [models.Emprestimo.ativo == ativo]
+    return listar(db, EMPRESTIMO, sel or selecao(EMPRESTIMO), cursor, limite, *filtros)
+
+def emprestimos_do_cliente(db: Session, id_cliente: int, sel: Optional[Selecao] = None) -> List[dict]:
+    """Histórico completo do cliente: a tabela quente mais os empréstimos arquivados (UNION ALL)."""
+    sel = sel or selecao(EMPRESTIMO)
+    stmt = union_all(
+        _select(EMPRESTIMO, sel).where(models.Emprestimo.id_cliente == id_cliente),
+        _select(EMPRESTIMO_ARQUIVADO, sel).where(models.EmprestimoHistorico.id_cliente == id_cliente),
+    ).order_by(literal_column("id_emprestimo"))
+    return _montar(db, EMPRESTIMO, sel, db.execute(stmt).all())
+
+def emprestimo_arquivado(db: Session, id_emprestimo: int) -> Optional[dict]:
+    itens = todos(db, EMPRESTIMO_ARQUIVADO, selecao(EMPRESTIMO), models.EmprestimoHistorico.id_emprestimo == id_emprestimo)
+    return itens[0] if itens else None
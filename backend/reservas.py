@@ -0,0 +1,137 @@
+# reservas.py
+# Fila de reservas por exemplar.
+#
+# Cada exemplar tem uma fila FIFO: as reservas 'Ativa' em ordem de
+# data_reserva (desempate por id_reserva). O índice idx_reserva_fila
+# (id_exemplar, status, data_reserva) é exatamente essa fila, então:
+#   - a procedure finalizar_emprestimo lê o início da fila pelo índice
+#   - a posição de uma reserva é uma contagem numa faixa do índice
+# Reservas vencidas (data_expiracao no passado) são marcadas 'Expirada' em
+# lotes por um job periódico (agendador.py), pelo índice idx_reserva_expiracao.
+import os
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+import models
+
+VALIDADE_DIAS = int(os.getenv("RESERVA_VALIDADE_DIAS", "30"))
+NOME_JOB = "reservas_expiradas"
+INTERVALO_SEGUNDOS = float(os.getenv("RESERVAS_VARREDURA_SEGUNDOS", "300"))
+TAMANHO_LOTE_EXPIRACAO = 1000
+
+Ativa = models.StatusReservaEnum.Ativa
+
+
+def _na_fila(agora: datetime):
+    """Condições de uma reserva que ainda está na fila."""
+    return (
+        models.Reserva.status == Ativa,
+        or_(models.Reserva.data_expiracao.is_(None), models.Reserva.data_expiracao > agora),
+    )
+
+
+def criar(db: Session, dados) -> models.Reserva:
+    exemplar = db.get(models.Exemplar, dados.id_exemplar)
+    if exemplar is None:
+        raise HTTPException(status_code=404, detail="Exemplar não encontrado.")
+    if db.get(models.UsuarioCliente, dados.id_cliente) is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado.")
+    if exemplar.status == models.StatusExemplarEnum.Disponível:
+        raise HTTPException(status_code=400, detail="Exemplar disponível: faça o empréstimo em vez da reserva.")
+    if exemplar.status == models.StatusExemplarEnum.Perda:
+        raise HTTPException(status_code=400, detail="Exemplar marcado como perdido.")
+
+    agora = datetime.now()
+    duplicada = db.execute(
+        select(models.Reserva.id_reserva).where(
+            models.Reserva.id_exemplar == dados.id_exemplar,
+            models.Reserva.id_cliente == dados.id_cliente,
+            *_na_fila(agora),
+        )
+    ).first()
+    if duplicada:
+        raise HTTPException(status_code=400, detail="Cliente já está na fila deste exemplar.")
+
+    reserva = models.Reserva(
+        id_exemplar=dados.id_exemplar,
+        id_cliente=dados.id_cliente,
+        data_reserva=agora,
+        data_expiracao=agora + timedelta(days=VALIDADE_DIAS),
+        status=Ativa,
+    )
+    db.add(reserva)
+    db.commit()
+    db.refresh(reserva)
+    return reserva
+
+
+def cancelar(db: Session, id_reserva: int) -> models.Reserva:
+    reserva = db.execute(
+        select(models.Reserva).where(models.Reserva.id_reserva == id_reserva).with_for_update()
+    ).scalar()
+    if reserva is None:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada.")
+    if reserva.status != Ativa:
+        raise HTTPException(status_code=400, detail=f"Reserva não está ativa (status: {reserva.status.value}).")
+    reserva.status = models.StatusReservaEnum.Cancelada
+    db.commit()
+    db.refresh(reserva)
+    return reserva
+
+
+def posicao(db: Session, id_reserva: int) -> dict:
+    reserva = db.get(models.Reserva, id_reserva)
+    if reserva is None:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada.")
+    agora = datetime.now()
+    if reserva.status != Ativa or (reserva.data_expiracao and reserva.data_expiracao <= agora):
+        raise HTTPException(status_code=400, detail="Reserva não está na fila.")
+
+    # Duas contagens sobre a faixa do exemplar no índice da fila
+    da_fila = select(func.count()).where(models.Reserva.id_exemplar == reserva.id_exemplar, *_na_fila(agora))
+    tamanho = db.execute(da_fila).scalar_one()
+    a_frente = db.execute(da_fila.where(
+        tuple_(models.Reserva.data_reserva, models.Reserva.id_reserva) < (reserva.data_reserva, reserva.id_reserva)
+    )).scalar_one()
+    return {
+        "id_reserva": reserva.id_reserva,
+        "id_exemplar": reserva.id_exemplar,
+        "posicao": a_frente + 1,
+        "tamanho_fila": tamanho,
+    }
+
+
+def fila(db: Session, id_exemplar: int) -> List[models.Reserva]:
+    return db.execute(
+        select(models.Reserva)
+        .where(models.Reserva.id_exemplar == id_exemplar, *_na_fila(datetime.now()))
+        .order_by(models.Reserva.data_reserva, models.Reserva.id_reserva)
+    ).scalars().all()
+
+
+def expirar_vencidas(db: Session) -> dict:
+    """Job: marca como 'Expirada' as reservas ativas vencidas, em lotes (um commit por lote)."""
+    agora = datetime.now()
+    total = 0
+    while True:
+        ids = db.execute(
+            select(models.Reserva.id_reserva)
+            .where(models.Reserva.status == Ativa, models.Reserva.data_expiracao <= agora)
+            .limit(TAMANHO_LOTE_EXPIRACAO)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(
+            update(models.Reserva)
+            .where(models.Reserva.id_reserva.in_(ids), models.Reserva.status == Ativa)
+            .values(status=models.StatusReservaEnum.Expirada)
+        )
+        db.commit()
+        total += len(ids)
+        if len(ids) < TAMANHO_LOTE_EXPIRACAO:
+            break
+    return {"expiradas": total}
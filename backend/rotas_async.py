@@ -0,0 +1,173 @@
+# rotas_async.py
+# Versões assíncronas (async def + AsyncSession) das rotas de leitura.
+#
+# As rotas síncronas de main.py rodam no threadpool do FastAPI (40 threads
+# por padrão): com muitas consultas lentas ao mesmo tempo, esse é o teto de
+# concorrência. Aqui cada requisição espera o banco sem ocupar uma thread.
+# As rotas ficam em /api/async/... com os mesmos parâmetros e respostas das
+# síncronas, e só são registradas quando ASYNC_DATABASE_URL está definida
+# (veja database.py). As rotas de escrita continuam apenas no modo síncrono.
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+import consultas
+import models
+import paginacao
+import schemas
+import security
+from database import get_async_db
+
+router = APIRouter(prefix="/api/async")
+
+
+@router.get("/usuarios/me", response_model=schemas.Usuario, tags=["Assíncrono"])
+async def read_users_me_async(
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    return current_user
+
+@router.get("/livros/", response_model=List[schemas.Livro], tags=["Assíncrono"])
+async def read_all_livros_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+):
+    livros, proximo_cursor = await paginacao.paginar_async(
+        db, select(models.Livro).options(*consultas.opcoes_livro()), models.Livro.id_livro, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return livros
+
+@router.get("/clientes/", response_model=List[schemas.UsuarioCliente], tags=["Assíncrono"])
+async def read_all_clientes_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    clientes, proximo_cursor = await paginacao.paginar_async(
+        db, select(models.UsuarioCliente), models.UsuarioCliente.id_cliente, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return clientes
+
+@router.get("/clientes/{cliente_id}", response_model=schemas.UsuarioCliente, tags=["Assíncrono"])
+async def read_cliente_async(
+    cliente_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    db_cliente = await db.get(models.UsuarioCliente, cliente_id)
+    if db_cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return db_cliente
+
+@router.get("/autores/", response_model=List[schemas.Autor], tags=["Assíncrono"])
+async def read_all_autores_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+):
+    autores, proximo_cursor = await paginacao.paginar_async(
+        db, select(models.Autor), models.Autor.id_autor, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return autores
+
+@router.get("/editoras/", response_model=List[schemas.Editora], tags=["Assíncrono"])
+async def read_all_editoras_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+):
+    editoras, proximo_cursor = await paginacao.paginar_async(
+        db, select(models.Editora), models.Editora.id_editora, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return editoras
+
+@router.get("/categorias/", response_model=List[schemas.Categoria], tags=["Assíncrono"])
+async def read_all_categorias_async(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+):
+    categorias, proximo_cursor = await paginacao.paginar_async(
+        db, select(models.Categoria), models.Categoria.id_categoria, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return categorias
+
+@router.get("/emprestimos/", response_model=List[schemas.Emprestimo], tags=["Assíncrono"])
+async def read_all_emprestimos_async(
+    response: Response,
+    ativo: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(paginacao.LIMITE_PADRAO, ge=1, le=paginacao.LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    if current_user.grupo.nome_grupo not in ("Bibliotecario", "Administrador"):
+        raise HTTPException(status_code=403, detail="Permissão negada.")
+
+    stmt = select(models.Emprestimo).options(*consultas.opcoes_emprestimo())
+    if ativo is not None:
+        stmt = stmt.where(models.Emprestimo.ativo == ativo)
+    emprestimos, proximo_cursor = await paginacao.paginar_async(
+        db, stmt, models.Emprestimo.id_emprestimo, cursor, limit
+    )
+    paginacao.definir_cursor(response, proximo_cursor)
+    return emprestimos
+
+@router.get("/emprestimos/por-cliente/{cliente_id}", response_model=List[schemas.Emprestimo], tags=["Assíncrono"])
+async def read_emprestimos_por_cliente_async(
+    cliente_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    resultado = await db.execute(
+        select(models.Emprestimo)
+        .options(*consultas.opcoes_emprestimo())
+        .where(models.Emprestimo.id_cliente == cliente_id)
+    )
+    return resultado.scalars().unique().all()
+
+@router.get("/emprestimos/{emprestimo_id}", response_model=schemas.Emprestimo, tags=["Assíncrono"])
+async def read_emprestimo_por_id_async(
+    emprestimo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: security.Principal = Depends(security.get_current_user_async)
+):
+    resultado = await db.execute(
+        select(models.Emprestimo)
+        .options(*consultas.opcoes_emprestimo())
+        .where(models.Emprestimo.id_emprestimo == emprestimo_id)
+    )
+    emprestimo = resultado.scalars().first()
+    if not emprestimo:
+        raise HTTPException(status_code=404, detail="Empréstimo não encontrado.")
+    return emprestimo
+
+@router.get("/exemplares/por-livro/{livro_id}", response_model=List[schemas.Exemplar], tags=["Assíncrono"])
+async def get_exemplares_por_livro_async(
+    livro_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    resultado = await db.execute(
+        select(models.Exemplar)
+        .options(joinedload(models.Exemplar.livro).options(*consultas.opcoes_livro()))
+        .where(models.Exemplar.id_livro == livro_id)
+    )
+    exemplares = resultado.scalars().unique().all()
+    if not exemplares:
+        raise HTTPException(status_code=404, detail="Nenhum exemplar encontrado para este livro.")
+    return exemplares
@@ -1,6 +1,6 @@
 # schemas.py
-from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Dict, Optional, List
 from datetime import datetime, date
 # Importa as Enumerações do models.py para usar nos schemas
 from models import StatusExemplarEnum, StatusReservaEnum
@@ -77,6 +77,41 @@ class Exemplar(ExemplarBase):
     livro: Optional[Livro] = None # Retorna o livro completo
     model_config = ConfigDict(from_attributes=True)
 
+# --- Schemas de Importação em Lote (livros + exemplares) ---
+
+class ExemplarImportacao(BaseModel):
+    codigo_barras: Optional[str] = None
+    localizacao: Optional[str] = None
+
+class LivroImportacao(LivroCreate):
+    # Cópias a criar junto com o livro
+    exemplares: List[ExemplarImportacao] = []
+
+class ErroImportacao(BaseModel):
+    linha: int  # Número da linha no arquivo (o cabeçalho do CSV é a linha 1)
+    erro: str
+
+class ResultadoImportacao(BaseModel):
+    linhas_lidas: int = 0
+    livros_importados: int = 0
+    exemplares_criados: int = 0
+    erros: List[ErroImportacao] = []
+    erros_omitidos: int = 0  # Erros além do limite listado em 'erros'
+    interrompida: bool = False  # Parou num lote com erro inesperado; os lotes anteriores foram gravados
+
+# --- Schemas de Disponibilidade ---
+
+class ConsultaDisponibilidade(BaseModel):
+    ids_livros: List[str] = Field(..., min_length=1, max_length=1000)
+
+class Disponibilidade(BaseModel):
+    id_livro: str
+    disponiveis: int
+    emprestados: int
+    reservados: int
+    perdidos: int
+    total: int
+
 # --- Schemas de UsuarioCliente ---
 
 class UsuarioClienteBase(BaseModel):
@@ -116,8 +151,119 @@ class Emprestimo(EmprestimoBase):
     
     model_config = ConfigDict(from_attributes=True)
     
+# --- Schemas de Circulação em Lote ---
+
+class EmprestimoLoteCreate(BaseModel):
+    id_cliente: int
+    codigos_barras: List[str] = Field(..., min_length=1, max_length=100)
+    data_prevista_devolucao: Optional[date] = None  # Nulo: a trigger define 15 dias
+
+class DevolucaoLote(BaseModel):
+    codigos_barras: List[str] = Field(..., min_length=1, max_length=100)
+
+class ItemCirculacao(BaseModel):
+    codigo_barras: str
+    sucesso: bool
+    id_emprestimo: Optional[int] = None
+    erro: Optional[str] = None
+
+class ResultadoCirculacao(BaseModel):
+    itens: List[ItemCirculacao]
+    sucessos: int
+    falhas: int
+
+# --- Schemas do Balcão (código de barras + CPF) ---
+
+class EmprestimoPorCodigo(BaseModel):
+    codigo_barras: str
+    cpf: str
+    data_prevista_devolucao: Optional[date] = None
+
+class DevolucaoPorCodigo(BaseModel):
+    codigo_barras: str
+
+class EmprestimoBalcao(BaseModel):
+    id_emprestimo: int
+    id_exemplar: int
+    id_cliente: int
+    codigo_barras: str
+    data_emprestimo: datetime
+    data_prevista_devolucao: date
+
+# --- Schemas de Empréstimos Atrasados ---
+
+class EmprestimoAtrasado(BaseModel):
+    id_emprestimo: int
+    id_exemplar: int
+    id_cliente: int
+    nome_cliente: str
+    data_prevista_devolucao: date
+    dias_atraso: int
+    multa_acumulada: float  # Multa até hoje, se devolvido agora
+
 # --- Schemas de Reserva ---
-# (Similar ao Empréstimo, crie os schemas Base, Create e Read)
+
+class ReservaBase(BaseModel):
+    id_exemplar: int
+    id_cliente: int
+
+class ReservaCreate(ReservaBase):
+    pass
+
+class Reserva(ReservaBase):
+    id_reserva: int
+    data_reserva: datetime
+    data_expiracao: Optional[datetime] = None
+    notificado: Optional[bool] = False
+    status: StatusReservaEnum
+    model_config = ConfigDict(from_attributes=True)
+
+class PosicaoReserva(BaseModel):
+    id_reserva: int
+    id_exemplar: int
+    posicao: int        # 1 = próxima a ser atendida
+    tamanho_fila: int
+
+# --- Schemas de Estatísticas (painel) ---
+
+class MovimentoDia(BaseModel):
+    dia: date
+    emprestimos: int
+    devolucoes: int
+
+class TituloMaisEmprestado(BaseModel):
+    id_livro: str
+    titulo: str
+    emprestimos: int
+
+class CategoriaMaisEmprestada(BaseModel):
+    id_categoria: int
+    nome: str
+    emprestimos: int
+
+class Estatisticas(BaseModel):
+    gerado_em: datetime              # Momento do último retrato completo
+    defasagem_maxima_segundos: float
+    janela_dias: int                 # Período de 'emprestimos_por_dia' e dos rankings
+    livros: int
+    exemplares: Dict[str, int]       # Status -> quantidade
+    emprestimos_ativos: int
+    emprestimos_atrasados: int
+    emprestimos_por_dia: List[MovimentoDia]
+    top_titulos: List[TituloMaisEmprestado]
+    top_categorias: List[CategoriaMaisEmprestada]
+
+# --- Schemas de Auditoria ---
+
+class RegistroAuditoria(BaseModel):
+    id_log: int
+    entidade: Optional[str] = None
+    entidade_id: Optional[str] = None
+    acao: Optional[str] = None
+    descricao: Optional[str] = None
+    usuario: Optional[str] = None   # NULL = evento do sistema
+    criado_em: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
 
 # --- Schemas de Segurança (Grupos e Usuários) ---
 
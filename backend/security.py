@@ -3,15 +3,20 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 # Importe seus modelos e schemas de usuário e o get_db
 import models
 import schemas
-from database import get_db
+from cache_principal import Principal, cache as cache_principais
+from database import get_async_db, get_db
+from pool_hash import PoolSaturadaError, pool as pool_hash
 
 # --- Configuração de Criptografia (Hashing) ---
 # Usa bcrypt para as senhas
@@ -36,14 +41,20 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 # --- Funções Auxiliares de Senha ---
+# O bcrypt roda no pool dedicado (pool_hash); se ele estiver saturado,
+# as funções levantam PoolSaturadaError.
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha em texto puro bate com o hash salvo."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pool_hash.executar(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Gera um hash bcrypt para a senha."""
-    return pwd_context.hash(password)
+    return pool_hash.executar(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Igual a verify_password, mas sem bloquear o event loop."""
+    return await pool_hash.executar_async(pwd_context.verify, plain_password, hashed_password)
 
 
 # --- Funções de Autenticação e Token ---
@@ -77,41 +88,99 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[mod
         
     return user # Autenticação bem-sucedida
 
-# --- Dependência Principal de Segurança ---
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.Usuarios:
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[models.Usuarios]:
     """
-    Dependência do FastAPI: decodifica o token, valida e retorna o usuário do banco.
-    Qualquer endpoint que usar esta dependência estará protegido.
+    Versão assíncrona de authenticate_user, para o endpoint /token:
+    a consulta ao banco vai para o threadpool e o bcrypt para o pool_hash,
+    então o event loop fica livre durante toda a verificação.
     """
-    # Exceção padrão para erros de credencial
-    credentials_exception = HTTPException(
+    user = await run_in_threadpool(
+        lambda: db.query(models.Usuarios).filter(models.Usuarios.username == username).first()
+    )
+    if not user:
+        return None
+
+    if not await verify_password_async(password, user.senha_hash):
+        return None
+
+    return user
+
+# --- Dependência Principal de Segurança ---
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def _username_do_token(token: str) -> str:
+    """Decodifica o JWT e devolve o 'sub' (username), ou levanta 401."""
     try:
-        # 1. Decodifica o token JWT
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # 2. Extrai o username (o "subject" ou 'sub' do token)
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-            
-        # Valida se os dados do token estão no formato esperado
-        token_data = schemas.TokenData(username=username)
-
+            raise _credentials_exception()
+        return schemas.TokenData(username=username).username
     except (JWTError, ValidationError):
-        # Se o token estiver expirado, malformado ou inválido
-        raise credentials_exception
-        
-    # 3. Busca o usuário no banco de dados
-    user = db.query(models.Usuarios).filter(models.Usuarios.username == token_data.username).first()
+        raise _credentials_exception()
+
+def username_do_token(token: Optional[str]) -> Optional[str]:
+    """Como _username_do_token, mas devolve None para token ausente ou inválido (não consulta o banco)."""
+    if not token:
+        return None
+    try:
+        return _username_do_token(token)
+    except HTTPException:
+        return None
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """
+    Dependência do FastAPI: decodifica o token, valida e retorna o usuário autenticado.
+    Qualquer endpoint que usar esta dependência estará protegido.
+    O usuário (com o grupo já carregado) vem do cache_principal quando possível;
+    o banco só é consultado na primeira requisição ou após expirar/invalidar.
+    """
+    # 1. Decodifica o token JWT e extrai o username (o "subject" ou 'sub' do token)
+    #    Se o token estiver expirado, malformado ou inválido, levanta 401
+    username = _username_do_token(token)
+
+    # 2. Procura o usuário no cache
+    principal = cache_principais.obter(username)
+    if principal is not None:
+        return principal
+
+    # 3. Busca o usuário (e o grupo, na mesma consulta) no banco de dados
+    user = db.query(models.Usuarios).options(
+        joinedload(models.Usuarios.grupo)
+    ).filter(models.Usuarios.username == username).first()
     
     if user is None:
         # Se o token for válido, mas o usuário não existir mais no DB
-        raise credentials_exception
+        raise _credentials_exception()
         
-    # 4. Retorna o objeto do usuário (modelo SQLAlchemy)
-    return user
\ No newline at end of file
+    # 4. Guarda um retrato imutável (usuário + grupo) e o retorna
+    principal = Principal.de_usuario(user)
+    cache_principais.guardar(principal)
+    return principal
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """Versão de get_current_user para as rotas assíncronas (mesmo cache)."""
+    username = _username_do_token(token)
+
+    principal = cache_principais.obter(username)
+    if principal is not None:
+        return principal
+
+    resultado = await db.execute(
+        select(models.Usuarios)
+        .options(joinedload(models.Usuarios.grupo))
+        .where(models.Usuarios.username == username)
+    )
+    user = resultado.scalars().first()
+    if user is None:
+        raise _credentials_exception()
+
+    principal = Principal.de_usuario(user)
+    cache_principais.guardar(principal)
+    return principal
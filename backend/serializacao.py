@@ -0,0 +1,74 @@
+# serializacao.py
+# Resposta JSON rápida para as listagens grandes.
+#
+# No caminho padrão do FastAPI, cada objeto devolvido pela rota é validado de
+# novo pelo response_model (from_attributes, relação por relação) e depois
+# codificado pelo json da biblioteca padrão. Para listas já montadas a partir
+# do banco (veja projecoes.py) essa revalidação não acrescenta nada: a rota
+# devolve uma RespostaJSON, que o FastAPI envia como está.
+#
+# O codificador é o orjson quando instalado (pip install orjson); sem ele,
+# json da biblioteca padrão com o mesmo formato de saída.
+#
+# Com SERIALIZACAO_VALIDAR=true as listas passam pelo schema antes de sair
+# (útil em desenvolvimento para conferir que a projeção segue o contrato).
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+import paginacao
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+VALIDAR_SAIDA = os.getenv("SERIALIZACAO_VALIDAR", "false").lower() in ("1", "true", "sim", "yes")
+
+
+def _padrao(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def dumps(conteudo: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao)
+    return json.dumps(conteudo, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, conteudo: Any) -> bytes:
+        return dumps(conteudo)
+
+
+@lru_cache(maxsize=None)
+def _adaptador(tipo) -> TypeAdapter:
+    return TypeAdapter(tipo)
+
+
+def responder(conteudo: Any, tipo=None, proximo_cursor: Optional[str] = None) -> RespostaJSON:
+    """
+    Envia 'conteudo' (dicts/listas montados do banco) sem passar pelo response_model.
+    'tipo' (ex.: List[schemas.Livro]) só é usado com SERIALIZACAO_VALIDAR=true.
+    """
+    if VALIDAR_SAIDA and tipo is not None:
+        adaptador = _adaptador(tipo)
+        conteudo = adaptador.dump_python(adaptador.validate_python(conteudo), mode="json")
+    resposta = RespostaJSON(conteudo)
+    paginacao.definir_cursor(resposta, proximo_cursor)
+    return resposta
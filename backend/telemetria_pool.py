@@ -0,0 +1,101 @@
+# telemetria_pool.py
+# Telemetria do pool de conexões do SQLAlchemy.
+#
+# O QueuePool padrão não informa quanto tempo cada requisição esperou por
+# uma conexão. QueuePoolInstrumentado mede cada checkout e registra:
+#   - histograma da espera por conexão (ms)
+#   - checkouts que só foram atendidos com conexões de "overflow"
+#   - timeouts (ninguém devolveu uma conexão a tempo)
+#   - conexões invalidadas (ex.: derrubadas pelo wait_timeout do MySQL e
+#     detectadas pelo pre-ping)
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Limites superiores (ms) das faixas do histograma; a última faixa é "acima de"
+FAIXAS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class TelemetriaPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograma = [0] * (len(FAIXAS_MS) + 1)
+        self.checkouts = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self.checkouts_em_overflow = 0
+        self.conexoes_overflow_abertas = 0
+        self.timeouts = 0
+        self.invalidadas = 0
+
+    def registrar_checkout(self, espera_ms: float, em_overflow: bool, abriu_overflow: bool) -> None:
+        faixa = next((i for i, limite in enumerate(FAIXAS_MS) if espera_ms <= limite), len(FAIXAS_MS))
+        with self._lock:
+            self.histograma[faixa] += 1
+            self.checkouts += 1
+            self.espera_total_ms += espera_ms
+            self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+            if em_overflow:
+                self.checkouts_em_overflow += 1
+            if abriu_overflow:
+                self.conexoes_overflow_abertas += 1
+
+    def registrar_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def registrar_invalidacao(self) -> None:
+        with self._lock:
+            self.invalidadas += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            faixas = [f"<= {limite} ms" for limite in FAIXAS_MS] + [f"> {FAIXAS_MS[-1]} ms"]
+            if isinstance(pool, QueuePool):
+                ocupacao = {
+                    "tamanho": pool.size(),
+                    "em_uso": pool.checkedout(),
+                    "ociosas": pool.checkedin(),
+                    "overflow_atual": max(pool.overflow(), 0),
+                    "overflow_maximo": pool._max_overflow,
+                }
+            else:
+                # Outros pools (ex.: SQLite em memória) só informam um resumo textual
+                ocupacao = {"status": pool.status()}
+            return {
+                "ocupacao": ocupacao,
+                "checkouts": self.checkouts,
+                "espera_media_ms": self.espera_total_ms / self.checkouts if self.checkouts else 0.0,
+                "espera_max_ms": self.espera_max_ms,
+                "histograma_espera": dict(zip(faixas, self.histograma)),
+                "checkouts_em_overflow": self.checkouts_em_overflow,
+                "conexoes_overflow_abertas": self.conexoes_overflow_abertas,
+                "timeouts": self.timeouts,
+                "conexoes_invalidadas": self.invalidadas,
+            }
+
+
+telemetria = TelemetriaPool()
+
+
+class QueuePoolInstrumentado(QueuePool):
+    """QueuePool que mede a espera de cada checkout (veja TelemetriaPool)."""
+
+    def _do_get(self):
+        overflow_antes = self.overflow()
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            telemetria.registrar_timeout()
+            raise
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        overflow_depois = self.overflow()
+        telemetria.registrar_checkout(
+            espera_ms,
+            em_overflow=overflow_depois > 0,
+            abriu_overflow=overflow_depois > max(overflow_antes, 0),
+        )
+        return conexao
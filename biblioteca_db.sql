@@ -130,14 +130,69 @@ CREATE TABLE reserva (
   FOREIGN KEY (id_cliente) REFERENCES usuario_cliente(id_cliente)
 ) ENGINE=InnoDB;
 
--- Logs simples (opcional, útil para auditoria)
+-- Trilha de auditoria (gravada em lotes pela API: backend/auditoria.py)
+-- Consultas mais recentes primeiro, filtradas por entidade, usuário, ação ou data
 CREATE TABLE audit_log (
   id_log INT AUTO_INCREMENT PRIMARY KEY,
   entidade VARCHAR(50),
   entidade_id VARCHAR(50),
   acao VARCHAR(50),
   descricao TEXT,
-  criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+  usuario VARCHAR(100),
+  criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+  INDEX idx_audit_entidade (entidade, entidade_id, id_log),
+  INDEX idx_audit_usuario (usuario, id_log),
+  INDEX idx_audit_acao (acao, id_log),
+  INDEX idx_audit_criado (criado_em)
+) ENGINE=InnoDB;
+
+-- Empréstimos atrasados materializados (mantida pelo job de atrasos do backend)
+-- Dias de atraso e multa são calculados na leitura a partir de data_prevista_devolucao
+CREATE TABLE emprestimo_atrasado (
+  id_emprestimo INT PRIMARY KEY,
+  id_exemplar INT NOT NULL,
+  id_cliente INT NOT NULL,
+  data_prevista_devolucao DATE NOT NULL,
+  incluido_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (id_emprestimo) REFERENCES emprestimo(id_emprestimo),
+  INDEX idx_atrasado_prevista (data_prevista_devolucao, id_emprestimo)
+) ENGINE=InnoDB;
+
+-- Histórico de empréstimos encerrados (movidos em lotes pelo job de arquivamento do backend)
+-- Particionada por ano de data_emprestimo: consultas por período leem só as partições
+-- envolvidas e um ano inteiro sai com DROP PARTITION. Tabelas particionadas não
+-- aceitam chaves estrangeiras, e a chave de partição precisa estar na chave primária.
+-- Antes de cada virada de ano, abra a partição do ano seguinte:
+--   ALTER TABLE emprestimo_historico REORGANIZE PARTITION p_futuro INTO (
+--     PARTITION p2028 VALUES LESS THAN (2029), PARTITION p_futuro VALUES LESS THAN MAXVALUE);
+CREATE TABLE emprestimo_historico (
+  id_emprestimo INT NOT NULL,
+  data_emprestimo DATETIME NOT NULL,
+  id_exemplar INT NOT NULL,
+  id_cliente INT NOT NULL,
+  data_prevista_devolucao DATE NOT NULL,
+  data_devolucao DATETIME DEFAULT NULL,
+  multa DECIMAL(10,2) DEFAULT 0.00,
+  ativo BOOLEAN NOT NULL DEFAULT FALSE,
+  criado_em DATETIME,
+  arquivado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id_emprestimo, data_emprestimo),
+  INDEX idx_historico_cliente (id_cliente, data_emprestimo)
+) ENGINE=InnoDB
+PARTITION BY RANGE (YEAR(data_emprestimo)) (
+  PARTITION p_antigo VALUES LESS THAN (2024),
+  PARTITION p2024 VALUES LESS THAN (2025),
+  PARTITION p2025 VALUES LESS THAN (2026),
+  PARTITION p2026 VALUES LESS THAN (2027),
+  PARTITION p2027 VALUES LESS THAN (2028),
+  PARTITION p_futuro VALUES LESS THAN MAXVALUE
+);
+
+-- Marca d'água dos jobs periódicos do backend
+CREATE TABLE job_marca (
+  nome VARCHAR(50) PRIMARY KEY,
+  valor VARCHAR(50),
+  atualizado_em DATETIME
 ) ENGINE=InnoDB;
 
 -- Índices sugeridos
@@ -147,6 +202,15 @@ CREATE INDEX idx_usuario_cpf ON usuario_cliente(cpf);
 CREATE INDEX idx_emprestimo_cliente_ativo ON emprestimo(id_cliente, data_devolucao);
 -- índice para empréstimos atrasados
 CREATE INDEX idx_emprestimo_prevdev ON emprestimo(data_prevista_devolucao, data_devolucao);
+-- índice para contar exemplares por livro e status (disponibilidade)
+CREATE INDEX idx_exemplar_livro_status ON exemplar(id_livro, status);
+-- fila de reservas por exemplar (próxima reserva ativa em ordem de chegada)
+CREATE INDEX idx_reserva_fila ON reserva(id_exemplar, status, data_reserva);
+-- varredura de reservas vencidas
+CREATE INDEX idx_reserva_expiracao ON reserva(status, data_expiracao);
+-- movimento diário do painel de estatísticas (últimos dias)
+CREATE INDEX idx_emprestimo_data ON emprestimo(data_emprestimo);
+CREATE INDEX idx_emprestimo_devolucao ON emprestimo(data_devolucao);
 
 -- FUNÇÃO: gerar_id_livro() - Geração de ID crítico
 -- Formato: LIV-AAAA-NNNN (ano + seq 4 dígitos por ano)
@@ -213,9 +277,8 @@ BEGIN
     SET status = 'Emprestado'
     WHERE id_exemplar = NEW.id_exemplar
       AND status = 'Disponível';
-  -- inserir log
-  INSERT INTO audit_log(entidade, entidade_id, acao, descricao)
-    VALUES ('Exemplar', CAST(NEW.id_exemplar AS CHAR), 'EmprestimoCriado', CONCAT('Emprestimo ID=', NEW.id_emprestimo));
+  -- O log do empréstimo não é mais gravado aqui, dentro da transação:
+  -- a API enfileira o evento e o grava em lote (backend/auditoria.py)
 END$$
 DELIMITER ;
 
@@ -265,7 +328,9 @@ BEGIN
         ativo = FALSE
     WHERE id_emprestimo = p_id_emprestimo;
 
-  -- verifica se existe reserva ativa para este exemplar (fila por data_reserva)
+  -- verifica se existe reserva ativa para este exemplar (fila por data_reserva, via idx_reserva_fila)
+  -- as vencidas são marcadas 'Expirada' em lote pelo backend; o filtro de data abaixo só cobre
+  -- as que venceram desde a última varredura
   SELECT id_reserva, id_cliente INTO v_next_reserva_id, v_next_cliente
     FROM reserva
     WHERE id_exemplar = v_id_exemplar
@@ -367,6 +432,7 @@ GRANT SELECT, INSERT, UPDATE, DELETE, EXECUTE ON `biblioteca_db`.* TO 'app_user'
 REVOKE ALL PRIVILEGES, GRANT OPTION FROM 'bibliotecario'@'%';
 GRANT SELECT, INSERT, UPDATE, DELETE ON `biblioteca_db`.exemplar TO 'bibliotecario'@'%';
 GRANT SELECT, INSERT, UPDATE, DELETE ON `biblioteca_db`.emprestimo TO 'bibliotecario'@'%';
+GRANT SELECT ON `biblioteca_db`.emprestimo_historico TO 'bibliotecario'@'%';
 GRANT SELECT, INSERT, UPDATE, DELETE ON `biblioteca_db`.reserva TO 'bibliotecario'@'%';
 GRANT SELECT ON `biblioteca_db`.livro TO 'bibliotecario'@'%';
 GRANT SELECT ON `biblioteca_db`.autor TO 'bibliotecario'@'%';
@@ -0,0 +1,20 @@
+// Listagens paginadas da API.
+// Cada chamada devolve no máximo 'limit' itens e o cursor da próxima página
+// no cabeçalho X-Next-Cursor; buscarTodos segue as páginas até o fim.
+const TAMANHO_PAGINA = 1000; // Máximo aceito pela API
+
+export async function buscarTodos(url, token, mensagemErro) {
+  const itens = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: TAMANHO_PAGINA });
+    if (cursor) params.set("cursor", cursor);
+    const res = await fetch(`${url}?${params}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (!res.ok) throw new Error(mensagemErro);
+    itens.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return itens;
+}
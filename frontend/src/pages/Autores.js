@@ -1,4 +1,5 @@
 import React, { useEffect, useState } from "react";
+import { buscarTodos } from "../api";
 
 export default function Autores() {
   const [autores, setAutores] = useState([]);
@@ -10,14 +11,7 @@ export default function Autores() {
     async function carregarAutores() {
       try {
         const token = localStorage.getItem("token");
-        const response = await fetch("http://127.0.0.1:8000/api/autores/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-
-        if (!response.ok) throw new Error("Erro ao carregar autores");
-        const data = await response.json();
+        const data = await buscarTodos("http://127.0.0.1:8000/api/autores/", token, "Erro ao carregar autores");
         setAutores(data);
       } catch (error) {
         console.error("Erro:", error);
@@ -1,4 +1,5 @@
 import React, { useEffect, useState } from "react";
+import { buscarTodos } from "../api";
 
 export default function Categorias() {
   const [categorias, setCategorias] = useState([]);
@@ -10,15 +11,7 @@ export default function Categorias() {
       try {
         const token = localStorage.getItem("token");
 
-        const response = await fetch("http://127.0.0.1:8000/api/categorias/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-
-        if (!response.ok) throw new Error("Erro ao carregar categorias");
-
-        const data = await response.json();
+        const data = await buscarTodos("http://127.0.0.1:8000/api/categorias/", token, "Erro ao carregar categorias");
         setCategorias(data);
       } catch (error) {
         console.error("Erro:", error);
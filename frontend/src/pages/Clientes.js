@@ -1,4 +1,5 @@
 import React, { useEffect, useState } from "react";
+import { buscarTodos } from "../api";
 
 export default function Clientes() {
   const [clientes, setClientes] = useState([]);
@@ -16,13 +17,7 @@ export default function Clientes() {
   useEffect(() => {
     async function carregarClientes() {
       try {
-        const response = await fetch("http://127.0.0.1:8000/api/clientes/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-
-        if (!response.ok) throw new Error("Erro ao carregar clientes");
-
-        const data = await response.json();
+        const data = await buscarTodos("http://127.0.0.1:8000/api/clientes/", token, "Erro ao carregar clientes");
         setClientes(data);
       } catch (error) {
         console.error("Erro:", error);
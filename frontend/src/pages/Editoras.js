@@ -1,4 +1,5 @@
 import { useState, useEffect } from "react";
+import { buscarTodos } from "../api";
 
 export default function Editoras() {
   const [editoras, setEditoras] = useState([]);
@@ -10,15 +11,7 @@ export default function Editoras() {
   // Função para carregar todas as editoras
   const carregarEditoras = async () => {
     try {
-      const response = await fetch("http://127.0.0.1:8000/api/editoras/", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-
-      if (!response.ok) throw new Error("Erro ao carregar editoras");
-
-      const data = await response.json();
+      const data = await buscarTodos("http://127.0.0.1:8000/api/editoras/", token, "Erro ao carregar editoras");
       setEditoras(data);
     } catch (error) {
       console.error("Falha ao carregar editoras:", error);
@@ -1,4 +1,5 @@
 import { useState, useEffect } from "react";
+import { buscarTodos } from "../api";
 
 export default function Emprestimos() {
     const [emprestimos, setEmprestimos] = useState([]);
@@ -14,11 +15,7 @@ export default function Emprestimos() {
     useEffect(() => {
         async function carregarClientes() {
             try {
-                const res = await fetch("http://127.0.0.1:8000/api/clientes/", {
-                    headers: { Authorization: `Bearer ${token}` },
-                });
-                if (!res.ok) throw new Error("Erro ao carregar clientes");
-                const data = await res.json();
+                const data = await buscarTodos("http://127.0.0.1:8000/api/clientes/", token, "Erro ao carregar clientes");
                 setClientes(data);
             } catch (error) {
                 console.error("Erro:", error);
@@ -32,11 +29,7 @@ export default function Emprestimos() {
     useEffect(() => {
         async function carregarLivros() {
             try {
-                const res = await fetch("http://127.0.0.1:8000/api/livros/", {
-                    headers: { Authorization: `Bearer ${token}` },
-                });
-                if (!res.ok) throw new Error("Erro ao buscar livros");
-                const data = await res.json();
+                const data = await buscarTodos("http://127.0.0.1:8000/api/livros/", token, "Erro ao buscar livros");
                 setLivros(data);
             } catch (error) {
                 console.error("Erro:", error);
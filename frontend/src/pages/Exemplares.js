@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react";
 import { useParams } from "react-router-dom";
+import { buscarTodos } from "../api";
 
 export default function Exemplares() {
   const { idLivro } = useParams();
@@ -40,11 +41,7 @@ export default function Exemplares() {
   useEffect(() => {
     async function fetchClientes() {
       try {
-        const res = await fetch("http://127.0.0.1:8000/api/clientes/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) throw new Error("Erro ao carregar clientes");
-        setClientes(await res.json());
+        setClientes(await buscarTodos("http://127.0.0.1:8000/api/clientes/", token, "Erro ao carregar clientes"));
       } catch (error) {
         console.error(error.message);
       }
@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { buscarTodos } from "../api";
 
 export default function Livros() {
   const [livros, setLivros] = useState([]);
@@ -24,11 +25,7 @@ export default function Livros() {
   useEffect(() => {
     async function fetchLivros() {
       try {
-        const res = await fetch("http://127.0.0.1:8000/api/livros/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) throw new Error("Erro ao buscar livros");
-        const data = await res.json();
+        const data = await buscarTodos("http://127.0.0.1:8000/api/livros/", token, "Erro ao buscar livros");
         setLivros(data);
       } catch (error) {
         console.error(error);
@@ -41,11 +38,7 @@ export default function Livros() {
   useEffect(() => {
     const fetchEditoras = async () => {
       try {
-        const res = await fetch("http://127.0.0.1:8000/api/editoras/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) throw new Error("Erro ao carregar editoras");
-        setEditoras(await res.json());
+        setEditoras(await buscarTodos("http://127.0.0.1:8000/api/editoras/", token, "Erro ao carregar editoras"));
       } catch (error) {
         console.error(error);
       }
@@ -53,11 +46,7 @@ export default function Livros() {
 
     const fetchAutores = async () => {
       try {
-        const res = await fetch("http://127.0.0.1:8000/api/autores/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) throw new Error("Erro ao carregar autores");
-        setAutores(await res.json());
+        setAutores(await buscarTodos("http://127.0.0.1:8000/api/autores/", token, "Erro ao carregar autores"));
       } catch (error) {
         console.error(error);
       }
@@ -65,11 +54,7 @@ export default function Livros() {
 
     const fetchCategorias = async () => {
       try {
-        const res = await fetch("http://127.0.0.1:8000/api/categorias/", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) throw new Error("Erro ao carregar categorias");
-        setCategorias(await res.json());
+        setCategorias(await buscarTodos("http://127.0.0.1:8000/api/categorias/", token, "Erro ao carregar categorias"));
       } catch (error) {
         console.error(error);
       }